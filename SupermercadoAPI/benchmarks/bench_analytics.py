@@ -0,0 +1,129 @@
+"""
+Analíticas sobre un dataset sintético (1M de órdenes por defecto en el
+último año): cada endpoint en frío (sin caché) y en caliente, frente a la
+forma anterior de traer todas las órdenes y sumar en Python.
+
+    python -m benchmarks.bench_analytics --orders 1000000
+    python -m benchmarks.bench_analytics --no-seed   # reutiliza los datos ya sembrados
+"""
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from benchmarks.common import use_bench_database, report
+
+use_bench_database()
+
+from controllers.controller_analytics import (
+    analytics_cache,
+    revenue_by_day,
+    revenue_by_category,
+    top_products,
+    stock_turnover,
+    order_value_distribution
+)
+from utils.indexes import ensure_indexes
+from utils.mongodb import get_collection, close_client
+
+END = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+START = END - timedelta(days=365)
+
+
+async def seed(orders: int, products: int, categories: int):
+    rng = random.Random(7)
+    for collection in ("orders", "products", "categories", "inventories"):
+        await get_collection(collection).drop()
+
+    category_ids = [ObjectId() for _ in range(categories)]
+    await get_collection("categories").insert_many(
+        [{"_id": oid, "name": f"Categoría {i}", "description": ""} for i, oid in enumerate(category_ids)]
+    )
+    product_docs = [
+        {"_id": ObjectId(), "name": f"Producto {i}", "price": round(rng.uniform(1, 300), 2), "category_id": str(rng.choice(category_ids))}
+        for i in range(products)
+    ]
+    await get_collection("products").insert_many(product_docs)
+    await get_collection("inventories").insert_many(
+        [{"product_id": str(p["_id"]), "stock": rng.randrange(0, 500)} for p in product_docs]
+    )
+
+    seconds = int((END - START).total_seconds())
+    batch = []
+    for _ in range(orders):
+        items = []
+        for product in rng.sample(product_docs, rng.randint(1, 4)):
+            items.append({"inventory_id": "", "quantity": rng.randint(1, 5), "product_id": str(product["_id"]), "unit_price": product["price"]})
+        batch.append({
+            "user_id": "bench",
+            "inventory_id": [],
+            "items": items,
+            "total": round(sum(i["quantity"] * i["unit_price"] for i in items), 2),
+            "status": "cancelled" if rng.random() < 0.05 else "paid",
+            "created_at": START + timedelta(seconds=rng.randrange(seconds)),
+        })
+        if len(batch) == 10_000:
+            await get_collection("orders").insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await get_collection("orders").insert_many(batch, ordered=False)
+    await ensure_indexes()
+
+
+async def python_revenue_by_day():
+    """Lo que había que hacer antes: recorrer todas las órdenes desde la API y sumar"""
+    totals = defaultdict(float)
+    cursor = get_collection("orders").find(
+        {"created_at": {"$gte": START, "$lt": END}, "status": {"$ne": "cancelled"}},
+        {"total": 1, "created_at": 1}
+    ).batch_size(10_000)
+    async for order in cursor:
+        totals[order["created_at"].date()] += order["total"]
+    return totals
+
+
+async def measure(name: str, operation, repeat: int = 3) -> dict:
+    cold = []
+    for _ in range(repeat):
+        analytics_cache.clear()
+        start = time.perf_counter()
+        await operation()
+        cold.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    await operation()
+    warm = time.perf_counter() - start
+    return {"name": name, "cold_ms": round(min(cold) * 1000, 1), "cached_ms": round(warm * 1000, 3)}
+
+
+async def main(orders: int, products: int, categories: int, do_seed: bool, baseline: bool):
+    if do_seed:
+        start = time.perf_counter()
+        await seed(orders, products, categories)
+        print(f"Sembradas {orders} órdenes en {time.perf_counter() - start:.1f}s")
+
+    results = [
+        await measure("ingresos por día", lambda: revenue_by_day(START, END, 7)),
+        await measure("ingresos por categoría", lambda: revenue_by_category(START, END)),
+        await measure("top productos", lambda: top_products(START, END, 10)),
+        await measure("rotación de stock", lambda: stock_turnover(START, END, 50)),
+        await measure("distribución del total", lambda: order_value_distribution(START, END)),
+    ]
+    if baseline:
+        results.append(await measure("ingresos por día en Python (antes)", python_revenue_by_day, repeat=1))
+    report(results)
+    await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--no-baseline", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.orders, args.products, args.categories, not args.no_seed, not args.no_baseline))
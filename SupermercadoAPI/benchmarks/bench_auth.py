@@ -0,0 +1,39 @@
+"""
+Costo de autenticación por petición: verificación JWT completa frente a
+claims servidos desde la caché de tokens verificados.
+
+    python -m benchmarks.bench_auth --iterations 100000
+"""
+import os
+import time
+import argparse
+
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+from utils import security
+from benchmarks.common import report
+
+
+def run(name: str, iterations: int, clear_cache: bool) -> dict:
+    token = security.create_jwt_token("Juan", "Pérez", "juan@example.com", True, True, "64bfe234c9e12ab3456def78")
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if clear_cache:
+            security._token_cache.clear()
+        security.authorize(token, admin=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "iterations": iterations,
+        "us_per_request": round(elapsed / iterations * 1_000_000, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+    report([
+        run("sin caché (jwt.decode en cada petición)", args.iterations, clear_cache=True),
+        run("con caché de tokens verificados", args.iterations, clear_cache=False),
+    ])
@@ -0,0 +1,61 @@
+"""
+Contención en checkout: N clientes compran el mismo SKU a la vez.
+Comprueba que nunca se vende más stock del que hay y mide la latencia.
+
+    python -m benchmarks.bench_checkout --clients 200 --stock 50
+"""
+import asyncio
+import argparse
+
+from fastapi import HTTPException
+
+from benchmarks.common import use_bench_database, run_concurrent, report
+
+use_bench_database()
+
+from models.order import CreateOrder, OrderItem
+from models.product import Product
+from models.inventory import Inventory
+from controllers.controller_order import create_order, orders_repo
+from controllers.controller_product import products_repo
+from controllers.controller_inventory import inventory_repo
+from utils.mongodb import close_client
+
+
+async def main(clients: int, stock: int):
+    for repo in (orders_repo, products_repo, inventory_repo):
+        await repo.coll.drop()
+
+    product = await products_repo.insert(Product(name="Cafe Molido", price=4.5, category_id="bench"))
+    inventory = await inventory_repo.insert(Inventory(product_id=product.product_id, stock=stock))
+    order = CreateOrder(items=[OrderItem(inventory_id=inventory.inventory_id, quantity=1)])
+
+    outcome = {"sold": 0, "rejected": 0}
+
+    async def checkout(i: int):
+        try:
+            await create_order(order, f"user-{i}")
+            outcome["sold"] += 1
+        except HTTPException as e:
+            if e.status_code != 409:
+                raise
+            outcome["rejected"] += 1
+
+    result = await run_concurrent("checkout mismo SKU", checkout, clients, 1)
+    remaining = (await inventory_repo.get(inventory.inventory_id)).stock
+    orders = await orders_repo.coll.count_documents({})
+
+    result.update(outcome, remaining_stock=remaining, orders=orders)
+    report([result])
+    await close_client()
+
+    if outcome["sold"] != min(clients, stock) or remaining != stock - outcome["sold"] or orders != outcome["sold"]:
+        raise SystemExit("Sobreventa o stock inconsistente")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.stock))
@@ -0,0 +1,50 @@
+"""
+Latencia p99 con N clientes concurrentes: pymongo síncrono dentro de
+`async def` (comportamiento anterior) frente al cliente asíncrono.
+
+    python -m benchmarks.bench_concurrency --clients 100 --requests 50
+"""
+import argparse
+import asyncio
+
+from pymongo import MongoClient, AsyncMongoClient
+
+from benchmarks.common import BENCH_URI, BENCH_DB, run_concurrent, report
+
+COLLECTION = "bench_concurrency"
+
+
+async def main(clients: int, requests: int, docs: int):
+    sync_client = MongoClient(BENCH_URI)
+    async_client = AsyncMongoClient(BENCH_URI, maxPoolSize=clients)
+
+    sync_coll = sync_client[BENCH_DB][COLLECTION]
+    async_coll = async_client[BENCH_DB][COLLECTION]
+
+    sync_coll.drop()
+    sync_coll.insert_many([{"_id": i, "name": f"Producto {i}", "price": i * 1.5} for i in range(docs)])
+
+    async def blocking(i: int):
+        sync_coll.find_one({"_id": i % docs})
+
+    async def non_blocking(i: int):
+        await async_coll.find_one({"_id": i % docs})
+
+    results = [
+        await run_concurrent("before: sync pymongo", blocking, clients, requests),
+        await run_concurrent("after: AsyncMongoClient", non_blocking, clients, requests),
+    ]
+
+    sync_coll.drop()
+    sync_client.close()
+    await async_client.close()
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--docs", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.requests, args.docs))
@@ -0,0 +1,61 @@
+"""
+GET /products con y sin If-None-Match contra la app en proceso: latencia y
+bytes por respuesta completa (200) frente a revalidación (304).
+
+    python -m benchmarks.bench_etag --products 500 --requests 500
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.common import use_bench_database, run_concurrent, report
+
+use_bench_database()
+
+from main import app
+from controllers.controller_product import products_repo
+from models.product import Product
+from utils.mongodb import close_client
+
+
+async def main(products: int, requests: int, clients: int):
+    await products_repo.coll.drop()
+    for i in range(products):
+        await products_repo.insert(Product(name=f"Producto {i}", price=9.99, category_id="64c70c2b1f34c42c7a3b77d8"))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        url = f"/products/?limit={min(products, 500)}"
+        first = await client.get(url)
+        etag = first.headers["etag"]
+        received = {"200": 0, "304": 0}
+
+        async def full(i: int):
+            response = await client.get(url)
+            received["200"] += len(response.content)
+
+        async def revalidate(i: int):
+            response = await client.get(url, headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            received["304"] += len(response.content)
+
+        results = [
+            await run_concurrent("200 completo", full, clients, requests // clients),
+            await run_concurrent("304 con If-None-Match", revalidate, clients, requests // clients),
+        ]
+    results[0]["bytes"] = received["200"]
+    results[1]["bytes"] = received["304"]
+
+    await products_repo.coll.drop()
+    await close_client()
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.requests, args.clients))
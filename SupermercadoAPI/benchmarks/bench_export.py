@@ -0,0 +1,76 @@
+"""
+Memoria y rendimiento de la exportación de órdenes: el pico de memoria
+(tracemalloc) debe ser el mismo con 10k que con 1M de filas.
+
+    python -m benchmarks.bench_export --orders 1000000
+"""
+import time
+import asyncio
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_bench_database, report
+
+use_bench_database()
+
+from controllers.controller_order import export_orders, orders_repo
+from utils.mongodb import close_client
+
+
+async def seed(orders: int):
+    await orders_repo.coll.drop()
+    start = datetime(2025, 1, 1)
+    batch = []
+    for i in range(orders):
+        batch.append({
+            "user_id": "bench",
+            "inventory_id": ["64bfe234c9e12ab3456def78"],
+            "items": [{"inventory_id": "64bfe234c9e12ab3456def78", "quantity": 2, "product_id": "64c70c2b1f34c42c7a3b77d8", "unit_price": 9.5}],
+            "total": 19.0,
+            "status": "paid",
+            "created_at": start + timedelta(seconds=i),
+        })
+        if len(batch) == 10_000:
+            await orders_repo.coll.insert_many(batch)
+            batch = []
+    if batch:
+        await orders_repo.coll.insert_many(batch)
+
+
+async def measure(name: str, rows: int, **options) -> dict:
+    end = datetime(2025, 1, 1) + timedelta(seconds=rows)
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = 0
+    async for chunk in export_orders(end=end, **options):
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "name": f"{name}: {rows} órdenes",
+        "s": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed),
+        "mb": round(size / 1e6, 1),
+        "peak_mem_mb": round(peak / 1e6, 2),
+    }
+
+
+async def main(orders: int):
+    await seed(orders)
+    results = []
+    for rows in sorted({min(10_000, orders), min(100_000, orders), orders}):
+        results.append(await measure("csv", rows))
+        results.append(await measure("ndjson", rows, fmt="ndjson"))
+        results.append(await measure("csv.gz", rows, compress=True))
+    report(results)
+    await orders_repo.coll.drop()
+    await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.orders))
@@ -0,0 +1,69 @@
+"""
+Importación en streaming de un CSV sintético de productos: filas/s y pico
+de memoria (tracemalloc), que debe depender del tamaño de bloque y no del
+número de filas.
+
+    python -m benchmarks.bench_import --rows 500000 --chunk-size 1000
+"""
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+from benchmarks.common import use_bench_database, report
+
+use_bench_database()
+
+from controllers.controller_product import import_products, products_repo
+from controllers.controller_category import categories_repo
+from models.category import Category
+from utils.mongodb import close_client
+
+
+async def csv_body(rows: int, category_id: str, piece: int = 64 * 1024):
+    """Genera el archivo por trozos, como llegaría por la red"""
+    buffer = "name,price,category_id\n"
+    for i in range(rows):
+        buffer += f"Producto {i},{i % 500}.99,{category_id}\n"
+        if len(buffer) >= piece:
+            yield buffer.encode()
+            buffer = ""
+    if buffer:
+        yield buffer.encode()
+
+
+async def main(rows_list, chunk_size: int):
+    results = []
+    for rows in rows_list:
+        await products_repo.coll.drop()
+        await categories_repo.coll.drop()
+        category = await categories_repo.insert(Category(name="Abarrotes"))
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        job = await import_products(csv_body(rows, category.category_id), "csv", chunk_size)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append({
+            "name": f"{rows} filas, bloques de {chunk_size}",
+            "status": job.status,
+            "succeeded": job.succeeded,
+            "failed": job.failed,
+            "s": round(elapsed, 2),
+            "rows_per_s": round(rows / elapsed),
+            "peak_mem_mb": round(peak / 1e6, 2),
+        })
+    await products_repo.coll.drop()
+    await categories_repo.coll.drop()
+    await close_client()
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(sorted({min(50_000, args.rows), args.rows}), args.chunk_size))
@@ -0,0 +1,90 @@
+"""
+Comprueba que las búsquedas de la API usan IXSCAN sobre un dataset grande.
+
+    python -m benchmarks.bench_indexes --docs 200000
+"""
+import time
+import random
+import asyncio
+import argparse
+
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+
+from benchmarks.common import BENCH_URI, BENCH_DB, report
+from utils.indexes import INDEXES, ensure_indexes
+
+# (colección, campo consultado) por cada ruta de búsqueda de la API
+LOOKUPS = [
+    ("users", "email"),
+    ("orders", "user_id"),
+    ("inventories", "product_id"),
+    ("catalogs", "product_id"),
+    ("products", "category_id"),
+]
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def seed(db, docs: int):
+    refs = [str(ObjectId()) for _ in range(max(1, docs // 100))]
+    for collection, field in LOOKUPS:
+        await db[collection].drop()
+        batch = []
+        for i in range(docs):
+            value = f"user{i}@example.com" if field == "email" else random.choice(refs)
+            batch.append({field: value, "n": i})
+            if len(batch) == 10_000:
+                await db[collection].insert_many(batch)
+                batch = []
+        if batch:
+            await db[collection].insert_many(batch)
+    return refs
+
+
+async def main(docs: int):
+    client = AsyncMongoClient(BENCH_URI)
+    db = client[BENCH_DB]
+    refs = await seed(db, docs)
+
+    async def measure(label: str):
+        results = []
+        for collection, field in LOOKUPS:
+            value = f"user{docs // 2}@example.com" if field == "email" else refs[0]
+            explain = await db[collection].find({field: value}).explain()
+            stages = set(_stages(explain["queryPlanner"]["winningPlan"]))
+            start = time.perf_counter()
+            await db[collection].find({field: value}).to_list()
+            results.append({
+                "name": f"{label}: {collection}.{field}",
+                "ixscan": "IXSCAN" in stages,
+                "docs_examined": explain.get("executionStats", {}).get("totalDocsExamined"),
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+        return results
+
+    before = await measure("sin índices")
+    await ensure_indexes(db)
+    after = await measure("con índices")
+
+    for collection in INDEXES:
+        await db[collection].drop()
+    await client.close()
+    report(before + after)
+
+    if not all(result["ixscan"] for result in after):
+        raise SystemExit("Alguna búsqueda no usa IXSCAN")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.docs))
@@ -0,0 +1,163 @@
+"""
+Avisos en tiempo real (utils.live) con la app en proceso:
+
+- Memoria por conexión inactiva: N conexiones SSE suscritas a K inventarios
+  cada una, medida con tracemalloc (objetos de Python, incluida la tarea que
+  atiende la conexión) y con el RSS del proceso. No incluye los buffers del
+  servidor ASGI ni del socket.
+- Reparto: W ventas concurrentes sobre pocos inventarios; cuánto tarda el
+  stock final en llegar a todas las conexiones y cuántos mensajes hicieron
+  falta gracias a la coalescencia.
+
+Usa el change feed real: con replica set, change streams; sin él, sondeo de
+`versions` (la latencia la marca CHANGE_FEED_POLL_INTERVAL).
+
+    python -m benchmarks.bench_live --connections 5000 --topics 3 --inventories 200 --writes 2000
+"""
+import os
+import gc
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+import orjson
+
+from benchmarks.common import use_bench_database, report
+
+use_bench_database()
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from main import app, lifespan
+from utils import ledger
+from utils.changefeed import change_feed
+from utils.live import live_hub, sse_events, topics
+from utils.mongodb import get_collection
+
+STOCK = 1_000_000
+
+
+def rss_mb() -> Optional[float]:
+    """RSS actual (no el pico); solo en Linux"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+async def wait_until(condition, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def main(connections: int, per_connection: int, inventories: int, writes: int, writers: int, hot: int):
+    for collection in ("inventories", ledger.MOVEMENTS):
+        await get_collection(collection).drop()
+    inserted = await get_collection("inventories").insert_many(
+        [{"product_id": f"bench-{i % 50}", "stock": STOCK, "version": 0} for i in range(inventories)]
+    )
+    ids = [str(id) for id in inserted.inserted_ids]
+    rng = random.Random(7)
+
+    async with lifespan(app):
+        # Da tiempo al change feed a decidir entre stream y sondeo
+        await wait_until(lambda: change_feed.mode in ("stream", "polling"), 10)
+
+        subscribed: List[List[str]] = [rng.sample(ids, per_connection) for _ in range(connections)]
+        seen: List[Dict[str, int]] = [{} for _ in range(connections)]
+        received = [0] * connections
+
+        async def connection(i: int):
+            async for chunk in sse_events(topics(subscribed[i])):
+                for line in chunk.split(b"\n"):
+                    if line.startswith(b"data: "):
+                        message = orjson.loads(line[6:])
+                        seen[i][message["inventory_id"]] = message["stock"]
+                        received[i] += 1
+
+        gc.collect()
+        rss_before = rss_mb()
+        tracemalloc.start()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(connection(i)) for i in range(connections)]
+        connected = await wait_until(lambda: all(len(s) == per_connection for s in seen), 120)
+        connect_seconds = time.perf_counter() - start
+        gc.collect()
+        traced = tracemalloc.get_traced_memory()[0] - traced_before
+        tracemalloc.stop()
+        rss_after = rss_mb()
+        initial = sum(received)
+
+        # Ventas sobre los primeros `hot` inventarios: muchas escrituras al mismo documento
+        targets = [ids[rng.randrange(hot)] for _ in range(writes)]
+        queue = list(targets)
+
+        async def writer():
+            while queue:
+                await ledger.apply(queue.pop(), -1, "sale")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(writer() for _ in range(writers)))
+        write_seconds = time.perf_counter() - start
+
+        sales = Counter(targets)
+        final = {id: STOCK - count for id, count in sales.items()}
+        written = time.perf_counter()
+        delivered = await wait_until(
+            lambda: all(seen[i].get(id, STOCK) == final.get(id, STOCK) for i in range(connections) for id in subscribed[i]),
+            60
+        )
+        propagation = time.perf_counter() - written
+        interested = sum(1 for i in range(connections) for id in subscribed[i] if id in final)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        result = {
+            "name": "live",
+            "change_feed": change_feed.mode,
+            "connections": connections,
+            "topics_per_connection": per_connection,
+            "connected": connected,
+            "connect_seconds": round(connect_seconds, 3),
+            "traced_bytes_per_connection": round(traced / connections),
+            "rss_kb_per_connection": round((rss_after - rss_before) * 1024 / connections, 2) if rss_before is not None else None,
+            "writes": writes,
+            "write_rps": round(writes / write_seconds, 2) if write_seconds else 0.0,
+            "delivered": delivered,
+            "propagation_ms": round(propagation * 1000, 1),
+            "messages_after_initial": sum(received) - initial,
+            # Sin coalescencia cada escritura llegaría a cada conexión interesada
+            "messages_without_coalescing": sum(sales[id] for i in range(connections) for id in subscribed[i]),
+            "subscriptions_touched": interested,
+            "hub": live_hub.stats(),
+        }
+
+        for collection in ("inventories", ledger.MOVEMENTS):
+            await get_collection(collection).drop()
+    report([result])
+
+    if not connected or not delivered:
+        raise SystemExit("No todas las conexiones recibieron el stock final")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--topics", type=int, default=3, help="Inventarios por conexión")
+    parser.add_argument("--inventories", type=int, default=200)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--hot", type=int, default=10, help="Inventarios que reciben las ventas")
+    args = parser.parse_args()
+    asyncio.run(main(args.connections, args.topics, args.inventories, args.writes, args.writers, min(args.hot, args.inventories)))
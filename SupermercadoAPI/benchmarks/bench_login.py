@@ -0,0 +1,56 @@
+"""
+Tormenta de logins al inicio de turno contra el proveedor de identidad falso
+(con latencia simulada de red) y la colección users con índice por email.
+
+    python -m benchmarks.bench_login --clients 200 --requests 20 --latency 0.05
+"""
+import os
+import asyncio
+import argparse
+
+from benchmarks.common import use_bench_database, run_concurrent, report
+
+use_bench_database()
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+from models.user import User
+from models.login import Login
+from controllers.controller_user import login, users_repo
+from utils.identity import FakeIdentityProvider, set_identity_provider
+from utils.indexes import ensure_indexes
+from utils.mongodb import close_client
+
+PASSWORD = "Password123!"
+
+
+async def main(clients: int, requests: int, users: int, latency: float):
+    identity = FakeIdentityProvider(latency=latency)
+    set_identity_provider(identity)
+
+    await users_repo.coll.drop()
+    await ensure_indexes()
+    for i in range(users):
+        email = f"cajero{i}@example.com"
+        await identity.create_user(email, PASSWORD)
+        await users_repo.insert(User(name="Cajero", lastname="Turno", email=email, password=PASSWORD))
+
+    credentials = [Login(email=f"cajero{i}@example.com", password=PASSWORD) for i in range(users)]
+
+    async def do_login(i: int):
+        await login(credentials[i % users])
+
+    result = await run_concurrent(f"login (latencia proveedor {latency * 1000:.0f} ms)", do_login, clients, requests)
+    report([result])
+
+    await users_repo.coll.drop()
+    await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.requests, args.users, args.latency))
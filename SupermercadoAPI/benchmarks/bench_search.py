@@ -0,0 +1,80 @@
+"""
+Latencia de /products/search sobre el índice invertido en memoria con un
+catálogo sintético (100k productos por defecto), sin Mongo. El objetivo es
+p99 < 5 ms para las consultas típicas. Como en producción, las búsquedas se
+intercalan con escrituras (un producto cambia de nombre y precio cada
+--write-every búsquedas); la latencia de esas escrituras se reporta aparte.
+
+    python -m benchmarks.bench_search --products 100000
+"""
+import time
+import random
+import argparse
+
+from benchmarks.common import report, summarize
+from utils.search import ProductSearchIndex
+
+WORDS = [
+    "leche", "entera", "descremada", "café", "molido", "azúcar", "morena", "arroz", "integral",
+    "frijol", "negro", "aceite", "oliva", "pan", "blanco", "jamón", "pavo", "queso", "manchego",
+    "yogur", "natural", "fresa", "plátano", "manzana", "roja", "galletas", "chocolate", "atún",
+    "agua", "mineral", "jabón", "líquido", "papel", "higiénico", "detergente", "limón", "tortillas",
+]
+CATEGORIES = ["Lácteos", "Abarrotes", "Panadería", "Frutas y Verduras", "Limpieza", "Bebidas", "Carnes frías"]
+
+QUERIES = {
+    "prefijo": dict(query="lec"),
+    "varios términos": dict(query="cafe mol"),
+    "categoría + texto": dict(query="queso", category_id="c0"),
+    "rango de precio": dict(min_price=10, max_price=20),
+    "texto + precio": dict(query="choc", max_price=50),
+}
+
+
+def build(products: int) -> ProductSearchIndex:
+    rng = random.Random(42)
+    index = ProductSearchIndex(deferred=True)
+    for i, name in enumerate(CATEGORIES):
+        index.set_category(f"c{i}", name)
+    for i in range(products):
+        index.upsert(f"{i:024x}", product_name(rng, i), round(rng.uniform(1, 200), 2), f"c{rng.randrange(len(CATEGORIES))}")
+    index.finish_load()
+    return index
+
+
+def product_name(rng: random.Random, i: int) -> str:
+    return " ".join(rng.sample(WORDS, 3)) + f" {i % 1000}"
+
+
+def main(products: int, repeat: int, write_every: int):
+    start = time.perf_counter()
+    index = build(products)
+    print(f"Índice de {len(index)} productos construido en {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(7)
+    writes = []
+    results = []
+    for name, params in QUERIES.items():
+        samples = []
+        start = time.perf_counter()
+        for n in range(repeat):
+            if n % write_every == 0:
+                i = rng.randrange(products)
+                began = time.perf_counter()
+                index.upsert(f"{i:024x}", product_name(rng, i), round(rng.uniform(1, 200), 2), f"c{rng.randrange(len(CATEGORIES))}")
+                writes.append(time.perf_counter() - began)
+            began = time.perf_counter()
+            index.search(**params)
+            samples.append(time.perf_counter() - began)
+        results.append(summarize(name, samples, time.perf_counter() - start))
+    results.append(summarize("escritura (upsert)", writes, sum(writes)))
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--write-every", type=int, default=1, help="Búsquedas por cada escritura intercalada")
+    args = parser.parse_args()
+    main(args.products, args.repeat, max(args.write_every, 1))
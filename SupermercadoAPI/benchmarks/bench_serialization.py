@@ -0,0 +1,72 @@
+"""
+Rendimiento de serialización de listas de 10k modelos: ruta por defecto de
+FastAPI (revalidación del response_model + jsonable_encoder + json) frente a
+FastJSONResponse con orjson sobre modelos ya validados.
+
+    python -m benchmarks.bench_serialization --items 10000
+"""
+import time
+import argparse
+from datetime import datetime
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.common import report
+from models.product import Product
+from models.inventory import Inventory
+from models.order import Order, OrderItem
+from utils.responses import FastJSONResponse
+
+
+def build(model, items: int):
+    now = datetime(2025, 7, 30, 15, 30)
+    factories = {
+        Product: lambda i: Product(product_id=f"{i:024x}", name=f"Producto {i}", price=19.99, category_id="64c70c2b1f34c42c7a3b77d8"),
+        Inventory: lambda i: Inventory(inventory_id=f"{i:024x}", product_id="64bfe234c9e12ab3456def78", stock=i, date_in=now),
+        Order: lambda i: Order(
+            order_id=f"{i:024x}",
+            user_id="64bfe234c9e12ab3456def78",
+            inventory_id=["64bfe234c9e12ab3456def78"],
+            items=[OrderItem(inventory_id="64bfe234c9e12ab3456def78", quantity=2, unit_price=9.5)],
+            total=19.0,
+            created_at=now
+        ),
+    }
+    return [factories[model](i) for i in range(items)]
+
+
+def timed(name: str, func, repeat: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        size = len(func())
+    elapsed = (time.perf_counter() - start) / repeat
+    return {"name": name, "ms": round(elapsed * 1000, 3), "bytes": size}
+
+
+def main(items: int, repeat: int):
+    results = []
+    for model in (Product, Inventory, Order):
+        data = build(model, items)
+        adapter = TypeAdapter(List[model])
+
+        def default_path():
+            validated = adapter.validate_python([item.model_dump() for item in data])
+            return JSONResponse(jsonable_encoder(validated)).body
+
+        def fast_path():
+            return FastJSONResponse(data).body
+
+        results.append(timed(f"{model.__name__}: FastAPI por defecto", default_path, repeat))
+        results.append(timed(f"{model.__name__}: orjson sin revalidar", fast_path, repeat))
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.items, args.repeat)
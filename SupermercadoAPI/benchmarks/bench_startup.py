@@ -0,0 +1,46 @@
+"""
+Tiempo de arranque en frío: importa main (create_app y todos los routers) en
+un proceso nuevo, como en cada spawn de un worker de uvicorn. Con --budget-ms
+falla si la media supera el presupuesto, para detectar regresiones.
+
+    python -m benchmarks.bench_startup --runs 10 --budget-ms 1500
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+from benchmarks.common import percentile, report
+
+CHILD = "import json, main; print(json.dumps(main.STARTUP_TIMINGS))"
+
+
+def main(runs: int, budget_ms: float):
+    samples, phases = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", CHILD], capture_output=True, text=True, check=True)
+        samples.append(time.perf_counter() - start)
+        phases.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    result = {
+        "name": "cold start (import main)",
+        "runs": runs,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "phases_ms": {phase: round(statistics.fmean(p[phase] for p in phases), 3) for phase in phases[0]},
+    }
+    report([result])
+
+    if budget_ms and result["mean_ms"] > budget_ms:
+        raise SystemExit(f"Arranque en frío {result['mean_ms']} ms supera el presupuesto de {budget_ms} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=0)
+    args = parser.parse_args()
+    main(args.runs, args.budget_ms)
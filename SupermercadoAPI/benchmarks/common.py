@@ -0,0 +1,66 @@
+import os
+import json
+import time
+import asyncio
+import statistics
+from typing import Awaitable, Callable, Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Los benchmarks usan una base aparte para no tocar datos reales
+BENCH_URI = os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017")
+BENCH_DB = os.getenv("BENCH_MONGO_DB", "supermercado_bench")
+
+
+def use_bench_database():
+    """Apunta utils.mongodb a la base de benchmarks; llamar antes de importar controladores"""
+    os.environ["URI"] = BENCH_URI
+    os.environ["MONGO_DB_NAME"] = BENCH_DB
+    os.environ["MONGO_TLS"] = "false"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, samples: List[float], elapsed: float) -> Dict:
+    """Resume latencias (en segundos) como un dict listo para JSON"""
+    return {
+        "name": name,
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+async def run_concurrent(
+        name: str
+        , operation: Callable[[int], Awaitable[None]]
+        , concurrency: int
+        , requests_per_client: int
+) -> Dict:
+    """Ejecuta `operation` desde N clientes concurrentes y mide cada llamada"""
+    samples: List[float] = []
+
+    async def client(worker: int):
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            await operation(worker * requests_per_client + i)
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(w) for w in range(concurrency)))
+    return summarize(name, samples, time.perf_counter() - start)
+
+
+def report(results: List[Dict]):
+    print(json.dumps(results, indent=2, ensure_ascii=False))
@@ -0,0 +1,351 @@
+"""
+Harness de carga reproducible: levanta la app en proceso (httpx + ASGI, con
+su lifespan) contra un mongod local, siembra datos realistas a la escala
+pedida y ejecuta una mezcla de cargas (navegar, buscar, comprar y ediciones
+masivas de admin) con concurrencia fija.
+
+El resultado es un JSON con throughput, p50/p95/p99 por operación y el pico
+de RSS del proceso, pensado para guardarse como línea base y comparar cada
+cambio contra ella:
+
+    python -m benchmarks.harness --scale small --output baseline.json
+    python -m benchmarks.harness --scale small --compare baseline.json
+    python -m benchmarks.harness --spawn-mongod      # arranca un mongod temporal
+
+Con --spawn-mongod se necesita el binario `mongod` en el PATH; si no, se usa
+BENCH_MONGO_URI (por defecto mongodb://localhost:27017).
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+
+from benchmarks.common import summarize, use_bench_database
+
+SCALES = {
+    "small": {"users": 200, "categories": 10, "products": 2_000, "orders": 10_000},
+    "medium": {"users": 2_000, "categories": 30, "products": 20_000, "orders": 200_000},
+    "large": {"users": 20_000, "categories": 100, "products": 200_000, "orders": 2_000_000},
+}
+DEFAULT_MIX = {"browse": 60, "search": 25, "checkout": 12, "bulk": 3}
+
+WORDS = [
+    "leche", "entera", "café", "molido", "azúcar", "arroz", "integral", "frijol", "aceite", "oliva",
+    "pan", "jamón", "queso", "yogur", "fresa", "manzana", "galletas", "chocolate", "atún", "agua",
+    "jabón", "papel", "detergente", "limón", "tortillas", "cereal", "avena", "miel", "sal", "pasta",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_mongod():
+    """Arranca un mongod efímero en un directorio temporal; devuelve (proceso, uri, dbpath)"""
+    binary = shutil.which("mongod")
+    if binary is None:
+        sys.exit("No se encontró `mongod` en el PATH; usa BENCH_MONGO_URI o instala MongoDB")
+    dbpath = tempfile.mkdtemp(prefix="bench-mongod-")
+    port = _free_port()
+    process = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, f"mongodb://127.0.0.1:{port}", dbpath
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    sys.exit("mongod no arrancó a tiempo")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb() -> float:
+    # En Linux ru_maxrss viene en KB; en macOS, en bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+async def seed(db, counts: Dict[str, int], rng: random.Random) -> Dict[str, list]:
+    for collection in ("users", "categories", "products", "inventories", "catalogs", "orders", "versions"):
+        await db[collection].drop()
+
+    users = [
+        {"_id": ObjectId(), "name": "Bench", "lastname": "User", "email": f"user{i}@bench.local", "active": True, "admin": i == 0}
+        for i in range(counts["users"])
+    ]
+    categories = [{"_id": ObjectId(), "name": f"Categoria {i}"} for i in range(counts["categories"])]
+    products = [
+        {
+            "_id": ObjectId(),
+            "name": " ".join(rng.sample(WORDS, 2)).capitalize() + f" {i}",
+            "price": round(rng.uniform(1, 300), 2),
+            "category_id": str(rng.choice(categories)["_id"]),
+        }
+        for i in range(counts["products"])
+    ]
+    # Stock de sobra para que las compras no se queden sin existencias durante la corrida
+    inventories = [
+        {"_id": ObjectId(), "product_id": str(p["_id"]), "stock": 1_000_000, "date_in": datetime(2025, 1, 1)}
+        for p in products
+    ]
+
+    async def insert(collection: str, docs: list):
+        for start in range(0, len(docs), 10_000):
+            await db[collection].insert_many(docs[start:start + 10_000], ordered=False)
+
+    await insert("users", users)
+    await insert("categories", categories)
+    await insert("products", products)
+    await insert("inventories", inventories)
+
+    now = datetime.utcnow()
+    batch = []
+    for _ in range(counts["orders"]):
+        items = []
+        for position in rng.sample(range(len(products)), min(len(products), rng.randint(1, 3))):
+            items.append({
+                "inventory_id": str(inventories[position]["_id"]),
+                "quantity": rng.randint(1, 3),
+                "product_id": str(products[position]["_id"]),
+                "unit_price": products[position]["price"],
+            })
+        batch.append({
+            "user_id": str(rng.choice(users)["_id"]),
+            "inventory_id": [item["inventory_id"] for item in items],
+            "items": items,
+            "total": round(sum(item["quantity"] * item["unit_price"] for item in items), 2),
+            "status": "paid",
+            "created_at": now - timedelta(seconds=rng.randrange(90 * 86400)),
+        })
+        if len(batch) == 10_000:
+            await db["orders"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db["orders"].insert_many(batch, ordered=False)
+
+    return {"users": users, "categories": categories, "products": products, "inventories": inventories}
+
+
+class Workload:
+    """Operaciones HTTP de la mezcla; cada una devuelve el código de estado"""
+
+    def __init__(self, client, data: Dict[str, list], rng: random.Random, token_for):
+        self.client = client
+        self.data = data
+        self.rng = rng
+        self.user_tokens = [token_for(user) for user in data["users"][1:101] or data["users"]]
+        self.admin_token = token_for(data["users"][0])
+
+    async def browse(self) -> int:
+        choice = self.rng.random()
+        if choice < 0.4:
+            response = await self.client.get("/products/", params={"limit": 50})
+        elif choice < 0.8:
+            product = self.rng.choice(self.data["products"])
+            response = await self.client.get(f"/catalog/{product['_id']}")
+        else:
+            response = await self.client.get("/categories/")
+        return response.status_code
+
+    async def search(self) -> int:
+        params = {"q": self.rng.choice(WORDS)[:self.rng.randint(3, 5)]}
+        if self.rng.random() < 0.3:
+            params["category_id"] = str(self.rng.choice(self.data["categories"])["_id"])
+        if self.rng.random() < 0.3:
+            params["max_price"] = 100
+        response = await self.client.get("/products/search", params=params)
+        return response.status_code
+
+    async def checkout(self) -> int:
+        items = [
+            {"inventory_id": str(inventory["_id"]), "quantity": self.rng.randint(1, 3)}
+            for inventory in self.rng.sample(self.data["inventories"], self.rng.randint(1, 4))
+        ]
+        response = await self.client.post(
+            "/orders/", json={"items": items},
+            headers={"Authorization": f"Bearer {self.rng.choice(self.user_tokens)}"}
+        )
+        return response.status_code
+
+    async def bulk(self) -> int:
+        items = [
+            {"product_id": str(p["_id"]), "name": p["name"], "price": round(self.rng.uniform(1, 300), 2), "category_id": p["category_id"]}
+            for p in self.rng.sample(self.data["products"], min(50, len(self.data["products"])))
+        ]
+        response = await self.client.put(
+            "/products/bulk", json=items,
+            headers={"Authorization": f"Bearer {self.admin_token}"}
+        )
+        return response.status_code
+
+
+async def drive(workload: Workload, mix: Dict[str, int], concurrency: int, duration: float, rng: random.Random) -> Dict:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def worker(seed: int):
+        local = random.Random(seed)
+        while time.perf_counter() < deadline:
+            name = local.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = await getattr(workload, name)()
+            except Exception:
+                status = 599
+            samples[name].append(time.perf_counter() - start)
+            if status >= 400:
+                errors[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(rng.randrange(1 << 30)) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for name in names:
+        result = summarize(name, samples[name], elapsed)
+        result["errors"] = errors[name]
+        results.append(result)
+    overall = summarize("total", [s for name in names for s in samples[name]], elapsed)
+    overall["errors"] = sum(errors.values())
+    return {"elapsed_s": round(elapsed, 2), "operations": results, "overall": overall}
+
+
+def compare(current: Dict, baseline: Dict) -> List[Dict]:
+    """Diferencia relativa (%) de throughput y p99 frente a la línea base"""
+    previous = {op["name"]: op for op in baseline["operations"] + [baseline["overall"]]}
+    rows = []
+    for op in current["operations"] + [current["overall"]]:
+        before = previous.get(op["name"])
+        if not before:
+            continue
+
+        def delta(field):
+            return round((op[field] - before[field]) / before[field] * 100, 1) if before[field] else None
+
+        rows.append({"name": op["name"], "throughput_%": delta("throughput_rps"), "p99_%": delta("p99_ms"), "p50_%": delta("p50_ms")})
+    return rows
+
+
+async def main(args):
+    counts = dict(SCALES[args.scale])
+    for key in counts:
+        if getattr(args, key) is not None:
+            counts[key] = getattr(args, key)
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix = {name: int(weight) for name, weight in (part.split("=") for part in args.mix.split(","))}
+    rng = random.Random(args.seed)
+
+    # Configuración antes de importar la app: base de benchmarks y proveedor de identidad falso
+    use_bench_database()
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ["IDENTITY_PROVIDER"] = "fake"
+    mongod = None
+    if args.spawn_mongod:
+        mongod, uri, dbpath = spawn_mongod()
+        os.environ["URI"] = uri
+
+    import httpx
+    from main import app, lifespan
+    from utils.mongodb import DB, get_client
+    from utils.security import create_jwt_token
+
+    try:
+        start = time.perf_counter()
+        data = await seed(get_client()[DB], counts, rng)
+        seed_s = time.perf_counter() - start
+
+        def token_for(user):
+            return create_jwt_token(user["name"], user["lastname"], user["email"], user["active"], user["admin"], str(user["_id"]))
+
+        async with lifespan(app):
+            from controllers.controller_catalog import rebuild_catalog
+            await rebuild_catalog()
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                workload = Workload(client, data, rng, token_for)
+                if args.warmup:
+                    await drive(workload, mix, args.concurrency, args.warmup, rng)
+                run = await drive(workload, mix, args.concurrency, args.duration, rng)
+    finally:
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait(timeout=30)
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "scale": args.scale,
+            "counts": counts,
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "seed_s": round(seed_s, 1),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        **run,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            result["vs_baseline"] = compare(run, json.load(f))
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if result["overall"]["errors"] and args.fail_on_errors:
+        sys.exit("Hubo respuestas con error durante la corrida")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--categories", type=int)
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--orders", type=int)
+    parser.add_argument("--mix", help="p. ej. browse=60,search=25,checkout=12,bulk=3")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--spawn-mongod", action="store_true")
+    parser.add_argument("--output", help="Ruta donde guardar el JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--fail-on-errors", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Reintentos en paralelo con Idempotency-Key contra POST /orders (app en
+proceso): cada clave se envía R veces a la vez y debe crear exactamente una
+orden y descontar el stock una sola vez. Todas las respuestas de una clave
+deben traer el mismo order_id.
+
+    python -m benchmarks.stress_idempotency --keys 200 --retries 10
+"""
+import os
+import uuid
+import asyncio
+import argparse
+
+import httpx
+
+from benchmarks.common import use_bench_database, run_concurrent, report
+
+use_bench_database()
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from main import app
+from models.product import Product
+from models.inventory import Inventory
+from controllers.controller_order import orders_repo
+from controllers.controller_product import products_repo
+from controllers.controller_inventory import inventory_repo
+from utils.idempotency import IDEMPOTENCY_COLLECTION
+from utils.mongodb import close_client, get_collection
+from utils.security import create_jwt_token
+
+
+async def main(keys: int, retries: int, stock: int):
+    for repo in (orders_repo, products_repo, inventory_repo):
+        await repo.coll.drop()
+    await get_collection(IDEMPOTENCY_COLLECTION).drop()
+
+    product = await products_repo.insert(Product(name="Cafe Molido", price=4.5, category_id="bench"))
+    inventory = await inventory_repo.insert(Inventory(product_id=product.product_id, stock=stock))
+    token = create_jwt_token("Bench", "User", "bench@bench.local", True, False, "bench-user")
+    body = {"items": [{"inventory_id": inventory.inventory_id, "quantity": 1}]}
+    order_ids = {}
+    statuses = {}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+
+        async def attempt(key: str):
+            response = await client.post(
+                "/orders/", json=body,
+                headers={"Authorization": f"Bearer {token}", "Idempotency-Key": key}
+            )
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                order_ids.setdefault(key, set()).add(response.json()["order_id"])
+
+        async def burst(i: int):
+            # Un mismo checkout reintentado `retries` veces a la vez
+            key = uuid.uuid4().hex
+            await asyncio.gather(*(attempt(key) for _ in range(retries)))
+
+        result = await run_concurrent(f"{retries} reintentos por clave", burst, 10, keys // 10)
+
+    keys_sent = (keys // 10) * 10
+    orders = await orders_repo.coll.count_documents({})
+    remaining = (await inventory_repo.get(inventory.inventory_id)).stock
+    result.update(
+        keys=keys_sent,
+        statuses=statuses,
+        orders=orders,
+        keys_with_one_order_id=sum(1 for ids in order_ids.values() if len(ids) == 1),
+        stock_sold=stock - remaining,
+    )
+    report([result])
+
+    for repo in (orders_repo, products_repo, inventory_repo):
+        await repo.coll.drop()
+    await get_collection(IDEMPOTENCY_COLLECTION).drop()
+    await close_client()
+
+    if orders != keys_sent or stock - remaining != keys_sent or result["keys_with_one_order_id"] != keys_sent:
+        raise SystemExit("Los reintentos no fueron exactamente una vez")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=10)
+    parser.add_argument("--stock", type=int, default=1_000_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.keys, args.retries, args.stock))
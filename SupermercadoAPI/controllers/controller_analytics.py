@@ -0,0 +1,268 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.analytics import (
+    DailyRevenue,
+    CategoryRevenue,
+    ProductSales,
+    StockTurnover,
+    OrderValueBucket,
+    OrderValueDistribution
+)
+from controllers.controller_product import products_repo
+from utils.mongodb import get_collection
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Ventana de caché configurable con CACHE_TTL_ANALYTICS (segundos)
+analytics_cache = TTLCache("analytics", ttl=60, maxsize=1000)
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+ORDER_VALUE_BOUNDARIES = [0, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """Por defecto los últimos 30 días completos (UTC, incluido hoy); así la clave de caché es estable"""
+    if end is None:
+        end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    if start is None:
+        start = end - timedelta(days=DEFAULT_RANGE_DAYS)
+    if start.tzinfo is not None or end.tzinfo is not None:
+        raise HTTPException(status_code=400, detail="Las fechas van en UTC y sin zona horaria")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="La fecha inicial debe ser anterior a la final")
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {MAX_RANGE_DAYS} días")
+    return start, end
+
+
+def _match(start: datetime, end: datetime) -> Dict:
+    return {"$match": {"created_at": {"$gte": start, "$lt": end}, "status": {"$ne": "cancelled"}}}
+
+
+def _sales_by_product(start: datetime, end: datetime) -> List[Dict]:
+    return [
+        _match(start, end),
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": "$items.product_id",
+            "units": {"$sum": "$items.quantity"},
+            "revenue": {"$sum": {"$multiply": ["$items.quantity", "$items.unit_price"]}}
+        }},
+    ]
+
+
+def _lookup_by_id(collection: str, local_field: str, alias: str, fields: Dict) -> List[Dict]:
+    """$lookup por _id a partir de un id guardado como string"""
+    return [
+        {"$addFields": {"_oid": {"$convert": {"input": local_field, "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {
+            "from": collection,
+            "localField": "_oid",
+            "foreignField": "_id",
+            "pipeline": [{"$project": fields}],
+            "as": alias
+        }},
+        {"$unwind": {"path": f"${alias}", "preserveNullAndEmptyArrays": True}},
+    ]
+
+
+async def _aggregate(collection: str, pipeline: List[Dict]) -> List[Dict]:
+    return await (await get_collection(collection).aggregate(pipeline)).to_list()
+
+
+async def _cached(key: tuple, loader):
+    try:
+        return await analytics_cache.get_or_load(key, loader)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error calculando analíticas {key[0]}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error calculando analíticas en la base de datos")
+
+
+async def revenue_by_day(
+        start: Optional[datetime] = None
+        , end: Optional[datetime] = None
+        , window: int = 7
+) -> List[DailyRevenue]:
+    """Ingresos y órdenes por día, con todos los días del rango y su media móvil"""
+    start, end = _range(start, end)
+
+    async def load():
+        rows = await _aggregate("orders", [
+            _match(start, end),
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                "revenue": {"$sum": "$total"},
+                "orders": {"$sum": 1}
+            }},
+        ])
+        days = np.arange(np.datetime64(start, "D"), np.datetime64(end - timedelta(microseconds=1), "D") + 1)
+        revenue = np.zeros(len(days))
+        orders = np.zeros(len(days), dtype=np.int64)
+        if rows:
+            index = (np.array([row["_id"] for row in rows], dtype="datetime64[D]") - days[0]).astype(np.int64)
+            revenue[index] = [row["revenue"] for row in rows]
+            orders[index] = [row["orders"] for row in rows]
+
+        # Media móvil hacia atrás; los primeros días promedian solo los días disponibles
+        moving = np.convolve(revenue, np.ones(window))[:len(days)] / np.minimum(np.arange(1, len(days) + 1), window)
+        return [
+            DailyRevenue.model_construct(
+                day=str(day), revenue=round(float(r), 2), orders=int(o), moving_average=round(float(m), 2)
+            )
+            for day, r, o, m in zip(days, revenue, orders, moving)
+        ]
+
+    return await _cached(("revenue_by_day", start, end, window), load)
+
+
+async def revenue_by_category(start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[CategoryRevenue]:
+    start, end = _range(start, end)
+
+    async def load():
+        rows = await _aggregate("orders", _sales_by_product(start, end) + _lookup_by_id(
+            "products", "$_id", "product", {"category_id": 1}
+        ) + [
+            {"$group": {"_id": "$product.category_id", "revenue": {"$sum": "$revenue"}, "units": {"$sum": "$units"}}},
+        ] + _lookup_by_id("categories", "$_id", "category", {"name": 1}) + [
+            {"$sort": {"revenue": -1}},
+        ])
+        return [
+            CategoryRevenue.model_construct(
+                category_id=row["_id"],
+                name=row.get("category", {}).get("name"),
+                revenue=round(row["revenue"], 2),
+                units=row["units"]
+            )
+            for row in rows
+        ]
+
+    return await _cached(("revenue_by_category", start, end), load)
+
+
+async def top_products(start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 10) -> List[ProductSales]:
+    start, end = _range(start, end)
+
+    async def load():
+        rows = await _aggregate("orders", _sales_by_product(start, end) + [
+            {"$sort": {"revenue": -1}},
+            {"$limit": limit},
+        ] + _lookup_by_id("products", "$_id", "product", {"name": 1}))
+        return [
+            ProductSales.model_construct(
+                product_id=row["_id"],
+                name=row.get("product", {}).get("name"),
+                revenue=round(row["revenue"], 2),
+                units=row["units"]
+            )
+            for row in rows
+        ]
+
+    return await _cached(("top_products", start, end, limit), load)
+
+
+async def stock_turnover(start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 50) -> List[StockTurnover]:
+    """Rotación = unidades vendidas en el periodo / stock actual, de mayor a menor"""
+    start, end = _range(start, end)
+
+    async def load():
+        sales, stocks = await asyncio.gather(
+            _aggregate("orders", _sales_by_product(start, end)),
+            _aggregate("inventories", [{"$group": {"_id": "$product_id", "stock": {"$sum": "$stock"}}}])
+        )
+        stock_by_product = {row["_id"]: row["stock"] for row in stocks}
+        product_ids = sorted({row["_id"] for row in sales if row["_id"]} | set(stock_by_product))
+        if not product_ids:
+            return []
+
+        sold_by_product = {row["_id"]: row["units"] for row in sales}
+        units = np.array([sold_by_product.get(i, 0) for i in product_ids], dtype=np.float64)
+        stock = np.array([stock_by_product.get(i, 0) for i in product_ids], dtype=np.float64)
+        daily_rate = units / ((end - start).total_seconds() / 86400)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            turnover = np.where(stock > 0, units / stock, np.nan)
+            cover = np.where(daily_rate > 0, stock / daily_rate, np.nan)
+
+        # Sin stock pero con ventas va primero: es lo más urgente de reponer
+        rank = np.where(stock > 0, turnover, np.where(units > 0, np.inf, 0.0))
+        order = np.lexsort((-units, -rank))[:limit]
+        names = {
+            product.product_id: product.name
+            for product in await products_repo.get_many([product_ids[i] for i in order], fields=["name"])
+        }
+
+        def value(x):
+            return None if np.isnan(x) else round(float(x), 3)
+
+        return [
+            StockTurnover.model_construct(
+                product_id=product_ids[i],
+                name=names.get(product_ids[i]),
+                units_sold=int(units[i]),
+                stock=int(stock[i]),
+                turnover=value(turnover[i]),
+                days_of_cover=value(cover[i])
+            )
+            for i in order
+        ]
+
+    return await _cached(("stock_turnover", start, end, limit), load)
+
+
+async def order_value_distribution(start: Optional[datetime] = None, end: Optional[datetime] = None) -> OrderValueDistribution:
+    """Histograma del total por orden con $bucket; los percentiles se interpolan dentro de cada tramo"""
+    start, end = _range(start, end)
+
+    async def load():
+        last = ORDER_VALUE_BOUNDARIES[-1]
+        rows = await _aggregate("orders", [
+            _match(start, end),
+            {"$bucket": {
+                "groupBy": "$total",
+                "boundaries": ORDER_VALUE_BOUNDARIES,
+                "default": last,
+                "output": {"orders": {"$sum": 1}, "revenue": {"$sum": "$total"}, "max": {"$max": "$total"}}
+            }},
+        ])
+        by_lower = {row["_id"]: row for row in rows}
+        lower = np.array(ORDER_VALUE_BOUNDARIES, dtype=np.float64)
+        upper = np.append(lower[1:], by_lower.get(last, {}).get("max", last))
+        counts = np.array([by_lower.get(b, {}).get("orders", 0) for b in ORDER_VALUE_BOUNDARIES], dtype=np.float64)
+        total = int(counts.sum())
+
+        percentiles: Dict[str, float] = {}
+        if total:
+            cumulative = np.cumsum(counts)
+            targets = np.array(PERCENTILES) / 100 * total
+            bucket = np.searchsorted(cumulative, targets, side="left")
+            before = cumulative[bucket] - counts[bucket]
+            fraction = (targets - before) / counts[bucket]
+            values = lower[bucket] + fraction * (upper[bucket] - lower[bucket])
+            percentiles = {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, values)}
+
+        return OrderValueDistribution.model_construct(
+            orders=total,
+            buckets=[
+                OrderValueBucket.model_construct(
+                    min_total=b,
+                    max_total=ORDER_VALUE_BOUNDARIES[i + 1] if i + 1 < len(ORDER_VALUE_BOUNDARIES) else None,
+                    orders=by_lower.get(b, {}).get("orders", 0),
+                    revenue=round(by_lower.get(b, {}).get("revenue", 0.0), 2)
+                )
+                for i, b in enumerate(ORDER_VALUE_BOUNDARIES)
+            ],
+            percentiles=percentiles
+        )
+
+    return await _cached(("order_value_distribution", start, end), load)
@@ -1,41 +1,26 @@
 import logging
 from fastapi import HTTPException
-from bson import ObjectId
+from typing import AsyncIterator, Iterable, List, Optional
 
 from models.catalog import Catalog
-from utils.mongodb import get_collection
+from utils.pagination import DEFAULT_LIMIT, STREAM_BATCH_SIZE
+from utils.repository import Repository
+from utils.cache import TTLCache
+from utils.changefeed import Change, change_feed
+from utils import catalog_view
 
 logger = logging.getLogger(__name__)
 
-async def create_catalog(catalog: Catalog) -> Catalog:
-    try:
-        coll = get_collection("catalogs")
-
-        new_catalog = Catalog(
-            product_id=catalog.product_id,
-            name=catalog.name,
-            availability=catalog.availability
-        )
-
-        catalog_dict = new_catalog.model_dump(exclude={"catalog_id"})
-        inserted = coll.insert_one(catalog_dict)
-        new_catalog.catalog_id = str(inserted.inserted_id)
-        return new_catalog
-
-    except Exception as e:
-        logger.error(f"Error creando catálogo: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error creando catálogo en la base de datos")
-
+catalogs_repo = Repository(Catalog, "catalogs", "catalog_id")
+catalog_cache = TTLCache("catalogs", ttl=120)
 
 async def get_catalog(catalog_id: str) -> Catalog:
     try:
-        coll = get_collection("catalogs")
-        catalog_data = coll.find_one({"_id": ObjectId(catalog_id)})
+        catalog_data = await catalog_cache.get_or_load(catalog_id, lambda: catalogs_repo.get(catalog_id))
         if not catalog_data:
             raise HTTPException(status_code=404, detail="Catálogo no encontrado")
 
-        catalog_data["catalog_id"] = str(catalog_data["_id"])
-        return Catalog.model_validate(catalog_data)
+        return catalog_data
 
     except HTTPException:
         raise
@@ -44,37 +29,49 @@ async def get_catalog(catalog_id: str) -> Catalog:
         raise HTTPException(status_code=500, detail="Error consultando catálogo en la base de datos")
 
 
-async def update_catalog(catalog_id: str, catalog: Catalog) -> Catalog:
+async def list_catalogs(limit: int = DEFAULT_LIMIT, after: Optional[str] = None) -> List[Catalog]:
     try:
-        coll = get_collection("catalogs")
-        update_result = coll.update_one(
-            {"_id": ObjectId(catalog_id)},
-            {"$set": catalog.model_dump(exclude={"catalog_id"})}
-        )
-        if update_result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Catálogo no encontrado para actualizar")
-
-        catalog.catalog_id = catalog_id
-        return catalog
+        return await catalogs_repo.list(limit, after)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error actualizando catálogo: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error actualizando catálogo en la base de datos")
+        logger.error(f"Error listando catálogos: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error consultando catálogos en la base de datos")
+
+
+def stream_catalogs(after: Optional[str] = None, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[bytes]:
+    return catalogs_repo.stream(after, batch_size)
 
 
-async def delete_catalog(catalog_id: str) -> dict:
+async def refresh_catalog(product_ids: Iterable[str]):
+    """Actualiza la vista del catálogo tras cambios en productos o inventario"""
     try:
-        coll = get_collection("catalogs")
-        delete_result = coll.delete_one({"_id": ObjectId(catalog_id)})
-        if delete_result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Catálogo no encontrado para eliminar")
+        for catalog_id in await catalog_view.refresh(product_ids):
+            catalog_cache.invalidate(catalog_id)
+    except Exception as e:
+        # La escritura original ya se aplicó; la entrada se corrige en el próximo refresh o rebuild
+        logger.error(f"Error actualizando vista del catálogo: {str(e)}")
 
-        return {"message": "Catálogo eliminado correctamente"}
 
-    except HTTPException:
-        raise
+async def rebuild_catalog() -> dict:
+    try:
+        await catalog_view.rebuild()
+        catalog_cache.clear()
+        return {"message": "Catálogo regenerado correctamente"}
+
     except Exception as e:
-        logger.error(f"Error eliminando catálogo: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error eliminando catálogo en la base de datos")
+        logger.error(f"Error regenerando catálogo: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error regenerando catálogo en la base de datos")
+
+
+async def on_catalogs_changed(changes: List[Change]):
+    """Cambios hechos por cualquier worker (ver utils.changefeed)"""
+    for change in changes:
+        if change.id is None:
+            catalog_cache.clear()
+            return
+        catalog_cache.invalidate(change.id)
+
+
+change_feed.subscribe("catalogs", on_catalogs_changed)
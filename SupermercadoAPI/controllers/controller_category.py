@@ -1,24 +1,22 @@
 import logging
 from fastapi import HTTPException
-from bson import ObjectId
+from typing import AsyncIterator, List, Optional
 
-from models.category import Category
-from utils.mongodb import get_collection
+from models.category import Category, CategoryCreate, CategoryUpdate, CategoryPatch
+from utils.pagination import DEFAULT_LIMIT, STREAM_BATCH_SIZE
+from utils.repository import Repository
+from utils.cache import TTLCache
+from utils.changefeed import Change, change_feed
+from utils.search import search_index
 
 logger = logging.getLogger(__name__)
 
-async def create_category(category: Category) -> Category:
-    try:
-        coll = get_collection("categories")
-
-        new_category = Category(
-            name=category.name
-        )
+categories_repo = Repository(Category, "categories", "category_id")
+category_cache = TTLCache("categories", ttl=600)
 
-        category_dict = new_category.model_dump(exclude={"category_id"})
-        inserted = coll.insert_one(category_dict)
-        new_category.category_id = str(inserted.inserted_id)
-        return new_category
+async def create_category(category: CategoryCreate) -> Category:
+    try:
+        return await categories_repo.insert(category)
 
     except Exception as e:
         logger.error(f"Error creando categoría: {str(e)}")
@@ -27,13 +25,11 @@ async def create_category(category: Category) -> Category:
 
 async def get_category(category_id: str) -> Category:
     try:
-        coll = get_collection("categories")
-        category_data = coll.find_one({"_id": ObjectId(category_id)})
+        category_data = await category_cache.get_or_load(category_id, lambda: categories_repo.get(category_id))
         if not category_data:
             raise HTTPException(status_code=404, detail="Categoría no encontrada")
 
-        category_data["category_id"] = str(category_data["_id"])
-        return Category.model_validate(category_data)
+        return category_data
 
     except HTTPException:
         raise
@@ -42,18 +38,47 @@ async def get_category(category_id: str) -> Category:
         raise HTTPException(status_code=500, detail="Error consultando categoría en la base de datos")
 
 
-async def update_category(category_id: str, category: Category) -> Category:
+async def list_categories(limit: int = DEFAULT_LIMIT, after: Optional[str] = None) -> List[Category]:
+    try:
+        return await categories_repo.list(limit, after)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listando categorías: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error consultando categorías en la base de datos")
+
+
+def stream_categories(after: Optional[str] = None, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[bytes]:
+    return categories_repo.stream(after, batch_size)
+
+
+async def update_category(category_id: str, category: CategoryUpdate) -> Category:
     try:
-        coll = get_collection("categories")
-        update_result = coll.update_one(
-            {"_id": ObjectId(category_id)},
-            {"$set": category.model_dump(exclude={"category_id"})}
-        )
-        if update_result.matched_count == 0:
+        updated = await categories_repo.update(category_id, category)
+        category_cache.invalidate(category_id)
+        if not updated:
             raise HTTPException(status_code=404, detail="Categoría no encontrada para actualizar")
 
-        category.category_id = category_id
-        return category
+        search_index.set_category(category_id, updated.name)
+        return updated
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error actualizando categoría: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error actualizando categoría en la base de datos")
+
+
+async def patch_category(category_id: str, patch: CategoryPatch) -> Category:
+    try:
+        updated = await categories_repo.patch(category_id, patch.model_dump(exclude_unset=True), patch.version)
+        category_cache.invalidate(category_id)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Categoría no encontrada para actualizar")
+
+        search_index.set_category(category_id, updated.name)
+        return updated
 
     except HTTPException:
         raise
@@ -64,11 +89,12 @@ async def update_category(category_id: str, category: Category) -> Category:
 
 async def delete_category(category_id: str) -> dict:
     try:
-        coll = get_collection("categories")
-        delete_result = coll.delete_one({"_id": ObjectId(category_id)})
-        if delete_result.deleted_count == 0:
+        deleted = await categories_repo.delete(category_id)
+        category_cache.invalidate(category_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Categoría no encontrada para eliminar")
 
+        search_index.set_category(category_id, None)
         return {"message": "Categoría eliminada correctamente"}
 
     except HTTPException:
@@ -76,3 +102,21 @@ async def delete_category(category_id: str) -> dict:
     except Exception as e:
         logger.error(f"Error eliminando categoría: {str(e)}")
         raise HTTPException(status_code=500, detail="Error eliminando categoría en la base de datos")
+
+
+async def on_categories_changed(changes: List[Change]):
+    """Cambios hechos por cualquier worker (ver utils.changefeed)"""
+    for change in changes:
+        if change.id is None:
+            category_cache.clear()
+            if search_index.ready:
+                await search_index.load()
+            return
+        category_cache.invalidate(change.id)
+        if change.op == "delete":
+            search_index.set_category(change.id, None)
+        elif change.fields is not None and "name" in change.fields:
+            search_index.set_category(change.id, change.fields["name"])
+
+
+change_feed.subscribe("categories", on_categories_changed)
@@ -1,27 +1,37 @@
 import logging
+from datetime import datetime
 from fastapi import HTTPException
-from typing import Optional
-from bson import ObjectId
+from typing import Any, AsyncIterator, List, Literal, Optional
 
-from models.inventory import Inventory
-from utils.mongodb import get_collection
+from models.inventory import Inventory, InventoryCreate, InventoryUpdate, InventoryPatch
+from models.movement import Movement, MovementCreate, StockAt
+from models.bulk import BulkItemResult, BulkResult, ImportJob
+from utils.pagination import DEFAULT_LIMIT, MAX_LIMIT, STREAM_BATCH_SIZE, keyset_filter
+from utils.repository import Repository
+from utils.bulk import BULK_CHUNK_SIZE, bulk_create, bulk_delete, succeeded_ids, summary, validate_updates
+from utils import ledger
+from utils.export import EXPORT_BATCH_SIZE, ExportFormat, date_range, export_stream
+from utils.importer import IMPORT_CHUNK_SIZE, ImportFormat, Reference, run_import
+from utils.live import live_hub
+from controllers.controller_catalog import refresh_catalog
 
 logger = logging.getLogger(__name__)
 
-async def create_inventory(inventory: Inventory) -> Inventory:
-    try:
-        coll = get_collection("inventories")
+inventory_repo = Repository(Inventory, "inventories", "inventory_id")
+movements_repo = Repository(Movement, ledger.MOVEMENTS, "movement_id")
 
-        new_inventory = Inventory(
-            product_id=inventory.product_id,
-            stock=inventory.stock,
-            date_in=inventory.date_in,
-            date_out=inventory.date_out
-        )
+INVENTORY_EXPORT_COLUMNS = ["inventory_id", "product_id", "stock", "date_in", "date_out"]
 
-        inventory_dict = new_inventory.model_dump(exclude={"inventory_id"})
-        inserted = coll.insert_one(inventory_dict)
-        new_inventory.inventory_id = str(inserted.inserted_id)
+async def create_inventory(inventory: InventoryCreate) -> Inventory:
+    try:
+        new_inventory = await inventory_repo.insert(inventory)
+        try:
+            await ledger.record(_receipts([new_inventory]))
+        except Exception as e:
+            # El registro ya existe; la diferencia aparece en la conciliación del libro
+            logger.error(f"Error registrando en el libro el alta del inventario {new_inventory.inventory_id}: {str(e)}")
+        live_hub.publish([new_inventory.inventory_id], [new_inventory.product_id])
+        await refresh_catalog([new_inventory.product_id])
         return new_inventory
 
     except Exception as e:
@@ -31,13 +41,11 @@ async def create_inventory(inventory: Inventory) -> Inventory:
 
 async def get_inventory(inventory_id: str) -> Inventory:
     try:
-        coll = get_collection("inventories")
-        inventory_data = coll.find_one({"_id": ObjectId(inventory_id)})
+        inventory_data = await inventory_repo.get(inventory_id)
         if not inventory_data:
             raise HTTPException(status_code=404, detail="Inventario no encontrado")
 
-        inventory_data["inventory_id"] = str(inventory_data["_id"])
-        return Inventory.model_validate(inventory_data)
+        return inventory_data
 
     except HTTPException:
         raise
@@ -46,18 +54,79 @@ async def get_inventory(inventory_id: str) -> Inventory:
         raise HTTPException(status_code=500, detail="Error consultando inventario en la base de datos")
 
 
-async def update_inventory(inventory_id: str, inventory: Inventory) -> Inventory:
+async def list_inventory(limit: int = DEFAULT_LIMIT, after: Optional[str] = None) -> List[Inventory]:
     try:
-        coll = get_collection("inventories")
-        update_result = coll.update_one(
-            {"_id": ObjectId(inventory_id)},
-            {"$set": inventory.model_dump(exclude={"inventory_id"})}
-        )
-        if update_result.matched_count == 0:
+        return await inventory_repo.list(limit, after)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listando inventarios: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error consultando inventarios en la base de datos")
+
+
+def stream_inventory(after: Optional[str] = None, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[bytes]:
+    return inventory_repo.stream(after, batch_size)
+
+
+def export_inventory(
+        fmt: ExportFormat = "csv"
+        , field: Literal["date_in", "date_out"] = "date_in"
+        , start: Optional[datetime] = None
+        , end: Optional[datetime] = None
+        , after: Optional[str] = None
+        , batch_size: int = EXPORT_BATCH_SIZE
+        , compress: bool = False
+) -> AsyncIterator[bytes]:
+    """Registros de inventario cuya fecha `field` cae en [start, end)"""
+    return export_stream(
+        inventory_repo.coll,
+        date_range(field, start, end),
+        inventory_repo.id_field,
+        fmt,
+        INVENTORY_EXPORT_COLUMNS,
+        after=after,
+        batch_size=batch_size,
+        compress=compress
+    )
+
+
+async def update_inventory(inventory_id: str, inventory: InventoryUpdate) -> Inventory:
+    """Reemplaza el registro; un stock distinto queda en el libro como ajuste (conteo físico)"""
+    try:
+        written = await ledger.overwrite(inventory_id, inventory_repo.to_document(inventory))
+        if not written:
+            raise HTTPException(status_code=404, detail="Inventario no encontrado para actualizar")
+
+        before, doc = written
+        updated = inventory_repo.from_document(doc)
+        # Si el registro cambió de producto, el anterior también pierde ese stock
+        live_hub.publish([inventory_id], {before["product_id"], updated.product_id})
+        await refresh_catalog({before["product_id"], updated.product_id})
+        return updated
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error actualizando inventario: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error actualizando inventario en la base de datos")
+
+
+async def patch_inventory(inventory_id: str, patch: InventoryPatch) -> Inventory:
+    """Escribe solo los campos enviados; un cambio de stock queda en el libro como ajuste"""
+    try:
+        changes = patch.model_dump(exclude_unset=True, exclude={"version"})
+        if not changes:
+            raise HTTPException(status_code=400, detail="No se envió ningún campo para actualizar")
+        written = await ledger.overwrite(inventory_id, changes, patch.version)
+        if not written:
             raise HTTPException(status_code=404, detail="Inventario no encontrado para actualizar")
 
-        inventory.inventory_id = inventory_id
-        return inventory
+        before, doc = written
+        updated = inventory_repo.from_document(doc)
+        live_hub.publish([inventory_id], {before["product_id"], updated.product_id})
+        await refresh_catalog({before["product_id"], updated.product_id})
+        return updated
 
     except HTTPException:
         raise
@@ -68,11 +137,14 @@ async def update_inventory(inventory_id: str, inventory: Inventory) -> Inventory
 
 async def delete_inventory(inventory_id: str) -> dict:
     try:
-        coll = get_collection("inventories")
-        delete_result = coll.delete_one({"_id": ObjectId(inventory_id)})
-        if delete_result.deleted_count == 0:
+        inventory = await inventory_repo.get(inventory_id, fields=["product_id"])
+        deleted = await inventory_repo.delete(inventory_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Inventario no encontrado para eliminar")
 
+        live_hub.publish([inventory_id], [inventory.product_id])
+        await refresh_catalog([inventory.product_id])
+
         return {"message": "Inventario eliminado correctamente"}
 
     except HTTPException:
@@ -80,3 +152,152 @@ async def delete_inventory(inventory_id: str) -> dict:
     except Exception as e:
         logger.error(f"Error eliminando inventario: {str(e)}")
         raise HTTPException(status_code=500, detail="Error eliminando inventario en la base de datos")
+
+
+def _product_ids(items: List[Any]) -> set:
+    return {item["product_id"] for item in items if isinstance(item, dict) and isinstance(item.get("product_id"), str)}
+
+
+def _receipts(inventories: List[Inventory]) -> List[dict]:
+    """Entrada inicial en el libro por el stock con el que se crea cada registro"""
+    return [
+        ledger.movement(inventory.inventory_id, inventory.product_id, inventory.stock, "receipt", note="Alta del registro")
+        for inventory in inventories if inventory.stock
+    ]
+
+
+async def bulk_create_inventory(items: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    try:
+        result = await bulk_create(inventory_repo, items, chunk_size)
+        try:
+            await ledger.record(_receipts([
+                Inventory.model_validate(items[item.index]).model_copy(update={"inventory_id": item.id})
+                for item in result.items if item.ok
+            ]))
+        except Exception as e:
+            logger.error(f"Error registrando en el libro las altas masivas de inventario: {str(e)}")
+        live_hub.publish(succeeded_ids(result), _product_ids(items))
+        await refresh_catalog(_product_ids(items))
+        return result
+
+    except Exception as e:
+        logger.error(f"Error en creación masiva de inventarios: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error en la creación masiva de inventarios")
+
+
+async def bulk_update_inventory(items: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    try:
+        results, validated = validate_updates(inventory_repo, items)
+        # Un nuevo stock cuenta como conteo físico: el libro registra la diferencia
+        updated = await ledger.overwrite_many(
+            [(id, inventory_repo.to_document(model)) for _, id, _, model in validated],
+            batch_size=chunk_size
+        )
+        results.extend(
+            BulkItemResult(index=index, id=id, ok=id in updated, error=None if id in updated else "No encontrado")
+            for index, id, _, _ in validated
+        )
+        result = summary(results)
+        # Productos nuevos y los que tenían antes los registros que cambiaron de producto
+        products = _product_ids(items) | set(updated.values())
+        live_hub.publish(updated, products)
+        await refresh_catalog(products)
+        return result
+
+    except Exception as e:
+        logger.error(f"Error en actualización masiva de inventarios: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error en la actualización masiva de inventarios")
+
+
+async def bulk_delete_inventory(items: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    try:
+        affected = await inventory_repo.get_many([i for i in items if isinstance(i, str)], fields=["product_id"])
+        result = await bulk_delete(inventory_repo, items, chunk_size)
+        live_hub.publish(succeeded_ids(result), {inventory.product_id for inventory in affected})
+        await refresh_catalog({inventory.product_id for inventory in affected})
+        return result
+
+    except Exception as e:
+        logger.error(f"Error en eliminación masiva de inventarios: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error en la eliminación masiva de inventarios")
+
+
+async def import_inventory(
+        body: AsyncIterator[bytes]
+        , fmt: ImportFormat
+        , chunk_size: int = IMPORT_CHUNK_SIZE
+        , job_id: Optional[str] = None
+) -> ImportJob:
+    """Importa registros de inventario en streaming; cada product_id debe existir"""
+    async def after_write(ids: List[str], inventories: List[Inventory]):
+        await ledger.record(_receipts([
+            inventory.model_copy(update={"inventory_id": id}) for id, inventory in zip(ids, inventories)
+        ]))
+        live_hub.publish(ids, {inventory.product_id for inventory in inventories})
+        await refresh_catalog({inventory.product_id for inventory in inventories})
+
+    return await run_import(
+        "inventory", inventory_repo, body, fmt,
+        reference=Reference("product_id", "products"),
+        after_write=after_write,
+        chunk_size=chunk_size,
+        job_id=job_id
+    )
+
+
+async def add_movement(inventory_id: str, data: MovementCreate) -> Movement:
+    """Aplica el movimiento al stock con $inc y lo agrega al libro"""
+    try:
+        inventory, entry = await ledger.apply(inventory_id, data.delta, data.kind, note=data.note)
+        live_hub.publish([inventory_id], [inventory["product_id"]])
+        await refresh_catalog([inventory["product_id"]])
+        return movements_repo.from_document(entry)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error registrando movimiento de inventario: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error registrando el movimiento de inventario")
+
+
+async def list_movements(
+        inventory_id: str
+        , limit: int = DEFAULT_LIMIT
+        , after: Optional[str] = None
+        , start: Optional[datetime] = None
+        , end: Optional[datetime] = None
+) -> List[Movement]:
+    """Movimientos de un registro en [start, end), paginados por movement_id"""
+    try:
+        query = {"inventory_id": inventory_id, **keyset_filter(after), **date_range("at", start, end)}
+        cursor = movements_repo.coll.find(query).sort("_id", 1).limit(max(1, min(limit, MAX_LIMIT)))
+        return [movements_repo.from_document(doc) async for doc in cursor]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listando movimientos de inventario: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error consultando movimientos en la base de datos")
+
+
+async def stock_at(at: Optional[datetime] = None, inventory_id: Optional[str] = None, product_id: Optional[str] = None) -> StockAt:
+    """Stock a una fecha desde el checkpoint más cercano y los movimientos posteriores"""
+    if not inventory_id and not product_id:
+        raise HTTPException(status_code=400, detail="Indica inventory_id o product_id")
+    if at is not None and at.tzinfo is not None:
+        raise HTTPException(status_code=400, detail="Las fechas van en UTC y sin zona horaria")
+    try:
+        return StockAt(**await ledger.stock_at(at or datetime.utcnow(), inventory_id, product_id))
+
+    except Exception as e:
+        logger.error(f"Error calculando stock histórico: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error consultando el libro de inventario")
+
+
+async def compact_ledger() -> dict:
+    try:
+        return await ledger.compact()
+
+    except Exception as e:
+        logger.error(f"Error compactando el libro de inventario: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error compactando el libro de inventario")
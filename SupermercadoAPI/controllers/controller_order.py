@@ -1,28 +1,129 @@
 import logging
+from datetime import datetime
 from fastapi import HTTPException
-from typing import List
-from bson import ObjectId
-
-from models.order import Order
-from utils.mongodb import get_collection
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from models.order import Order, OrderItem, CreateOrder, ChangeOrderStatus, OrderPatch
+from controllers.controller_inventory import inventory_repo
+from controllers.controller_product import products_repo
+from controllers.controller_catalog import refresh_catalog
+from utils.pagination import DEFAULT_LIMIT, STREAM_BATCH_SIZE
+from utils.repository import VERSION_FIELD, Repository, to_object_id
+from utils.export import EXPORT_BATCH_SIZE, ExportFormat, date_range, export_stream
+from utils import ledger
+from utils.live import live_hub
+from utils.versions import bump_version
 
 logger = logging.getLogger(__name__)
 
-async def create_order(order: Order) -> Order:
+orders_repo = Repository(Order, "orders", "order_id")
+
+# Una fila por ítem; los datos de la orden se repiten en cada una
+ORDER_EXPORT_COLUMNS = [
+    "order_id", "created_at", "user_id", "status", "total",
+    "inventory_id", "product_id", "quantity", "unit_price"
+]
+
+async def _release_stock(reserved: Dict[str, int]):
+    for inventory_id, quantity in reserved.items():
+        try:
+            await inventory_repo.coll.update_one(
+                {"_id": to_object_id(inventory_id)},
+                {"$inc": {"stock": quantity, VERSION_FIELD: 1}}
+            )
+        except Exception as e:
+            logger.error(f"Error liberando stock de {inventory_id} ({quantity}): {str(e)}")
+    if reserved:
+        await _stock_changed(reserved)
+
+
+async def _stock_changed(inventory_ids: Iterable[str]):
+    """Una vez por orden: versión de inventarios (sondeo de otros workers) y avisos en tiempo real locales"""
+    await bump_version(inventory_repo.collection)
+    live_hub.publish(inventory_ids)
+
+
+async def _reserve_stock(quantities: Dict[str, int]) -> Dict[str, int]:
+    """Descuenta el stock solo si alcanza; si algún ítem falla se devuelve lo ya reservado"""
+    reserved: Dict[str, int] = {}
+    try:
+        # Orden fijo para que dos checkouts con los mismos ítems compitan igual
+        for inventory_id, quantity in sorted(quantities.items()):
+            result = await inventory_repo.coll.update_one(
+                {"_id": to_object_id(inventory_id), "stock": {"$gte": quantity}},
+                {"$inc": {"stock": -quantity, VERSION_FIELD: 1}}
+            )
+            if result.modified_count == 0:
+                raise HTTPException(status_code=409, detail=f"Stock insuficiente para el inventario {inventory_id}")
+            reserved[inventory_id] = quantity
+    except BaseException:
+        await _release_stock(reserved)
+        raise
+    await _stock_changed(reserved)
+    return reserved
+
+
+async def create_order(order: CreateOrder, user_id: str) -> Order:
+    quantities: Dict[str, int] = {}
+    for item in order.items:
+        quantities[item.inventory_id] = quantities.get(item.inventory_id, 0) + item.quantity
+
     try:
-        coll = get_collection("orders")
+        inventories = {
+            inventory.inventory_id: inventory
+            for inventory in await inventory_repo.get_many(quantities, fields=["product_id"])
+        }
+        missing = [inventory_id for inventory_id in quantities if inventory_id not in inventories]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Inventario no encontrado: {', '.join(missing)}")
+
+        prices = {
+            product.product_id: product.price
+            for product in await products_repo.get_many(
+                {inventory.product_id for inventory in inventories.values()}, fields=["price"]
+            )
+        }
+        items = []
+        for inventory_id, quantity in quantities.items():
+            product_id = inventories[inventory_id].product_id
+            if product_id not in prices:
+                raise HTTPException(status_code=404, detail=f"Producto no encontrado: {product_id}")
+            items.append(OrderItem(
+                inventory_id=inventory_id,
+                quantity=quantity,
+                product_id=product_id,
+                unit_price=prices[product_id]
+            ))
 
         new_order = Order(
-            user_id=order.user_id,
-            inventory_id=order.inventory_id,
-            total=order.total
+            user_id=user_id,
+            inventory_id=list(quantities),
+            items=items,
+            total=round(sum(item.unit_price * item.quantity for item in items), 2),
+            created_at=datetime.utcnow()
         )
 
-        order_dict = new_order.model_dump(exclude={"order_id"})
-        inserted = coll.insert_one(order_dict)
-        new_order.order_id = str(inserted.inserted_id)
-        return new_order
+        reserved = await _reserve_stock(quantities)
+        try:
+            created = await orders_repo.insert(new_order)
+        except BaseException:
+            await _release_stock(reserved)
+            raise
+
+        try:
+            await ledger.record([
+                ledger.movement(item.inventory_id, item.product_id, -item.quantity, "sale", ref=created.order_id, at=created.created_at)
+                for item in items
+            ])
+        except Exception as e:
+            # La orden ya está confirmada; la diferencia aparece en la conciliación del libro
+            logger.error(f"Error registrando en el libro las ventas de la orden {created.order_id}: {str(e)}")
+
+        await refresh_catalog({item.product_id for item in items})
+        return created
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creando orden: {str(e)}")
         raise HTTPException(status_code=500, detail="Error creando orden en la base de datos")
@@ -30,13 +131,11 @@ async def create_order(order: Order) -> Order:
 
 async def get_order(order_id: str) -> Order:
     try:
-        coll = get_collection("orders")
-        order_data = coll.find_one({"_id": ObjectId(order_id)})
+        order_data = await orders_repo.get(order_id)
         if not order_data:
             raise HTTPException(status_code=404, detail="Orden no encontrada")
 
-        order_data["order_id"] = str(order_data["_id"])
-        return Order.model_validate(order_data)
+        return order_data
 
     except HTTPException:
         raise
@@ -45,18 +144,89 @@ async def get_order(order_id: str) -> Order:
         raise HTTPException(status_code=500, detail="Error consultando orden en la base de datos")
 
 
+async def get_orders(limit: int = DEFAULT_LIMIT, after: Optional[str] = None) -> List[Order]:
+    try:
+        return await orders_repo.list(limit, after)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listando órdenes: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error consultando órdenes en la base de datos")
+
+
+def stream_orders(after: Optional[str] = None, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[bytes]:
+    return orders_repo.stream(after, batch_size)
+
+
+def _order_rows(doc: dict) -> List[list]:
+    head = [doc.get(column) for column in ORDER_EXPORT_COLUMNS[:5]]
+    items = doc.get("items") or [{}]
+    return [head + [item.get(column) for column in ORDER_EXPORT_COLUMNS[5:]] for item in items]
+
+
+def export_orders(
+        fmt: ExportFormat = "csv"
+        , start: Optional[datetime] = None
+        , end: Optional[datetime] = None
+        , after: Optional[str] = None
+        , batch_size: int = EXPORT_BATCH_SIZE
+        , compress: bool = False
+) -> AsyncIterator[bytes]:
+    """Órdenes creadas en [start, end), en CSV (una fila por ítem) o NDJSON"""
+    return export_stream(
+        orders_repo.coll,
+        date_range("created_at", start, end),
+        orders_repo.id_field,
+        fmt,
+        ORDER_EXPORT_COLUMNS,
+        rows=_order_rows,
+        after=after,
+        batch_size=batch_size,
+        compress=compress
+    )
+
+
 async def update_order(order_id: str, order: Order) -> Order:
     try:
-        coll = get_collection("orders")
-        update_result = coll.update_one(
-            {"_id": ObjectId(order_id)},
-            {"$set": order.model_dump(exclude={"order_id"})}
-        )
-        if update_result.matched_count == 0:
+        updated = await orders_repo.update(order_id, order)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Orden no encontrada para actualizar")
+
+        live_hub.publish(order_ids=[order_id])
+        return updated
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error actualizando orden: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error actualizando orden en la base de datos")
+
+
+async def update_order_status(order_id: str, status: ChangeOrderStatus) -> Order:
+    try:
+        updated = await orders_repo.update(order_id, status)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Orden no encontrada para actualizar")
+
+        live_hub.publish(order_ids=[order_id])
+        return updated
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error actualizando estado de la orden: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error actualizando orden en la base de datos")
+
+
+async def patch_order(order_id: str, patch: OrderPatch) -> Order:
+    try:
+        updated = await orders_repo.patch(order_id, patch.model_dump(exclude_unset=True), patch.version)
+        if not updated:
             raise HTTPException(status_code=404, detail="Orden no encontrada para actualizar")
 
-        order.order_id = order_id
-        return order
+        live_hub.publish(order_ids=[order_id])
+        return updated
 
     except HTTPException:
         raise
@@ -67,11 +237,11 @@ async def update_order(order_id: str, order: Order) -> Order:
 
 async def delete_order(order_id: str) -> dict:
     try:
-        coll = get_collection("orders")
-        delete_result = coll.delete_one({"_id": ObjectId(order_id)})
-        if delete_result.deleted_count == 0:
+        deleted = await orders_repo.delete(order_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Orden no encontrada para eliminar")
 
+        live_hub.publish(order_ids=[order_id])
         return {"message": "Orden eliminada correctamente"}
 
     except HTTPException:
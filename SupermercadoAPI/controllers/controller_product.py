@@ -1,25 +1,28 @@
 import logging
 from fastapi import HTTPException
-from bson import ObjectId
-
-from models.product import Product
-from utils.mongodb import get_collection
+from typing import Any, AsyncIterator, List, Optional
+
+from models.product import Product, ProductCreate, ProductUpdate, ProductPatch
+from models.bulk import BulkResult, ImportJob
+from utils.pagination import DEFAULT_LIMIT, STREAM_BATCH_SIZE
+from utils.repository import Repository
+from utils.bulk import BULK_CHUNK_SIZE, bulk_create, bulk_update, bulk_delete, succeeded_ids
+from utils.cache import TTLCache
+from utils.changefeed import Change, change_feed
+from utils.importer import IMPORT_CHUNK_SIZE, ImportFormat, Reference, run_import
+from utils.search import SEARCH_DEFAULT_LIMIT, SEARCH_INDEX_ENABLED, search_index, text_search
+from controllers.controller_catalog import refresh_catalog
 
 logger = logging.getLogger(__name__)
 
-async def create_product(product: Product) -> Product:
-    try:
-        coll = get_collection("products")
-
-        new_product = Product(
-            name=product.name,
-            price=product.price,
-            category_id=product.category_id
-        )
+products_repo = Repository(Product, "products", "product_id")
+product_cache = TTLCache("products", ttl=300)
 
-        product_dict = new_product.model_dump(exclude={"product_id"})
-        inserted = coll.insert_one(product_dict)
-        new_product.product_id = str(inserted.inserted_id)
+async def create_product(product: ProductCreate) -> Product:
+    try:
+        new_product = await products_repo.insert(product)
+        search_index.upsert(new_product.product_id, new_product.name, new_product.price, new_product.category_id, new_product.version)
+        await refresh_catalog([new_product.product_id])
         return new_product
 
     except Exception as e:
@@ -29,13 +32,11 @@ async def create_product(product: Product) -> Product:
 
 async def get_product(product_id: str) -> Product:
     try:
-        coll = get_collection("products")
-        product_data = coll.find_one({"_id": ObjectId(product_id)})
+        product_data = await product_cache.get_or_load(product_id, lambda: products_repo.get(product_id))
         if not product_data:
             raise HTTPException(status_code=404, detail="Producto no encontrado")
 
-        product_data["product_id"] = str(product_data["_id"])
-        return Product.model_validate(product_data)
+        return product_data
 
     except HTTPException:
         raise
@@ -44,18 +45,70 @@ async def get_product(product_id: str) -> Product:
         raise HTTPException(status_code=500, detail="Error consultando producto en la base de datos")
 
 
-async def update_product(product_id: str, product: Product) -> Product:
+async def list_products(limit: int = DEFAULT_LIMIT, after: Optional[str] = None) -> List[Product]:
+    try:
+        return await products_repo.list(limit, after)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listando productos: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error consultando productos en la base de datos")
+
+
+async def search_products(
+        q: str = ""
+        , category_id: Optional[str] = None
+        , min_price: Optional[float] = None
+        , max_price: Optional[float] = None
+        , limit: int = SEARCH_DEFAULT_LIMIT
+) -> List[Product]:
+    """Busca por prefijos del nombre o la categoría; sin índice en memoria usa el índice de texto de Mongo"""
+    try:
+        if SEARCH_INDEX_ENABLED and search_index.ready:
+            results = search_index.search(q, category_id, min_price, max_price, limit)
+        else:
+            results = await text_search(q, category_id, min_price, max_price, limit)
+        return [Product.model_construct(**result) for result in results]
+
+    except Exception as e:
+        logger.error(f"Error buscando productos: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error buscando productos en la base de datos")
+
+
+def stream_products(after: Optional[str] = None, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[bytes]:
+    return products_repo.stream(after, batch_size)
+
+
+async def update_product(product_id: str, product: ProductUpdate) -> Product:
+    try:
+        updated = await products_repo.update(product_id, product)
+        product_cache.invalidate(product_id)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Producto no encontrado para actualizar")
+
+        search_index.upsert(product_id, updated.name, updated.price, updated.category_id, updated.version)
+        await refresh_catalog([product_id])
+        return updated
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error actualizando producto: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error actualizando producto en la base de datos")
+
+
+async def patch_product(product_id: str, patch: ProductPatch) -> Product:
+    """Escribe solo los campos enviados; con `version` falla con 409 si el producto cambió"""
     try:
-        coll = get_collection("products")
-        update_result = coll.update_one(
-            {"_id": ObjectId(product_id)},
-            {"$set": product.model_dump(exclude={"product_id"})}
-        )
-        if update_result.matched_count == 0:
+        updated = await products_repo.patch(product_id, patch.model_dump(exclude_unset=True), patch.version)
+        product_cache.invalidate(product_id)
+        if not updated:
             raise HTTPException(status_code=404, detail="Producto no encontrado para actualizar")
 
-        product.product_id = product_id
-        return product
+        search_index.upsert(product_id, updated.name, updated.price, updated.category_id, updated.version)
+        await refresh_catalog([product_id])
+        return updated
 
     except HTTPException:
         raise
@@ -66,11 +119,13 @@ async def update_product(product_id: str, product: Product) -> Product:
 
 async def delete_product(product_id: str) -> dict:
     try:
-        coll = get_collection("products")
-        delete_result = coll.delete_one({"_id": ObjectId(product_id)})
-        if delete_result.deleted_count == 0:
+        deleted = await products_repo.delete(product_id)
+        product_cache.invalidate(product_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Producto no encontrado para eliminar")
 
+        search_index.remove(product_id)
+        await refresh_catalog([product_id])
         return {"message": "Producto eliminado correctamente"}
 
     except HTTPException:
@@ -78,3 +133,95 @@ async def delete_product(product_id: str) -> dict:
     except Exception as e:
         logger.error(f"Error eliminando producto: {str(e)}")
         raise HTTPException(status_code=500, detail="Error eliminando producto en la base de datos")
+
+
+async def bulk_create_products(items: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    try:
+        result = await bulk_create(products_repo, items, chunk_size)
+        await search_index.refresh(succeeded_ids(result))
+        await refresh_catalog(succeeded_ids(result))
+        return result
+
+    except Exception as e:
+        logger.error(f"Error en creación masiva de productos: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error en la creación masiva de productos")
+
+
+async def bulk_update_products(items: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    try:
+        result = await bulk_update(products_repo, items, chunk_size)
+        for id in succeeded_ids(result):
+            product_cache.invalidate(id)
+        await search_index.refresh(succeeded_ids(result))
+        await refresh_catalog(succeeded_ids(result))
+        return result
+
+    except Exception as e:
+        logger.error(f"Error en actualización masiva de productos: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error en la actualización masiva de productos")
+
+
+async def bulk_delete_products(items: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    try:
+        result = await bulk_delete(products_repo, items, chunk_size)
+        for id in succeeded_ids(result):
+            product_cache.invalidate(id)
+        for id in succeeded_ids(result):
+            search_index.remove(id)
+        await refresh_catalog(succeeded_ids(result))
+        return result
+
+    except Exception as e:
+        logger.error(f"Error en eliminación masiva de productos: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error en la eliminación masiva de productos")
+
+
+async def import_products(
+        body: AsyncIterator[bytes]
+        , fmt: ImportFormat
+        , chunk_size: int = IMPORT_CHUNK_SIZE
+        , job_id: Optional[str] = None
+) -> ImportJob:
+    """Importa productos en streaming; cada category_id debe existir"""
+    async def after_write(ids: List[str], products: List[Product]):
+        for id, product in zip(ids, products):
+            search_index.upsert(id, product.name, product.price, product.category_id, product.version)
+        await refresh_catalog(ids)
+
+    return await run_import(
+        "products", products_repo, body, fmt,
+        reference=Reference("category_id", "categories"),
+        after_write=after_write,
+        chunk_size=chunk_size,
+        job_id=job_id
+    )
+
+
+# `version` también: las búsquedas la devuelven para hacer PATCH condicionado
+INDEXED_FIELDS = {"name", "price", "category_id", "version"}
+
+
+async def on_products_changed(changes: List[Change]):
+    """Cambios hechos por cualquier worker (ver utils.changefeed)"""
+    stale = []
+    for change in changes:
+        if change.id is None:
+            product_cache.clear()
+            if SEARCH_INDEX_ENABLED:
+                await search_index.load()
+            return
+        product_cache.invalidate(change.id)
+        if not search_index.ready:
+            continue
+        if change.op == "delete":
+            search_index.remove(change.id)
+        elif change.op in ("insert", "replace") and change.fields is not None:
+            fields = change.fields
+            search_index.upsert(change.id, fields.get("name", ""), fields.get("price", 0.0), fields.get("category_id", ""), fields.get("version") or 0)
+        elif change.fields is None or INDEXED_FIELDS & change.fields.keys():
+            stale.append(change.id)
+    if stale:
+        await search_index.refresh(stale)
+
+
+change_feed.subscribe("products", on_products_changed)
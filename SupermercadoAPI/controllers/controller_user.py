@@ -1,31 +1,27 @@
-import os
 import logging
-import firebase_admin
-import requests
 from fastapi import HTTPException
-from firebase_admin import credentials, auth as firebase_auth
+from typing import AsyncIterator, List, Optional
 
-from models.user import User
+from models.user import User, UserCreate, UserUpdate, UserPatch
 from models.login import Login
 
 from utils.security import create_jwt_token
-from utils.mongodb import get_collection
+from utils.identity import IdentityError, IdentityUnavailable, get_identity_provider
+from utils.pagination import DEFAULT_LIMIT, STREAM_BATCH_SIZE
+from utils.repository import Repository
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-cred = credentials.Certificate("secrets/firebase.json")
-firebase_admin.initialize_app(cred)
+# La contraseña vive en Firebase: nunca se guarda en Mongo y se devuelve enmascarada
+users_repo = Repository(User, "users", "id", write_exclude={"password"}, read_defaults={"password": "*********"})
 
-async def create_user( user: User ) -> User:
+async def create_user( user: UserCreate, allow_roles: bool = False ) -> User:
 
-    user_record = {}
+    identity = get_identity_provider()
     try:
-        user_record = firebase_auth.create_user(
-            email=user.email
-            , password=user.password
-        )
-    except Exception as e:
+        uid = await identity.create_user(user.email, user.password)
+    except IdentityError as e:
         logger.warning( e )
         raise HTTPException(
             status_code=400
@@ -33,49 +29,116 @@ async def create_user( user: User ) -> User:
         )
 
     try:
-        coll = get_collection("users")
+        # En el registro público los permisos nunca se toman del cliente
+        if not allow_roles:
+            user = user.model_copy(update={"active": True, "admin": False})
+        new_user = await users_repo.insert(user)
+        return new_user.model_copy(update={"password": "*********"})  # Mask the password in the response
 
-  
+    except Exception as e:
+        logger.error(f"Error creating user: {str(e)}")
+        try:
+            await identity.delete_user(uid)
+        except Exception as cleanup:
+            # No debe tapar el error original; el usuario queda huérfano en el proveedor de identidad
+            logger.error(f"Error eliminando el usuario {uid} del proveedor de identidad tras el fallo: {str(cleanup)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-        new_user = User(
-            name=user.name
-            , lastname=user.lastname
-            , email=user.email
-            , password=user.password
-        )
 
-        user_dict = new_user.model_dump(exclude={"id", "password"})
-        inserted = coll.insert_one(user_dict)
-        new_user.id = str(inserted.inserted_id)
-        new_user.password = "*********"  # Mask the password in the response
-        return new_user
+async def get_user(user_id: str) -> User:
+    try:
+        user = await users_repo.get(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+        return user
 
+    except HTTPException:
+        raise
     except Exception as e:
-        firebase_auth.delete_user(user_record.uid)
-        logger.error(f"Error creating user: {str(e)}")
+        logger.error(f"Error getting user: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+async def list_users(limit: int = DEFAULT_LIMIT, after: Optional[str] = None) -> List[User]:
+    try:
+        return await users_repo.list(limit, after)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing users: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def stream_users(after: Optional[str] = None, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[bytes]:
+    return users_repo.stream(after, batch_size)
+
+
+async def update_user(user_id: str, user: UserUpdate) -> User:
+    try:
+        updated = await users_repo.update(user_id, user)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado para actualizar")
+
+        return updated
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating user: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+async def patch_user(user_id: str, patch: UserPatch) -> User:
+    try:
+        updated = await users_repo.patch(user_id, patch.model_dump(exclude_unset=True), patch.version)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado para actualizar")
+
+        return updated
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating user: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+async def delete_user(user_id: str) -> dict:
+    try:
+        deleted = await users_repo.delete(user_id)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado para eliminar")
+
+        return {"message": "Usuario eliminado correctamente"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting user: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 async def login(user: Login) -> dict:
-    api_key = os.getenv("FIREBASE_API_KEY")
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
-    payload = {
-        "email": user.email
-        , "password": user.password
-        , "returnSecureToken": True
-    }
-
-    response = requests.post(url, json=payload)
-    response_data = response.json()
-
-    if "error" in response_data:
+    try:
+        await get_identity_provider().sign_in(user.email, user.password)
+    except IdentityUnavailable as e:
+        logger.error(f"Proveedor de identidad no disponible: {str(e)}")
+        raise HTTPException(
+            status_code=503
+            , detail="Servicio de autenticación no disponible"
+        )
+    except IdentityError:
         raise HTTPException(
             status_code=400
             , detail="Error al autenticar usuario"
         )
 
-    coll = get_collection("users")
-    user_info = coll.find_one({ "email": user.email })
+    user_info = await users_repo.find_one(
+        { "email": user.email }
+        , fields=["name", "lastname", "email", "active", "admin"]
+    )
 
     if not user_info:
         raise HTTPException(
@@ -86,11 +149,11 @@ async def login(user: Login) -> dict:
     return {
         "message": "Usuario Autenticado correctamente"
         , "idToken": create_jwt_token(
-            user_info["name"]
-            , user_info["lastname"]
-            , user_info["email"]
-            , user_info["active"]
-            , user_info["admin"]
-            , str(user_info["_id"])
+            user_info.name
+            , user_info.lastname
+            , user_info.email
+            , user_info.active
+            , user_info.admin
+            , user_info.id
         )
     }
\ No newline at end of file
@@ -1,39 +1,121 @@
+import time
+_IMPORT_START = time.perf_counter()
+
+import os
+import sys
+import json
 import uvicorn
+import asyncio
 import logging
+import importlib
 
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 
-from controllers.controller_user import create_user, login
+from controllers.controller_user import login
 
-from models.user import User
 from models.login import Login
 
 from utils.security import validateuser, validateadmin
-
-
-app = FastAPI(
-    title="API REST - Tienda",
-    description="Sistema de gestión: users, products, category, inventory, catálog y order",
-    version="1.0.0"
-)
+from utils.mongodb import init_client, close_client, health_probe, is_healthy
+from utils.indexes import ensure_indexes
+from utils.cache import cache_stats
+from utils.responses import FastJSONResponse
+from utils.identity import close_identity_provider
+from utils.search import SEARCH_INDEX_ENABLED, search_index
+from utils.changefeed import CHANGE_FEED_ENABLED, change_feed
+from utils.live import live_hub
+from utils.metrics import MetricsMiddleware, render as render_metrics
+from utils.ledger import CHECKPOINT_INTERVAL, compaction_loop
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@app.get("/")
+# Tiempos de arranque en milisegundos (importaciones, create_app y lifespan)
+STARTUP_TIMINGS: Dict[str, float] = {
+    "import main": round((time.perf_counter() - _IMPORT_START) * 1000, 3)
+}
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+ROUTERS = [
+    "routes.routes_user",
+    "routes.routes_category",
+    "routes.routes_product",
+    "routes.routes_inventory",
+    "routes.routes_catalog",
+    "routes.routes_order",
+    "routes.routes_analytics",
+    "routes.routes_import",
+    "routes.routes_live",
+]
+
+
+@contextmanager
+def timed(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[phase] = round((time.perf_counter() - start) * 1000, 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with timed("lifespan: mongodb client"):
+        init_client()
+    with timed("lifespan: indexes"):
+        await ensure_indexes()
+    if SEARCH_INDEX_ENABLED:
+        with timed("lifespan: search index"):
+            await search_index.load()
+    # El ping corre en segundo plano para no retrasar el arranque
+    probe = asyncio.create_task(health_probe())
+    compaction = asyncio.create_task(compaction_loop()) if CHECKPOINT_INTERVAL > 0 else None
+    # Avisos de escrituras de otros workers para invalidar cachés e índice local
+    feed = asyncio.create_task(change_feed.run()) if CHANGE_FEED_ENABLED else None
+    live = asyncio.create_task(live_hub.run())
+    logger.info(f"Tiempos de arranque (ms): {STARTUP_TIMINGS}")
+    yield
+    tasks = [task for task in (probe, compaction, feed, live) if task is not None]
+    for task in tasks:
+        task.cancel()
+    # Que terminen su limpieza antes de cerrar el cliente de Mongo
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await close_identity_provider()
+    await close_client()
+
+
+root_router = APIRouter()
+
+@root_router.get("/")
 async def read_root():
     return {"message": "Bienvenido a la API REST de la Tienda", "version": "0.0.0"}
 
-@app.post("/users", response_model=User)
-async def create_user_endpoint(user: User) -> User:
-    return await create_user(user)
+@root_router.get("/health")
+async def health():
+    return {"mongodb": "ok" if is_healthy() else "down", "change_feed": change_feed.mode}
 
-@app.post("/login")
+@root_router.get("/cache/stats")
+@validateadmin
+async def read_cache_stats(request: Request):
+    return cache_stats()
+
+@root_router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Exposición para Prometheus; con METRICS_TOKEN definido exige ese bearer token"""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return PlainTextResponse(render_metrics(cache_stats()), media_type="text/plain; version=0.0.4")
+
+@root_router.post("/login")
 async def login_access(l: Login) -> dict:
     return await login(l)
 
-@app.get("/exampleadmin")
+@root_router.get("/exampleadmin")
 @validateadmin
 async def example_admin(request: Request):
     return {
@@ -41,7 +123,7 @@ async def example_admin(request: Request):
         "admin": request.state.admin
     }
 
-@app.get("/exampleuser")
+@root_router.get("/exampleuser")
 @validateuser
 async def example_user(request: Request):
     return {
@@ -49,5 +131,40 @@ async def example_user(request: Request):
         "email": request.state.email
     }
 
+
+def create_app() -> FastAPI:
+    with timed("create_app"):
+        app = FastAPI(
+            title="API REST - Tienda",
+            description="Sistema de gestión: users, products, category, inventory, catálog y order",
+            version="1.0.0",
+            lifespan=lifespan,
+            default_response_class=FastJSONResponse
+        )
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(root_router)
+
+        for module_name in ROUTERS:
+            with timed(f"import {module_name}"):
+                module = importlib.import_module(module_name)
+            app.include_router(module.router)
+
+    return app
+
+
+app = create_app()
+
+
+async def profile_startup():
+    """Ejecuta el arranque completo sin servir peticiones y reporta los tiempos"""
+    with timed("lifespan"):
+        async with lifespan(app):
+            pass
+    print(json.dumps(STARTUP_TIMINGS, indent=2))
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    if "--profile-startup" in sys.argv[1:]:
+        asyncio.run(profile_startup())
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
@@ -0,0 +1,45 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+
+class DailyRevenue(BaseModel):
+    day: str = Field(description="Día (UTC) en formato AAAA-MM-DD", examples=["2025-07-30"])
+    revenue: float = Field(description="Ingresos de las órdenes no canceladas del día")
+    orders: int = Field(description="Número de órdenes del día")
+    moving_average: float = Field(description="Media móvil de los ingresos en la ventana pedida")
+
+
+class CategoryRevenue(BaseModel):
+    category_id: Optional[str] = Field(default=None, description="None agrupa productos que ya no existen")
+    name: Optional[str] = None
+    revenue: float
+    units: int
+
+
+class ProductSales(BaseModel):
+    product_id: str
+    name: Optional[str] = None
+    revenue: float
+    units: int
+
+
+class StockTurnover(BaseModel):
+    product_id: str
+    name: Optional[str] = None
+    units_sold: int = Field(description="Unidades vendidas en el periodo")
+    stock: int = Field(description="Stock actual sumando todos sus inventarios")
+    turnover: Optional[float] = Field(default=None, description="Unidades vendidas / stock actual; None si no hay stock")
+    days_of_cover: Optional[float] = Field(default=None, description="Días que dura el stock al ritmo de venta del periodo")
+
+
+class OrderValueBucket(BaseModel):
+    min_total: float
+    max_total: Optional[float] = Field(default=None, description="None en el último tramo (sin límite superior)")
+    orders: int
+    revenue: float
+
+
+class OrderValueDistribution(BaseModel):
+    orders: int
+    buckets: List[OrderValueBucket]
+    percentiles: Dict[str, float] = Field(description="Percentiles aproximados del total por orden, interpolados en los tramos")
@@ -0,0 +1,49 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
+from datetime import datetime
+
+
+class BulkItemResult(BaseModel):
+    index: int = Field(
+        description="Posición del elemento en el arreglo (o línea NDJSON) enviado"
+    )
+
+    id: Optional[str] = Field(
+        default=None,
+        description="ID del documento creado, actualizado o eliminado"
+    )
+
+    ok: bool = Field(
+        description="Indica si la operación del elemento se aplicó"
+    )
+
+    error: Optional[str] = Field(
+        default=None,
+        description="Motivo del fallo cuando ok es false"
+    )
+
+
+class BulkResult(BaseModel):
+    total: int = Field(ge=0)
+    succeeded: int = Field(ge=0)
+    failed: int = Field(ge=0)
+    items: List[BulkItemResult]
+
+
+class ImportJob(BaseModel):
+    job_id: str
+    kind: Literal["products", "inventory"]
+    status: Literal["running", "done", "failed"] = "running"
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+    rows: int = Field(default=0, description="Filas leídas hasta ahora")
+    succeeded: int = Field(default=0, description="Filas insertadas")
+    failed: int = Field(default=0, description="Filas rechazadas por validación, referencias o escritura")
+
+    errors: List[BulkItemResult] = Field(
+        default_factory=list,
+        description="Filas con error (index = número de fila de datos, desde 0); se guarda un máximo por trabajo"
+    )
+    errors_truncated: bool = False
+    error: Optional[str] = Field(default=None, description="Motivo si el trabajo completo falló")
@@ -1,12 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 
-class Catalog(BaseModel):
-    catalog_id: Optional[str] = Field(
-        default=None,
-        description="MongoDB ID - Se genera automáticamente desde el _id de MongoDB, no es necesario enviarlo en POST"
-    )
-
+class CatalogBase(BaseModel):
     product_id: str = Field(
         description="Referencia al producto",
         examples=["64bfe234c9e12ab3456def78"]
@@ -22,3 +17,20 @@ class Catalog(BaseModel):
         default=True,
         description="Disponibilidad del producto en la tienda (con stock o sin stock)"
     )
+
+
+class Catalog(CatalogBase):
+    catalog_id: Optional[str] = Field(
+        default=None,
+        description="MongoDB ID - Es el mismo _id del producto; el catálogo solo lo escribe la vista materializada"
+    )
+
+    version: int = Field(
+        default=0,
+        description="Versión del documento; aumenta cada vez que la vista recalcula la entrada"
+    )
+
+    stock: Optional[int] = Field(
+        default=None,
+        description="Stock total del producto en inventario - Lo calcula la vista materializada del catálogo"
+    )
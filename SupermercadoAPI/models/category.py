@@ -1,14 +1,33 @@
 from pydantic import BaseModel, Field
 from typing import Optional
+from models.patch import partial
 
-class Category(BaseModel):
+class CategoryBase(BaseModel):
+    name: str = Field(
+        description="Nombre de la categoría",
+        pattern=r"^[A-Za-zÁÉÍÓÚÜÑáéíóúüñ' -]+$",
+        examples=["Electrónica", "Hogar y Cocina"]
+    )
+
+
+class Category(CategoryBase):
     category_id: Optional[str] = Field(
         default=None,
         description="MongoDB ID - Se genera automáticamente desde el _id de MongoDB, no es necesario enviarlo en POST"
     )
 
-    name: str = Field(
-        description="Nombre de la categoría",
-        pattern=r"^[A-Za-zÁÉÍÓÚÜÑáéíóúüñ' -]+$",
-        examples=["Electrónica", "Hogar y Cocina"]
+    version: int = Field(
+        default=0,
+        description="Versión del documento; aumenta con cada escritura (control de concurrencia en PATCH)"
     )
+
+
+class CategoryCreate(CategoryBase):
+    pass
+
+
+class CategoryUpdate(CategoryBase):
+    pass
+
+
+CategoryPatch = partial(CategoryBase, "CategoryPatch")
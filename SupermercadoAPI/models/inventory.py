@@ -1,13 +1,9 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
+from models.patch import partial
 
-class Inventory(BaseModel):
-    inventory_id: Optional[str] = Field(
-        default=None,
-        description="MongoDB ID - Se genera automáticamente desde el _id de MongoDB, no es necesario enviarlo en POST"
-    )
-
+class InventoryBase(BaseModel):
     product_id: str = Field(
         description="ID del producto al que pertenece este inventario",
         examples=["64bfe234c9e12ab3456def78"]
@@ -30,3 +26,26 @@ class Inventory(BaseModel):
         description="Fecha en que el producto salió del inventario",
         examples=["2025-08-01T10:00:00"]
     )
+
+
+class Inventory(InventoryBase):
+    inventory_id: Optional[str] = Field(
+        default=None,
+        description="MongoDB ID - Se genera automáticamente desde el _id de MongoDB, no es necesario enviarlo en POST"
+    )
+
+    version: int = Field(
+        default=0,
+        description="Versión del documento; aumenta con cada escritura (control de concurrencia en PATCH)"
+    )
+
+
+class InventoryCreate(InventoryBase):
+    pass
+
+
+class InventoryUpdate(InventoryBase):
+    pass
+
+
+InventoryPatch = partial(InventoryBase, "InventoryPatch")
@@ -0,0 +1,69 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Literal
+from datetime import datetime
+
+MovementKind = Literal["receipt", "sale", "return", "adjustment"]
+
+
+class MovementCreate(BaseModel):
+    kind: MovementKind = Field(
+        description="receipt (entrada), sale (venta), return (devolución) o adjustment (ajuste o conteo)",
+        examples=["receipt"]
+    )
+
+    delta: int = Field(
+        description="Cambio de stock con signo: positivo en entradas y devoluciones, negativo en ventas",
+        examples=[24, -3]
+    )
+
+    note: Optional[str] = Field(
+        default=None,
+        max_length=200,
+        description="Comentario libre (motivo del ajuste, proveedor...)"
+    )
+
+    @model_validator(mode="after")
+    def validate_sign(self):
+        if self.delta == 0:
+            raise ValueError("El movimiento debe cambiar el stock (delta distinto de 0).")
+        if self.kind in ("receipt", "return") and self.delta < 0:
+            raise ValueError("Las entradas y devoluciones deben tener delta positivo.")
+        if self.kind == "sale" and self.delta > 0:
+            raise ValueError("Las ventas deben tener delta negativo.")
+        return self
+
+
+class Movement(MovementCreate):
+    movement_id: Optional[str] = Field(
+        default=None,
+        description="MongoDB ID - Se genera automáticamente desde el _id de MongoDB"
+    )
+
+    inventory_id: str = Field(
+        description="Registro de inventario afectado"
+    )
+
+    product_id: str = Field(
+        description="Producto del registro de inventario"
+    )
+
+    ref: Optional[str] = Field(
+        default=None,
+        description="Documento que originó el movimiento (por ejemplo el order_id de una venta)"
+    )
+
+    at: datetime = Field(
+        description="Momento del movimiento (UTC)"
+    )
+
+
+class StockAt(BaseModel):
+    inventory_id: Optional[str] = None
+    product_id: Optional[str] = None
+    at: datetime = Field(description="Momento consultado (UTC)")
+    stock: int = Field(description="Stock a ese momento según el libro de movimientos")
+    checkpoint_at: Optional[datetime] = Field(
+        default=None,
+        description="Checkpoint más reciente usado como punto de partida (el más antiguo si hay varios registros)"
+    )
+    replayed: int = Field(description="Movimientos aplicados sobre los checkpoints")
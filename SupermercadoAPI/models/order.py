@@ -1,5 +1,34 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
+from datetime import datetime
+from models.patch import partial
+
+OrderStatus = Literal["pending", "paid", "shipped", "delivered", "cancelled"]
+
+
+class OrderItem(BaseModel):
+    inventory_id: str = Field(
+        description="ID del registro de inventario del que se descuenta el stock",
+        examples=["64bfe234c9e12ab3456def78"]
+    )
+
+    quantity: int = Field(
+        default=1,
+        ge=1,
+        description="Unidades compradas",
+        examples=[2]
+    )
+
+    product_id: Optional[str] = Field(
+        default=None,
+        description="Producto del inventario - Lo completa el servidor al crear la orden"
+    )
+
+    unit_price: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Precio unitario al momento de la compra - Lo calcula el servidor"
+    )
 
 
 class Order(BaseModel):
@@ -8,6 +37,11 @@ class Order(BaseModel):
         description="MongoDB ID - Se genera automáticamente desde el _id de MongoDB, no es necesario enviarlo en POST"
     )
 
+    version: int = Field(
+        default=0,
+        description="Versión del documento; aumenta con cada escritura (control de concurrencia en PATCH)"
+    )
+
     user_id: str = Field(
         description="ID de la persona que hizo la orden",
         examples=["64bfe234c9e12ab3456def78"]
@@ -18,8 +52,41 @@ class Order(BaseModel):
         examples=["64bfe234c9e12ab3456def78", "64bfe234c9e12ab3456def79"]
     )
 
+    items: List[OrderItem] = Field(
+        default_factory=list,
+        description="Detalle de la orden con cantidades y precios calculados por el servidor"
+    )
+
     total: float = Field(
         ge=0,
         description="Total a pagar por la orden",
         examples=[1500.75]
     )
+
+    status: OrderStatus = Field(
+        default="pending",
+        description="Estado de la orden",
+        examples=["pending", "shipped"]
+    )
+
+    created_at: Optional[datetime] = Field(
+        default=None,
+        description="Fecha de creación de la orden - La asigna el servidor"
+    )
+
+
+class CreateOrder(BaseModel):
+    items: List[OrderItem] = Field(
+        min_length=1,
+        description="Productos a comprar; el total y los precios se calculan en el servidor"
+    )
+
+
+class ChangeOrderStatus(BaseModel):
+    status: OrderStatus = Field(
+        description="Nuevo estado de la orden",
+        examples=["shipped"]
+    )
+
+
+OrderPatch = partial(ChangeOrderStatus, "OrderPatch")
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field, create_model
+from pydantic.fields import FieldInfo
+from typing import Optional, Type
+
+
+def partial(model: Type[BaseModel], name: str) -> Type[BaseModel]:
+    """
+    Variante de `model` para PATCH: todos los campos pasan a ser opcionales y
+    solo se validan los enviados, con las mismas restricciones y validadores.
+    Un null explícito en un campo obligatorio sigue siendo un error.
+    """
+    fields = {
+        field: (info.annotation, FieldInfo.merge_field_infos(info, default=None))
+        for field, info in model.model_fields.items()
+    }
+    fields["version"] = (Optional[int], Field(
+        default=None,
+        ge=0,
+        description="Versión del documento que se leyó; si cambió desde entonces responde 409"
+    ))
+    return create_model(name, __base__=model, **fields)
@@ -1,13 +1,9 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional
+from models.patch import partial
 import re
 
-class Product(BaseModel):
-    product_id: Optional[str] = Field(
-        default=None,
-        description="MongoDB ID del producto, generado automáticamente"
-    )
-
+class ProductBase(BaseModel):
     name: str = Field(
         description="Nombre del producto",
         min_length=2,
@@ -34,3 +30,26 @@ class Product(BaseModel):
         if not re.match(r'^\d+(\.\d{1,2})?$', str(value)):
             raise ValueError("El precio debe tener como máximo dos decimales.")
         return value
+
+
+class Product(ProductBase):
+    product_id: Optional[str] = Field(
+        default=None,
+        description="MongoDB ID del producto, generado automáticamente"
+    )
+
+    version: int = Field(
+        default=0,
+        description="Versión del documento; aumenta con cada escritura (control de concurrencia en PATCH)"
+    )
+
+
+class ProductCreate(ProductBase):
+    pass
+
+
+class ProductUpdate(ProductBase):
+    pass
+
+
+ProductPatch = partial(ProductBase, "ProductPatch")
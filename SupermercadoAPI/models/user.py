@@ -1,13 +1,9 @@
 from  pydantic import BaseModel, Field, field_validator
 from typing import Optional
 import re
+from models.patch import partial
 
-class User(BaseModel):
-    id: Optional[str] = Field(
-        default=None,
-        description="MongoDB ID - Se genera automáticamente desde el _id de MongoDB, no es necesario enviarlo en POST"
-    )
-
+class UserUpdate(BaseModel):
     name: str = Field(
         description="User First Name",
         pattern= r"^[A-Za-zÁÉÍÓÚÜÑáéíóúüñ' -]+$",
@@ -20,6 +16,8 @@ class User(BaseModel):
         examples=["Pérez", "García López"]
     )
 
+
+class UserBase(UserUpdate):
     email: str = Field(
         pattern=r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$",
         examples=["usuario@example.com"]
@@ -51,4 +49,23 @@ class User(BaseModel):
             raise ValueError("La contraseña debe contener al menos un número.")
         if not re.search(r"[@$!%*?&]", value):
             raise ValueError("La contraseña debe contener al menos un carácter especial (@$!%*?&).")
-        return value
\ No newline at end of file
+        return value
+
+
+class User(UserBase):
+    id: Optional[str] = Field(
+        default=None,
+        description="MongoDB ID - Se genera automáticamente desde el _id de MongoDB, no es necesario enviarlo en POST"
+    )
+
+    version: int = Field(
+        default=0,
+        description="Versión del documento; aumenta con cada escritura (control de concurrencia en PATCH)"
+    )
+
+
+class UserCreate(UserBase):
+    pass
+
+
+UserPatch = partial(UserUpdate, "UserPatch")
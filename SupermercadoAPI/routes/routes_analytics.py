@@ -0,0 +1,63 @@
+from datetime import datetime
+from fastapi import APIRouter, Query, Request
+from typing import List, Optional
+from models.analytics import DailyRevenue, CategoryRevenue, ProductSales, StockTurnover, OrderValueDistribution
+from controllers.controller_analytics import (
+    revenue_by_day,
+    revenue_by_category,
+    top_products,
+    stock_turnover,
+    order_value_distribution
+)
+from utils.responses import FastJSONResponse
+from utils.security import validateadmin
+
+router = APIRouter(prefix="/analytics", tags=["📊 Analytics"])
+
+START = Query(None, description="Inicio del periodo en UTC (incluido); por defecto hace 30 días")
+END = Query(None, description="Fin del periodo en UTC (excluido); por defecto el final de hoy")
+
+@router.get("/revenue/daily", response_model=List[DailyRevenue])
+@validateadmin
+async def revenue_by_day_endpoint(
+        request: Request,
+        start: Optional[datetime] = START,
+        end: Optional[datetime] = END,
+        window: int = Query(7, ge=1, le=90, description="Días de la media móvil")
+):
+    """Ingresos y número de órdenes por día con media móvil (requiere permisos de admin)"""
+    return FastJSONResponse(await revenue_by_day(start, end, window))
+
+@router.get("/revenue/categories", response_model=List[CategoryRevenue])
+@validateadmin
+async def revenue_by_category_endpoint(request: Request, start: Optional[datetime] = START, end: Optional[datetime] = END):
+    """Ingresos y unidades vendidas por categoría (requiere permisos de admin)"""
+    return FastJSONResponse(await revenue_by_category(start, end))
+
+@router.get("/products/top", response_model=List[ProductSales])
+@validateadmin
+async def top_products_endpoint(
+        request: Request,
+        start: Optional[datetime] = START,
+        end: Optional[datetime] = END,
+        limit: int = Query(10, ge=1, le=100)
+):
+    """Productos con más ingresos en el periodo (requiere permisos de admin)"""
+    return FastJSONResponse(await top_products(start, end, limit))
+
+@router.get("/inventory/turnover", response_model=List[StockTurnover])
+@validateadmin
+async def stock_turnover_endpoint(
+        request: Request,
+        start: Optional[datetime] = START,
+        end: Optional[datetime] = END,
+        limit: int = Query(50, ge=1, le=500)
+):
+    """Rotación de stock y días de cobertura por producto (requiere permisos de admin)"""
+    return FastJSONResponse(await stock_turnover(start, end, limit))
+
+@router.get("/orders/distribution", response_model=OrderValueDistribution)
+@validateadmin
+async def order_value_distribution_endpoint(request: Request, start: Optional[datetime] = START, end: Optional[datetime] = END):
+    """Distribución del total por orden y sus percentiles (requiere permisos de admin)"""
+    return FastJSONResponse(await order_value_distribution(start, end))
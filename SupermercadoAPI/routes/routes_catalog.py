@@ -1,50 +1,40 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import List
-from models.catalog import Catalog, CatalogCreate, CatalogUpdate
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from models.catalog import Catalog
 from controllers.controller_catalog import (
-    create_catalog,
-    get_catalog_by_id,
+    get_catalog,
     list_catalogs,
-    update_catalog,
-    delete_catalog
+    stream_catalogs,
+    rebuild_catalog
 )
+from utils.pagination import DEFAULT_LIMIT, MAX_LIMIT
+from utils.etag import conditional, conditional_item
 from utils.security import validateadmin
 
+# Solo lectura: el catálogo es una vista materializada de productos e
+# inventario (utils.catalog_view) y se escribe únicamente al refrescarla
 router = APIRouter(prefix="/catalog", tags=["🛍️ Catalog"])
 
-@router.post("/", response_model=Catalog)
-@validateadmin
-async def create_catalog_endpoint(request: Request, catalog_data: CatalogCreate) -> Catalog:
-    """Crear una nueva entrada en el catálogo (requiere permisos de admin)"""
-    return await create_catalog(catalog_data)
-
 @router.get("/", response_model=List[Catalog])
-async def list_catalogs_endpoint() -> List[Catalog]:
-    """Listar todos los productos en el catálogo"""
-    return await list_catalogs()
-
-@router.get("/{catalog_id}", response_model=Catalog)
-async def get_catalog_by_id_endpoint(catalog_id: str) -> Catalog:
-    """Obtener una entrada del catálogo por ID"""
-    catalog = await get_catalog_by_id(catalog_id)
-    if not catalog:
-        raise HTTPException(status_code=404, detail="Catálogo no encontrado")
-    return catalog
+async def list_catalogs_endpoint(
+        request: Request,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = Query(None, description="catalog_id del último elemento de la página anterior"),
+        stream: bool = Query(False, description="Emitir todos los resultados como NDJSON")
+):
+    """Listar productos del catálogo paginados por cursor, o en streaming NDJSON"""
+    if stream:
+        return StreamingResponse(stream_catalogs(after), media_type="application/x-ndjson")
+    return await conditional(request, "catalogs", lambda: list_catalogs(limit, after))
 
-@router.put("/{catalog_id}", response_model=Catalog)
+@router.post("/rebuild")
 @validateadmin
-async def update_catalog_endpoint(catalog_id: str, catalog_data: CatalogUpdate) -> Catalog:
-    """Actualizar una entrada del catálogo (requiere permisos de admin)"""
-    updated = await update_catalog(catalog_id, catalog_data)
-    if not updated:
-        raise HTTPException(status_code=404, detail="Catálogo no encontrado")
-    return updated
+async def rebuild_catalog_endpoint(request: Request) -> dict:
+    """Regenerar el catálogo completo desde productos e inventario (requiere permisos de admin)"""
+    return await rebuild_catalog()
 
-@router.delete("/{catalog_id}")
-@validateadmin
-async def delete_catalog_endpoint(catalog_id: str) -> dict:
-    """Eliminar una entrada del catálogo (requiere permisos de admin)"""
-    deleted = await delete_catalog(catalog_id)
-    if not deleted:
-        raise HTTPException(status_code=404, detail="Catálogo no encontrado")
-    return {"message": "Catálogo eliminado correctamente"}
+@router.get("/{catalog_id}", response_model=Catalog)
+async def get_catalog_by_id_endpoint(request: Request, catalog_id: str):
+    """Obtener una entrada del catálogo por ID (coincide con el ID del producto)"""
+    return await conditional_item(request, "catalogs", lambda: get_catalog(catalog_id))
@@ -1,48 +1,58 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import List
-from models.category import Category, CategoryCreate, CategoryUpdate
+from fastapi import APIRouter, HTTPException, Header, Request
+from typing import List, Optional
+from models.category import Category, CategoryCreate, CategoryUpdate, CategoryPatch
 from controllers.controller_category import (
     create_category,
-    get_category_by_id,
+    get_category,
     list_categories,
     update_category,
+    patch_category,
     delete_category
 )
+from utils.etag import conditional, conditional_item
 from utils.security import validateadmin
+from utils.idempotency import idempotent
 
 router = APIRouter(prefix="/categories", tags=["📂 Categories"])
 
 @router.post("/", response_model=Category)
 @validateadmin
-async def create_category_endpoint(request: Request, category_data: CategoryCreate) -> Category:
-    """Crear una nueva categoría (requiere permisos de admin)"""
-    return await create_category(category_data)
+async def create_category_endpoint(
+        request: Request,
+        category_data: CategoryCreate,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Clave única por intento de creación; los reintentos con la misma clave no duplican")
+) -> Category:
+    """Crear una nueva categoría; con Idempotency-Key los reintentos devuelven la respuesta original (requiere permisos de admin)"""
+    return await idempotent(idempotency_key, "categories", request.state.id, category_data, lambda: create_category(category_data))
 
 @router.get("/", response_model=List[Category])
-async def list_categories_endpoint() -> List[Category]:
+async def list_categories_endpoint(request: Request):
     """Listar todas las categorías"""
-    return await list_categories()
+    return await conditional(request, "categories", list_categories)
 
 @router.get("/{category_id}", response_model=Category)
-async def get_category_by_id_endpoint(category_id: str) -> Category:
+async def get_category_by_id_endpoint(request: Request, category_id: str):
     """Obtener una categoría por ID"""
-    category = await get_category_by_id(category_id)
-    if not category:
-        raise HTTPException(status_code=404, detail="Categoría no encontrada")
-    return category
+    return await conditional_item(request, "categories", lambda: get_category(category_id))
 
 @router.put("/{category_id}", response_model=Category)
 @validateadmin
-async def update_category_endpoint(category_id: str, category_data: CategoryUpdate) -> Category:
+async def update_category_endpoint(request: Request, category_id: str, category_data: CategoryUpdate) -> Category:
     """Actualizar una categoría (requiere permisos de admin)"""
     updated = await update_category(category_id, category_data)
     if not updated:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     return updated
 
+@router.patch("/{category_id}", response_model=Category)
+@validateadmin
+async def patch_category_endpoint(request: Request, category_id: str, category_data: CategoryPatch) -> Category:
+    """Actualizar solo los campos enviados de una categoría; con `version` responde 409 si cambió (requiere permisos de admin)"""
+    return await patch_category(category_id, category_data)
+
 @router.delete("/{category_id}")
 @validateadmin
-async def delete_category_endpoint(category_id: str) -> dict:
+async def delete_category_endpoint(request: Request, category_id: str) -> dict:
     """Eliminar una categoría (requiere permisos de admin)"""
     deleted = await delete_category(category_id)
     if not deleted:
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Request
+from typing import List
+from models.bulk import ImportJob
+from utils.importer import get_job, list_jobs
+from utils.security import validateadmin
+
+router = APIRouter(prefix="/imports", tags=["📥 Imports"])
+
+@router.get("/", response_model=List[ImportJob])
+@validateadmin
+async def list_imports_endpoint(request: Request) -> List[ImportJob]:
+    """Importaciones recientes, la más nueva primero y sin el detalle de errores (requiere permisos de admin)"""
+    return await list_jobs()
+
+@router.get("/{job_id}", response_model=ImportJob)
+@validateadmin
+async def get_import_endpoint(request: Request, job_id: str) -> ImportJob:
+    """Progreso y errores de una importación, también mientras corre (requiere permisos de admin)"""
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return job
@@ -1,50 +1,186 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import List
-from models.inventory import Inventory, InventoryCreate, InventoryUpdate
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from models.inventory import Inventory, InventoryCreate, InventoryUpdate, InventoryPatch
+from models.movement import Movement, MovementCreate, StockAt
 from controllers.controller_inventory import (
     create_inventory,
-    get_inventory_by_id,
+    get_inventory,
     list_inventory,
+    stream_inventory,
+    export_inventory,
     update_inventory,
-    delete_inventory
+    patch_inventory,
+    delete_inventory,
+    bulk_create_inventory,
+    bulk_update_inventory,
+    bulk_delete_inventory,
+    import_inventory,
+    add_movement,
+    list_movements,
+    stock_at,
+    compact_ledger
 )
+from models.bulk import BulkResult, ImportJob
+from utils.bulk import BULK_CHUNK_SIZE, BULK_MAX_CHUNK_SIZE, read_items
+from utils.importer import IMPORT_CHUNK_SIZE, ImportFormat, body_format
+from utils.pagination import DEFAULT_LIMIT, MAX_LIMIT
+from utils.responses import FastJSONResponse
+from utils.export import EXPORT_BATCH_SIZE, EXPORT_MAX_BATCH_SIZE, ExportFormat, export_response
 from utils.security import validateadmin
+from utils.idempotency import idempotent
 
 router = APIRouter(prefix="/inventory", tags=["📋 Inventory"])
 
 @router.post("/", response_model=Inventory)
 @validateadmin
-async def create_inventory_endpoint(request: Request, inventory_data: InventoryCreate) -> Inventory:
-    """Crear un nuevo registro de inventario (requiere permisos de admin)"""
-    return await create_inventory(inventory_data)
+async def create_inventory_endpoint(
+        request: Request,
+        inventory_data: InventoryCreate,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Clave única por intento de creación; los reintentos con la misma clave no duplican")
+) -> Inventory:
+    """Crear un nuevo registro de inventario; con Idempotency-Key los reintentos devuelven la respuesta original (requiere permisos de admin)"""
+    return await idempotent(idempotency_key, "inventory", request.state.id, inventory_data, lambda: create_inventory(inventory_data))
 
 @router.get("/", response_model=List[Inventory])
-async def list_inventory_endpoint() -> List[Inventory]:
-    """Listar todos los registros de inventario"""
-    return await list_inventory()
+async def list_inventory_endpoint(
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = Query(None, description="inventory_id del último elemento de la página anterior"),
+        stream: bool = Query(False, description="Emitir todos los resultados como NDJSON")
+):
+    """Listar registros de inventario paginados por cursor, o en streaming NDJSON"""
+    if stream:
+        return StreamingResponse(stream_inventory(after), media_type="application/x-ndjson")
+    return FastJSONResponse(await list_inventory(limit, after))
+
+@router.post("/import", response_model=ImportJob)
+@validateadmin
+async def import_inventory_endpoint(
+        request: Request,
+        fmt: Optional[ImportFormat] = Query(None, alias="format", description="Por defecto según el Content-Type"),
+        chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1, le=BULK_MAX_CHUNK_SIZE),
+        job_id: Optional[str] = Query(None, max_length=64, description="ID para consultar el progreso en /imports/{job_id}")
+) -> ImportJob:
+    """Importar registros de inventario desde un archivo CSV o NDJSON enviado como cuerpo; valida product_id (requiere permisos de admin)"""
+    fmt = body_format(request.headers.get("content-type", ""), fmt)
+    return await import_inventory(request.stream(), fmt, chunk_size, job_id)
+
+@router.post("/bulk", response_model=BulkResult)
+@validateadmin
+async def bulk_create_inventory_endpoint(
+        request: Request,
+        chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=BULK_MAX_CHUNK_SIZE)
+) -> BulkResult:
+    """Crear registros de inventario en lote desde un arreglo JSON o NDJSON (requiere permisos de admin)"""
+    return await bulk_create_inventory(await read_items(request), chunk_size)
+
+@router.put("/bulk", response_model=BulkResult)
+@validateadmin
+async def bulk_update_inventory_endpoint(
+        request: Request,
+        chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=BULK_MAX_CHUNK_SIZE)
+) -> BulkResult:
+    """Actualizar registros de inventario en lote; cada elemento incluye su inventory_id (requiere permisos de admin)"""
+    return await bulk_update_inventory(await read_items(request), chunk_size)
+
+@router.post("/bulk/delete", response_model=BulkResult)
+@validateadmin
+async def bulk_delete_inventory_endpoint(
+        request: Request,
+        chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=BULK_MAX_CHUNK_SIZE)
+) -> BulkResult:
+    """Eliminar registros de inventario en lote a partir de un arreglo de IDs (requiere permisos de admin)"""
+    return await bulk_delete_inventory(await read_items(request), chunk_size)
+
+@router.get("/export")
+@validateadmin
+async def export_inventory_endpoint(
+        request: Request,
+        fmt: ExportFormat = Query("csv", alias="format"),
+        field: Literal["date_in", "date_out"] = Query("date_in", description="Fecha sobre la que se filtra"),
+        start: Optional[datetime] = Query(None, description="Desde (incluido)"),
+        end: Optional[datetime] = Query(None, description="Hasta (excluido)"),
+        after: Optional[str] = Query(None, description="inventory_id del último registro recibido, para reanudar"),
+        batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=EXPORT_MAX_BATCH_SIZE),
+        gzip: bool = Query(False)
+):
+    """Exportar movimientos de inventario en CSV o NDJSON en streaming (requiere permisos de admin)"""
+    return export_response(export_inventory(fmt, field, start, end, after, batch_size, gzip), fmt, "inventory", gzip)
+
+@router.get("/stock", response_model=StockAt)
+@validateadmin
+async def product_stock_at_endpoint(
+        request: Request,
+        product_id: str = Query(description="Producto; se suman todos sus registros de inventario"),
+        at: Optional[datetime] = Query(None, description="Instante UTC; por defecto ahora")
+) -> StockAt:
+    """Stock de un producto a una fecha según el libro de movimientos (requiere permisos de admin)"""
+    return await stock_at(at, product_id=product_id)
+
+@router.post("/checkpoints")
+@validateadmin
+async def compact_ledger_endpoint(request: Request) -> dict:
+    """Compactar ahora el libro de movimientos en checkpoints (requiere permisos de admin)"""
+    return await compact_ledger()
 
 @router.get("/{inventory_id}", response_model=Inventory)
 async def get_inventory_by_id_endpoint(inventory_id: str) -> Inventory:
     """Obtener un registro de inventario por ID"""
-    inv = await get_inventory_by_id(inventory_id)
+    inv = await get_inventory(inventory_id)
     if not inv:
         raise HTTPException(status_code=404, detail="Inventario no encontrado")
     return inv
 
 @router.put("/{inventory_id}", response_model=Inventory)
 @validateadmin
-async def update_inventory_endpoint(inventory_id: str, inventory_data: InventoryUpdate) -> Inventory:
+async def update_inventory_endpoint(request: Request, inventory_id: str, inventory_data: InventoryUpdate) -> Inventory:
     """Actualizar un registro de inventario (requiere permisos de admin)"""
     updated = await update_inventory(inventory_id, inventory_data)
     if not updated:
         raise HTTPException(status_code=404, detail="Inventario no encontrado")
     return updated
 
+@router.patch("/{inventory_id}", response_model=Inventory)
+@validateadmin
+async def patch_inventory_endpoint(request: Request, inventory_id: str, inventory_data: InventoryPatch) -> Inventory:
+    """Actualizar solo los campos enviados de un registro de inventario; con `version` responde 409 si cambió (requiere permisos de admin)"""
+    return await patch_inventory(inventory_id, inventory_data)
+
 @router.delete("/{inventory_id}")
 @validateadmin
-async def delete_inventory_endpoint(inventory_id: str) -> dict:
+async def delete_inventory_endpoint(request: Request, inventory_id: str) -> dict:
     """Eliminar un registro de inventario (requiere permisos de admin)"""
     deleted = await delete_inventory(inventory_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Inventario no encontrado")
     return {"message": "Inventario eliminado correctamente"}
+
+@router.post("/{inventory_id}/movements", response_model=Movement)
+@validateadmin
+async def add_movement_endpoint(request: Request, inventory_id: str, movement: MovementCreate) -> Movement:
+    """Registrar una entrada, venta, devolución o ajuste; el stock cambia con $inc (requiere permisos de admin)"""
+    return await add_movement(inventory_id, movement)
+
+@router.get("/{inventory_id}/movements", response_model=List[Movement])
+@validateadmin
+async def list_movements_endpoint(
+        request: Request,
+        inventory_id: str,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = Query(None, description="movement_id del último elemento de la página anterior"),
+        start: Optional[datetime] = Query(None, description="Desde (incluido)"),
+        end: Optional[datetime] = Query(None, description="Hasta (excluido)")
+):
+    """Historial de movimientos de un registro de inventario (requiere permisos de admin)"""
+    return FastJSONResponse(await list_movements(inventory_id, limit, after, start, end))
+
+@router.get("/{inventory_id}/stock", response_model=StockAt)
+@validateadmin
+async def stock_at_endpoint(
+        request: Request,
+        inventory_id: str,
+        at: Optional[datetime] = Query(None, description="Instante UTC; por defecto ahora")
+) -> StockAt:
+    """Stock del registro a una fecha: checkpoint más cercano + movimientos posteriores (requiere permisos de admin)"""
+    return await stock_at(at, inventory_id=inventory_id)
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from utils.live import LIVE_HEARTBEAT, LIVE_SEND_TIMEOUT, Subscriber, live_hub, sse_events, topics
+from utils.responses import dumps
+from utils.security import authorize_connection
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/live", tags=["📡 Live"])
+
+ACCESS_TOKEN = Query(None, description="JWT; alternativa a la cabecera Authorization para EventSource y WebSocket del navegador")
+INVENTORY_IDS = Query([], description="Inventarios cuyo stock seguir")
+PRODUCT_IDS = Query([], description="Productos cuyo stock total (todos sus inventarios) seguir")
+ORDER_IDS = Query([], description="Órdenes cuyo estado seguir")
+
+PING = dumps({"type": "ping"})
+
+@router.get("/events")
+async def live_events_endpoint(
+        request: Request,
+        access_token: Optional[str] = ACCESS_TOKEN,
+        inventory_id: List[str] = INVENTORY_IDS,
+        product_id: List[str] = PRODUCT_IDS,
+        order_id: List[str] = ORDER_IDS
+):
+    """Server-Sent Events con el stock y el estado de órdenes: primero el estado actual y luego cada cambio (requiere estar autenticado)"""
+    authorize_connection(request, access_token)
+    initial = topics(inventory_id, product_id, order_id)
+    if not initial:
+        raise HTTPException(status_code=400, detail="Indica al menos un inventory_id, product_id u order_id")
+    live_hub.check_capacity()
+    live_hub.check_topics(None, initial)
+    return StreamingResponse(
+        sse_events(initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _ids(message: dict, field: str) -> List[str]:
+    """Una cadena suelta se iteraría letra por letra: solo se aceptan listas de cadenas"""
+    ids = message.get(field, [])
+    if not isinstance(ids, list) or not all(isinstance(id, str) for id in ids):
+        raise HTTPException(status_code=400, detail=f"{field} debe ser una lista de IDs")
+    return ids
+
+
+async def _receive(websocket: WebSocket, subscriber: Subscriber):
+    """Mensajes del cliente: {"action": "subscribe" | "unsubscribe", "inventory_id": [...], "product_id": [...], "order_id": [...]}"""
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                if not isinstance(message, dict):
+                    raise HTTPException(status_code=400, detail="Se esperaba un objeto JSON")
+                action = message.get("action")
+                requested = topics(_ids(message, "inventory_id"), _ids(message, "product_id"), _ids(message, "order_id"))
+                if action == "subscribe":
+                    await live_hub.subscribe(subscriber, requested)
+                elif action == "unsubscribe":
+                    live_hub.unsubscribe(subscriber, requested)
+                else:
+                    raise HTTPException(status_code=400, detail="Acción desconocida; usa subscribe o unsubscribe")
+            except HTTPException as e:
+                subscriber.push(("error", ""), dumps({"type": "error", "detail": e.detail}))
+    except (WebSocketDisconnect, ValueError):
+        # Cliente desconectado o que no manda JSON
+        subscriber.close()
+
+
+@router.websocket("/ws")
+async def live_websocket_endpoint(
+        websocket: WebSocket,
+        access_token: Optional[str] = ACCESS_TOKEN,
+        inventory_id: List[str] = INVENTORY_IDS,
+        product_id: List[str] = PRODUCT_IDS,
+        order_id: List[str] = ORDER_IDS
+):
+    """WebSocket con los mismos mensajes que /live/events; admite suscribirse y desuscribirse sin reconectar"""
+    initial = topics(inventory_id, product_id, order_id)
+    try:
+        authorize_connection(websocket, access_token)
+        live_hub.check_capacity()
+        live_hub.check_topics(None, initial)
+    except HTTPException as e:
+        await websocket.close(code=1013 if e.status_code == 503 else 1008, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    subscriber = live_hub.connect()
+    receiver = asyncio.create_task(_receive(websocket, subscriber))
+    try:
+        await live_hub.subscribe(subscriber, initial)
+        while True:
+            messages = await subscriber.next(LIVE_HEARTBEAT)
+            if messages is None:
+                break
+            for message in messages or [PING]:
+                await asyncio.wait_for(websocket.send_text(message.decode()), LIVE_SEND_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Cliente WebSocket demasiado lento: se cierra la conexión")
+        await _close(websocket, 1013)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error en conexión WebSocket: {str(e)}")
+        await _close(websocket, 1011)
+    finally:
+        receiver.cancel()
+        live_hub.disconnect(subscriber)
+
+
+async def _close(websocket: WebSocket, code: int):
+    try:
+        await websocket.close(code=code)
+    except Exception:
+        pass
@@ -1,50 +1,90 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import List
-from models.order import Order, CreateOrder, ChangeOrderStatus
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from models.order import Order, CreateOrder, ChangeOrderStatus, OrderPatch
 from controllers.controller_order import (
     create_order,
     get_orders,
-    get_order_by_id,
+    stream_orders,
+    export_orders,
+    get_order,
     update_order_status,
+    patch_order,
     delete_order
 )
+from utils.pagination import DEFAULT_LIMIT, MAX_LIMIT
+from utils.responses import FastJSONResponse
+from utils.export import EXPORT_BATCH_SIZE, EXPORT_MAX_BATCH_SIZE, ExportFormat, export_response
 from utils.security import validateuser, validateadmin
+from utils.idempotency import idempotent
 
 router = APIRouter(prefix="/orders", tags=["📦 Orders"])
 
 @router.post("/", response_model=Order)
 @validateuser
-async def create_order_endpoint(request: Request, order_data: CreateOrder) -> Order:
-    """Crear una nueva orden (requiere estar autenticado)"""
-    return await create_order(order_data)
+async def create_order_endpoint(
+        request: Request,
+        order_data: CreateOrder,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Clave única por intento de creación; los reintentos con la misma clave no duplican")
+) -> Order:
+    """Crear una orden reservando stock; precios y total se calculan en el servidor; con Idempotency-Key los reintentos devuelven la respuesta original (requiere estar autenticado)"""
+    return await idempotent(idempotency_key, "orders", request.state.id, order_data, lambda: create_order(order_data, request.state.id))
 
 @router.get("/", response_model=List[Order])
 @validateadmin
-async def list_orders_endpoint() -> List[Order]:
-    """Listar todas las órdenes (requiere permisos de admin)"""
-    return await get_orders()
+async def list_orders_endpoint(
+        request: Request,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = Query(None, description="order_id del último elemento de la página anterior"),
+        stream: bool = Query(False, description="Emitir todos los resultados como NDJSON")
+):
+    """Listar órdenes paginadas por cursor, o en streaming NDJSON (requiere permisos de admin)"""
+    if stream:
+        return StreamingResponse(stream_orders(after), media_type="application/x-ndjson")
+    return FastJSONResponse(await get_orders(limit, after))
+
+@router.get("/export")
+@validateadmin
+async def export_orders_endpoint(
+        request: Request,
+        fmt: ExportFormat = Query("csv", alias="format"),
+        start: Optional[datetime] = Query(None, description="created_at desde (incluido)"),
+        end: Optional[datetime] = Query(None, description="created_at hasta (excluido)"),
+        after: Optional[str] = Query(None, description="order_id de la última orden recibida completa, para reanudar"),
+        batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=EXPORT_MAX_BATCH_SIZE),
+        gzip: bool = Query(False)
+):
+    """Exportar órdenes en CSV o NDJSON en streaming (requiere permisos de admin)"""
+    return export_response(export_orders(fmt, start, end, after, batch_size, gzip), fmt, "orders", gzip)
 
 @router.get("/{order_id}", response_model=Order)
 @validateuser
-async def get_order_by_id_endpoint(order_id: str) -> Order:
+async def get_order_by_id_endpoint(request: Request, order_id: str) -> Order:
     """Obtener detalles de una orden por ID (requiere estar autenticado)"""
-    order = await get_order_by_id(order_id)
+    order = await get_order(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     return order
 
 @router.put("/{order_id}/status", response_model=Order)
 @validateadmin
-async def update_order_status_endpoint(order_id: str, status_data: ChangeOrderStatus) -> Order:
+async def update_order_status_endpoint(request: Request, order_id: str, status_data: ChangeOrderStatus) -> Order:
     """Actualizar el estado de una orden (requiere permisos de admin)"""
     updated = await update_order_status(order_id, status_data)
     if not updated:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     return updated
 
+@router.patch("/{order_id}", response_model=Order)
+@validateadmin
+async def patch_order_endpoint(request: Request, order_id: str, order_data: OrderPatch) -> Order:
+    """Actualizar solo los campos enviados de una orden; con `version` responde 409 si cambió (requiere permisos de admin)"""
+    return await patch_order(order_id, order_data)
+
 @router.delete("/{order_id}")
 @validateadmin
-async def delete_order_endpoint(order_id: str) -> dict:
+async def delete_order_endpoint(request: Request, order_id: str) -> dict:
     """Eliminar una orden (requiere permisos de admin)"""
     deleted = await delete_order(order_id)
     if not deleted:
@@ -1,48 +1,128 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import List
-from models.product import Product, ProductCreate, ProductUpdate
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from models.product import Product, ProductCreate, ProductUpdate, ProductPatch
 from controllers.controller_product import (
     create_product,
-    get_product_by_id,
+    get_product,
     list_products,
+    search_products,
+    stream_products,
     update_product,
-    delete_product
+    patch_product,
+    delete_product,
+    bulk_create_products,
+    bulk_update_products,
+    bulk_delete_products,
+    import_products
 )
-from utils.security import validateadmin, validateuser
+from models.bulk import BulkResult, ImportJob
+from utils.bulk import BULK_CHUNK_SIZE, BULK_MAX_CHUNK_SIZE, read_items
+from utils.importer import IMPORT_CHUNK_SIZE, ImportFormat, body_format
+from utils.pagination import DEFAULT_LIMIT, MAX_LIMIT
+from utils.responses import FastJSONResponse
+from utils.etag import conditional, conditional_item
+from utils.search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
+from utils.security import validateadmin
+from utils.idempotency import idempotent
 
 router = APIRouter(prefix="/products", tags=["📦 Products"])
 
 @router.post("/", response_model=Product)
 @validateadmin
-async def create_product_endpoint(request: Request, product_data: ProductCreate) -> Product:
-    """Crear un nuevo producto (requiere permisos de admin)"""
-    return await create_product(product_data)
+async def create_product_endpoint(
+        request: Request,
+        product_data: ProductCreate,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Clave única por intento de creación; los reintentos con la misma clave no duplican")
+) -> Product:
+    """Crear un nuevo producto; con Idempotency-Key los reintentos devuelven la respuesta original (requiere permisos de admin)"""
+    return await idempotent(idempotency_key, "products", request.state.id, product_data, lambda: create_product(product_data))
 
 @router.get("/", response_model=List[Product])
-async def list_products_endpoint() -> List[Product]:
-    """Listar todos los productos"""
-    return await list_products()
+async def list_products_endpoint(
+        request: Request,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = Query(None, description="product_id del último elemento de la página anterior"),
+        stream: bool = Query(False, description="Emitir todos los resultados como NDJSON")
+):
+    """Listar productos paginados por cursor, o en streaming NDJSON"""
+    if stream:
+        return StreamingResponse(stream_products(after), media_type="application/x-ndjson")
+    return await conditional(request, "products", lambda: list_products(limit, after))
+
+@router.get("/search", response_model=List[Product])
+async def search_products_endpoint(
+        q: str = Query("", max_length=100, description="Prefijos del nombre o de la categoría, sin distinguir acentos"),
+        category_id: Optional[str] = Query(None),
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT)
+):
+    """Buscar productos por texto con filtros de categoría y rango de precio"""
+    return FastJSONResponse(await search_products(q, category_id, min_price, max_price, limit))
+
+@router.post("/import", response_model=ImportJob)
+@validateadmin
+async def import_products_endpoint(
+        request: Request,
+        fmt: Optional[ImportFormat] = Query(None, alias="format", description="Por defecto según el Content-Type"),
+        chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1, le=BULK_MAX_CHUNK_SIZE),
+        job_id: Optional[str] = Query(None, max_length=64, description="ID para consultar el progreso en /imports/{job_id}")
+) -> ImportJob:
+    """Importar productos desde un archivo CSV o NDJSON enviado como cuerpo; valida category_id (requiere permisos de admin)"""
+    fmt = body_format(request.headers.get("content-type", ""), fmt)
+    return await import_products(request.stream(), fmt, chunk_size, job_id)
+
+@router.post("/bulk", response_model=BulkResult)
+@validateadmin
+async def bulk_create_products_endpoint(
+        request: Request,
+        chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=BULK_MAX_CHUNK_SIZE)
+) -> BulkResult:
+    """Crear productos en lote desde un arreglo JSON o NDJSON (requiere permisos de admin)"""
+    return await bulk_create_products(await read_items(request), chunk_size)
+
+@router.put("/bulk", response_model=BulkResult)
+@validateadmin
+async def bulk_update_products_endpoint(
+        request: Request,
+        chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=BULK_MAX_CHUNK_SIZE)
+) -> BulkResult:
+    """Actualizar productos en lote; cada elemento incluye su product_id (requiere permisos de admin)"""
+    return await bulk_update_products(await read_items(request), chunk_size)
+
+@router.post("/bulk/delete", response_model=BulkResult)
+@validateadmin
+async def bulk_delete_products_endpoint(
+        request: Request,
+        chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=BULK_MAX_CHUNK_SIZE)
+) -> BulkResult:
+    """Eliminar productos en lote a partir de un arreglo de IDs (requiere permisos de admin)"""
+    return await bulk_delete_products(await read_items(request), chunk_size)
 
 @router.get("/{product_id}", response_model=Product)
-async def get_product_by_id_endpoint(product_id: str) -> Product:
-    """Obtener un producto por ID"""
-    product = await get_product_by_id(product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Producto no encontrado")
-    return product
+async def get_product_by_id_endpoint(request: Request, product_id: str):
+    """Obtener un producto por ID; responde 304 si If-None-Match coincide con su ETag"""
+    return await conditional_item(request, "products", lambda: get_product(product_id))
 
 @router.put("/{product_id}", response_model=Product)
 @validateadmin
-async def update_product_endpoint(product_id: str, product_data: ProductUpdate) -> Product:
+async def update_product_endpoint(request: Request, product_id: str, product_data: ProductUpdate) -> Product:
     """Actualizar un producto (requiere permisos de admin)"""
     updated = await update_product(product_id, product_data)
     if not updated:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     return updated
 
+@router.patch("/{product_id}", response_model=Product)
+@validateadmin
+async def patch_product_endpoint(request: Request, product_id: str, product_data: ProductPatch) -> Product:
+    """Actualizar solo los campos enviados de un producto; con `version` responde 409 si cambió (requiere permisos de admin)"""
+    return await patch_product(product_id, product_data)
+
 @router.delete("/{product_id}")
 @validateadmin
-async def delete_product_endpoint(product_id: str) -> dict:
+async def delete_product_endpoint(request: Request, product_id: str) -> dict:
     """Eliminar un producto (requiere permisos de admin)"""
     deleted = await delete_product(product_id)
     if not deleted:
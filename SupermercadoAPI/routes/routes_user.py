@@ -1,50 +1,67 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import List
-from models.user import User, UserCreate, UserUpdate
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from models.user import User, UserCreate, UserUpdate, UserPatch
 from controllers.controller_user import (  
     create_user,
-    get_user_by_id,
+    get_user,
     list_users,
+    stream_users,
     update_user,
+    patch_user,
     delete_user
 )
-from utils.security import validateuser, validateadmin
+from utils.pagination import DEFAULT_LIMIT, MAX_LIMIT
+from utils.responses import FastJSONResponse
+from utils.security import is_admin_request, validateuser, validateadmin
 
 router = APIRouter(prefix="/users", tags=["👤 Users"])
 
 @router.post("/", response_model=User)
-@validateadmin
 async def create_user_endpoint(request: Request, user_data: UserCreate) -> User:
-    """Crear un nuevo usuario (requiere permisos de admin)"""
-    return await create_user(user_data)
+    """Registrar un usuario; solo con un token de admin se respetan `active` y `admin`"""
+    return await create_user(user_data, allow_roles=is_admin_request(request))
 
 @router.get("/", response_model=List[User])
 @validateadmin
-async def list_users_endpoint() -> List[User]:
-    """Listar todos los usuarios (requiere permisos de admin)"""
-    return await list_users()
+async def list_users_endpoint(
+        request: Request,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = Query(None, description="id del último elemento de la página anterior"),
+        stream: bool = Query(False, description="Emitir todos los resultados como NDJSON")
+):
+    """Listar usuarios paginados por cursor, o en streaming NDJSON (requiere permisos de admin)"""
+    if stream:
+        return StreamingResponse(stream_users(after), media_type="application/x-ndjson")
+    return FastJSONResponse(await list_users(limit, after))
 
 @router.get("/{user_id}", response_model=User)
 @validateuser
-async def get_user_by_id_endpoint(user_id: str) -> User:
+async def get_user_by_id_endpoint(request: Request, user_id: str) -> User:
     """Obtener detalles de un usuario por su ID (requiere login)"""
-    user = await get_user_by_id(user_id)
+    user = await get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     return user
 
 @router.put("/{user_id}", response_model=User)
 @validateuser
-async def update_user_endpoint(user_id: str, user_data: UserUpdate) -> User:
+async def update_user_endpoint(request: Request, user_id: str, user_data: UserUpdate) -> User:
     """Actualizar datos de un usuario (requiere login)"""
     updated = await update_user(user_id, user_data)
     if not updated:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     return updated
 
+@router.patch("/{user_id}", response_model=User)
+@validateuser
+async def patch_user_endpoint(request: Request, user_id: str, user_data: UserPatch) -> User:
+    """Actualizar solo los campos enviados de un usuario; con `version` responde 409 si cambió (requiere login)"""
+    return await patch_user(user_id, user_data)
+
 @router.delete("/{user_id}")
 @validateadmin
-async def delete_user_endpoint(user_id: str) -> dict:
+async def delete_user_endpoint(request: Request, user_id: str) -> dict:
     """Eliminar un usuario (requiere permisos de admin)"""
     deleted = await delete_user(user_id)
     if not deleted:
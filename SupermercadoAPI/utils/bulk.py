@@ -0,0 +1,148 @@
+import os
+import json
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+
+from models.bulk import BulkItemResult, BulkResult
+from utils.repository import VERSION_FIELD, Repository, to_object_id
+from utils.versions import bump_version
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BULK_MAX_CHUNK_SIZE = 10_000
+
+
+async def read_items(request: Request) -> List[Any]:
+    """Lee un arreglo JSON o un cuerpo NDJSON (una entrada por línea)"""
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cuerpo JSON/NDJSON inválido")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Se esperaba un arreglo de elementos")
+    return items
+
+
+def error_message(e: ValidationError) -> str:
+    """Primer error de validación como `campo: mensaje`"""
+    first = e.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+def _chunks(items: List, size: int):
+    size = max(1, min(size, BULK_MAX_CHUNK_SIZE))
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def summary(results: List[BulkItemResult]) -> BulkResult:
+    results.sort(key=lambda item: item.index)
+    succeeded = sum(1 for item in results if item.ok)
+    return BulkResult(total=len(results), succeeded=succeeded, failed=len(results) - succeeded, items=results)
+
+
+async def write_operations(repo: Repository, pending: List[Tuple[int, str, Any]], chunk_size: int) -> List[BulkItemResult]:
+    """Ejecuta las operaciones con bulk_write no ordenado, por bloques, y reporta cada una"""
+    results = []
+    for chunk in _chunks(pending, chunk_size):
+        failed: Dict[int, str] = {}
+        try:
+            await repo.coll.bulk_write([operation for _, _, operation in chunk], ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error.get("errmsg", "Error de escritura") for error in e.details.get("writeErrors", [])}
+        for position, (index, id, _) in enumerate(chunk):
+            error = failed.get(position)
+            results.append(BulkItemResult(index=index, id=id, ok=error is None, error=error))
+    if pending:
+        await bump_version(repo.collection)
+    return results
+
+
+async def _existing_ids(repo: Repository, oids: List[ObjectId]) -> set:
+    existing = set()
+    for chunk in _chunks(oids, BULK_MAX_CHUNK_SIZE):
+        cursor = repo.coll.find({"_id": {"$in": chunk}}, {"_id": 1})
+        existing.update([doc["_id"] async for doc in cursor])
+    return existing
+
+
+async def bulk_create(repo: Repository, items: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    results, pending = [], []
+    for index, raw in enumerate(items):
+        try:
+            model = repo.model.model_validate(raw)
+        except ValidationError as e:
+            results.append(BulkItemResult(index=index, ok=False, error=error_message(e)))
+            continue
+        oid = ObjectId()
+        pending.append((index, str(oid), InsertOne({"_id": oid, **repo.to_document(model)})))
+
+    results.extend(await write_operations(repo, pending, chunk_size))
+    return summary(results)
+
+
+def validate_updates(repo: Repository, items: List[Any]) -> Tuple[List[BulkItemResult], List[Tuple[int, str, ObjectId, BaseModel]]]:
+    """Separa las entradas inválidas (ya como resultados) de las válidas: (índice, id, ObjectId, modelo)"""
+    results, validated = [], []
+    for index, raw in enumerate(items):
+        try:
+            model = repo.model.model_validate(raw)
+        except ValidationError as e:
+            results.append(BulkItemResult(index=index, ok=False, error=error_message(e)))
+            continue
+        id = getattr(model, repo.id_field)
+        oid = to_object_id(id) if id else None
+        if oid is None:
+            results.append(BulkItemResult(index=index, id=id, ok=False, error=f"{repo.id_field} inválido o ausente"))
+            continue
+        validated.append((index, id, oid, model))
+    return results, validated
+
+
+async def bulk_update(repo: Repository, items: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    results, validated = validate_updates(repo, items)
+
+    # Un solo $in para distinguir los inexistentes, que bulk_write no reporta por elemento
+    existing = await _existing_ids(repo, [oid for _, _, oid, _ in validated])
+    pending = []
+    for index, id, oid, model in validated:
+        if oid not in existing:
+            results.append(BulkItemResult(index=index, id=id, ok=False, error="No encontrado"))
+            continue
+        pending.append((index, id, UpdateOne({"_id": oid}, {"$set": repo.to_document(model), "$inc": {VERSION_FIELD: 1}})))
+
+    results.extend(await write_operations(repo, pending, chunk_size))
+    return summary(results)
+
+
+async def bulk_delete(repo: Repository, ids: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkResult:
+    results, validated = [], []
+    for index, id in enumerate(ids):
+        oid = to_object_id(id) if isinstance(id, str) else None
+        if oid is None:
+            results.append(BulkItemResult(index=index, ok=False, error="ID inválido"))
+            continue
+        validated.append((index, id, oid))
+
+    existing = await _existing_ids(repo, [oid for _, _, oid in validated])
+    pending = []
+    for index, id, oid in validated:
+        if oid not in existing:
+            results.append(BulkItemResult(index=index, id=id, ok=False, error="No encontrado"))
+            continue
+        pending.append((index, id, DeleteOne({"_id": oid})))
+
+    results.extend(await write_operations(repo, pending, chunk_size))
+    return summary(results)
+
+
+def succeeded_ids(result: BulkResult) -> List[str]:
+    return [item.id for item in result.items if item.ok and item.id]
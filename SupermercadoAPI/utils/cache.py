@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+CACHE_NEGATIVE_TTL = float(os.getenv("CACHE_NEGATIVE_TTL", "5"))
+
+_caches: List["TTLCache"] = []
+
+
+class TTLCache:
+    """
+    Caché LRU en memoria con expiración por entrada.
+
+    Un `None` devuelto por el loader se guarda como resultado negativo (404)
+    con un TTL más corto. Si llegan varias peticiones por la misma clave sin
+    entrada en caché, solo la primera consulta la base de datos y el resto
+    espera su resultado (single-flight).
+    """
+
+    def __init__(
+            self
+            , name: str
+            , ttl: float
+            , maxsize: int = CACHE_MAXSIZE
+            , negative_ttl: float = CACHE_NEGATIVE_TTL
+    ):
+        self.name = name
+        self.ttl = float(os.getenv(f"CACHE_TTL_{name.upper()}", ttl))
+        self.maxsize = maxsize
+        self.negative_ttl = negative_ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches.append(self)
+
+    def _lookup(self, key: Hashable):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any):
+        ttl = self.negative_ttl if value is None else self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # evita el aviso si nadie más esperaba
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            # Si hubo una escritura mientras se consultaba, el valor ya no es fiable
+            if self._inflight.get(key) is future:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {cache.name: cache.stats() for cache in _caches}
@@ -0,0 +1,96 @@
+"""
+Catálogo como vista materializada de products + inventories.
+
+Cada entrada usa el mismo `_id` que su producto, toma el nombre del producto
+y deriva `stock`/`availability` de la suma del stock de sus inventarios, así
+que el GET público es una lectura por `_id` siempre coherente con el stock.
+
+    python -m utils.catalog_view --rebuild
+"""
+import sys
+import asyncio
+from typing import Iterable, List
+
+from utils.mongodb import get_collection, close_client
+from utils.repository import to_object_id
+from utils.versions import bump_version
+
+REBUILD_DELETE_BATCH = 1000
+
+
+# Reemplaza la entrada pero conserva e incrementa su versión (ETags y lectores que comparan versiones)
+_MERGE = {"$merge": {
+    "into": "catalogs",
+    "on": "_id",
+    "whenMatched": [{"$replaceWith": {"$mergeObjects": [
+        "$$new", {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}
+    ]}}],
+    "whenNotMatched": "insert"
+}}
+
+
+def _pipeline(match: dict) -> List[dict]:
+    return [
+        {"$match": match},
+        {"$addFields": {"product_id": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": "inventories",
+            "localField": "product_id",
+            "foreignField": "product_id",
+            "as": "inventory"
+        }},
+        {"$project": {
+            "product_id": 1,
+            "name": 1,
+            "stock": {"$sum": "$inventory.stock"},
+            "availability": {"$gt": [{"$sum": "$inventory.stock"}, 0]}
+        }},
+    ]
+
+
+async def refresh(product_ids: Iterable[str]) -> List[str]:
+    """Recalcula las entradas de estos productos y elimina las de productos borrados"""
+    oids = list({oid for oid in (to_object_id(i) for i in product_ids) if oid is not None})
+    if not oids:
+        return []
+
+    await (await get_collection("products").aggregate(_pipeline({"_id": {"$in": oids}}) + [_MERGE])).to_list()
+
+    existing = {doc["_id"] async for doc in get_collection("products").find({"_id": {"$in": oids}}, {"_id": 1})}
+    removed = [oid for oid in oids if oid not in existing]
+    if removed:
+        await get_collection("catalogs").delete_many({"_id": {"$in": removed}})
+    await bump_version("catalogs")
+    return [str(oid) for oid in oids]
+
+
+async def rebuild():
+    """
+    Regenera el catálogo completo con el mismo $merge que `refresh` (un $out
+    reemplazaría la colección y perdería la versión de cada entrada) y borra
+    las entradas cuyo producto ya no existe.
+    """
+    await (await get_collection("products").aggregate(_pipeline({}) + [_MERGE], allowDiskUse=True)).to_list()
+
+    orphans = await get_collection("catalogs").aggregate([
+        {"$lookup": {"from": "products", "localField": "_id", "foreignField": "_id", "as": "product"}},
+        {"$match": {"product": {"$size": 0}}},
+        {"$project": {"_id": 1}},
+    ])
+    removed = [doc["_id"] async for doc in orphans]
+    for start in range(0, len(removed), REBUILD_DELETE_BATCH):
+        await get_collection("catalogs").delete_many({"_id": {"$in": removed[start:start + REBUILD_DELETE_BATCH]}})
+    await bump_version("catalogs")
+
+
+async def _main():
+    await rebuild()
+    count = await get_collection("catalogs").count_documents({})
+    await close_client()
+    print(f"Catálogo regenerado: {count} entradas")
+
+
+if __name__ == "__main__":
+    if "--rebuild" not in sys.argv[1:]:
+        sys.exit("Uso: python -m utils.catalog_view --rebuild")
+    asyncio.run(_main())
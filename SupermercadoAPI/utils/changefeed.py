@@ -0,0 +1,238 @@
+"""
+Avisos de cambios en Mongo para todos los workers: cada proceso consume un
+change stream de las colecciones suscritas y entrega los cambios a sus
+handlers (invalidar cachés locales, refrescar el índice de búsqueda...).
+Así un worker se entera de las escrituras hechas por otro.
+
+- El resume token se guarda en `change_feed_state` (como mucho una vez por
+  CHANGE_FEED_SAVE_INTERVAL segundos), en un documento por worker, y al
+  reiniciar se continúa desde él. Si el oplog ya no lo tiene, se empieza de
+  cero y se avisa a los handlers con un cambio de colección completa.
+- Cada worker toma en concesión un hueco estable: CHANGE_FEED_NAME si está
+  definido o, si no, el primero libre de host-0, host-1... La concesión se
+  renueva mientras corre y se suelta al apagarse, así que un worker que
+  reinicia retoma un hueco de su host y su token; dos workers nunca escriben
+  el mismo. Los documentos sin renovar caducan con un índice TTL.
+- Sin replica set no hay change streams: se sondea la colección `versions`
+  (ver utils.versions) y, si una colección cambió por escrituras de otro
+  proceso, se avisa con un cambio de colección completa (`id` None).
+
+    change_feed.subscribe("products", handler)   # handler(cambios: List[Change])
+"""
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from utils.mongodb import DB, get_client, get_collection
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "true").lower() != "false"
+CHANGE_FEED_NAME = os.getenv("CHANGE_FEED_NAME")
+# Una concesión sin renovar en este tiempo (worker caído) deja libre su hueco
+CHANGE_FEED_LEASE = float(os.getenv("CHANGE_FEED_LEASE", "30"))
+CHANGE_FEED_MAX_SLOTS = 64
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "2"))
+CHANGE_FEED_SAVE_INTERVAL = float(os.getenv("CHANGE_FEED_SAVE_INTERVAL", "1"))
+CHANGE_FEED_BATCH = 500
+STATE_COLLECTION = "change_feed_state"
+# Huecos que ningún worker renueva (p. ej. de hosts que ya no existen) se borran solos
+CHANGE_FEED_STATE_TTL = float(os.getenv("CHANGE_FEED_STATE_TTL", "168"))
+
+# Códigos de Mongo: sin replica set, y resume token fuera del oplog
+_NOT_REPLICA_SET = {40573}
+_HISTORY_LOST = {260, 280, 286}
+
+
+class Change(NamedTuple):
+    collection: str
+    op: str                        # insert, update, replace, delete o invalidate (toda la colección)
+    id: Optional[str]
+    fields: Optional[dict]         # documento completo (insert/replace) o campos cambiados (update)
+
+
+Handler = Callable[[List[Change]], Awaitable[None]]
+
+
+def _change(event: dict) -> Change:
+    collection = event["ns"]["coll"]
+    op = event["operationType"]
+    if op not in ("insert", "update", "replace", "delete"):
+        # drop, rename, dropDatabase...
+        return Change(collection, "invalidate", None, None)
+    if op == "update":
+        fields = event.get("updateDescription", {}).get("updatedFields")
+    else:
+        fields = event.get("fullDocument")
+    return Change(collection, op, str(event["documentKey"]["_id"]), fields)
+
+
+class ChangeFeed:
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+        # Escrituras hechas por este proceso, para que el sondeo no las trate como ajenas
+        self._local_writes: Dict[str, int] = {}
+        self.mode = "off"
+        # Hueco en `change_feed_state` donde este proceso guarda su resume token
+        self.name: Optional[str] = None
+        self._lease = uuid.uuid4().hex
+
+    def subscribe(self, collection: str, handler: Handler):
+        self._handlers.setdefault(collection, []).append(handler)
+
+    def polls(self, collection: str) -> bool:
+        """True si los cambios de esta colección se detectan sondeando su versión"""
+        return self.mode == "polling" and collection in self._handlers
+
+    def note_local_write(self, collection: str, count: int = 1):
+        self._local_writes[collection] = self._local_writes.get(collection, 0) + count
+
+    async def dispatch(self, changes: List[Change]):
+        by_collection: Dict[str, List[Change]] = {}
+        for change in changes:
+            by_collection.setdefault(change.collection, []).append(change)
+        for collection, batch in by_collection.items():
+            for handler in self._handlers.get(collection, ()):
+                try:
+                    await handler(batch)
+                except Exception as e:
+                    logger.error(f"Error procesando cambios de {collection} en {getattr(handler, '__qualname__', handler)}: {str(e)}")
+
+    async def _invalidate_all(self):
+        await self.dispatch([Change(collection, "invalidate", None, None) for collection in self._handlers])
+
+    async def run(self):
+        """Corre hasta que se cancele; reintenta con espera creciente si se cae la conexión"""
+        delay = 1.0
+        try:
+            while True:
+                try:
+                    await self._stream()
+                except OperationFailure as e:
+                    if e.code in _NOT_REPLICA_SET:
+                        logger.warning("Mongo sin replica set: los cambios se detectan sondeando la colección versions")
+                        await self._release()
+                        await self._poll()
+                        return
+                    if e.code in _HISTORY_LOST:
+                        logger.warning("El resume token ya no está en el oplog: se continúa desde ahora")
+                        await self._save({"token": None})
+                        await self._invalidate_all()
+                        continue
+                    logger.error(f"Error en el change stream: {str(e)}")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error en el change stream: {str(e)}")
+                self.mode = "reconnecting"
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+        finally:
+            await self._release()
+
+    async def _claim(self) -> str:
+        """Toma en concesión CHANGE_FEED_NAME o el primer hueco libre de este host"""
+        names = [CHANGE_FEED_NAME] if CHANGE_FEED_NAME else [f"{socket.gethostname()}-{slot}" for slot in range(CHANGE_FEED_MAX_SLOTS)]
+        for name in names:
+            now = datetime.utcnow()
+            try:
+                # Si el hueco existe y su concesión sigue vigente, el upsert choca con su _id
+                await get_collection(STATE_COLLECTION).update_one(
+                    {"_id": name, "$or": [{"leased_until": {"$lt": now}}, {"lease": self._lease}, {"leased_until": None}]},
+                    {"$set": {"lease": self._lease, "leased_until": now + timedelta(seconds=CHANGE_FEED_LEASE), "updated_at": now}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                continue
+            logger.info(f"Change feed con el hueco {name}")
+            return name
+        raise RuntimeError(f"Ningún hueco libre para el resume token entre {names[0]} y {names[-1]}")
+
+    async def _save(self, fields: dict):
+        """Guarda en el hueco y renueva la concesión; falla si otro worker lo tomó"""
+        if self.name is None:
+            return
+        now = datetime.utcnow()
+        result = await get_collection(STATE_COLLECTION).update_one(
+            {"_id": self.name, "lease": self._lease},
+            {"$set": {**fields, "leased_until": now + timedelta(seconds=CHANGE_FEED_LEASE), "updated_at": now}}
+        )
+        if not result.matched_count:
+            lost, self.name = self.name, None
+            raise RuntimeError(f"Se perdió la concesión del hueco {lost}")
+
+    async def _release(self):
+        if self.name is None:
+            return
+        try:
+            await get_collection(STATE_COLLECTION).update_one(
+                {"_id": self.name, "lease": self._lease},
+                {"$set": {"leased_until": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logger.error(f"Error soltando el hueco {self.name} del change feed: {str(e)}")
+        self.name = None
+
+    async def _stream(self):
+        if self.name is None:
+            self.name = await self._claim()
+        saved = await get_collection(STATE_COLLECTION).find_one({"_id": self.name})
+        pipeline = [
+            {"$match": {"ns.coll": {"$in": list(self._handlers)}}},
+            {"$project": {"operationType": 1, "ns": 1, "documentKey": 1, "fullDocument": 1, "updateDescription.updatedFields": 1}},
+        ]
+        stream = await get_client()[DB].watch(
+            pipeline,
+            start_after=saved.get("token") if saved else None,
+            max_await_time_ms=500,
+            batch_size=CHANGE_FEED_BATCH
+        )
+        async with stream:
+            self.mode = "stream"
+            logger.info(f"Change stream activo para {sorted(self._handlers)}")
+            batch: List[Change] = []
+            saved_at = renewed_at = 0.0
+            loop = asyncio.get_running_loop()
+            while stream.alive:
+                event = await stream.try_next()
+                if event is not None:
+                    batch.append(_change(event))
+                if batch and (event is None or len(batch) >= CHANGE_FEED_BATCH):
+                    await self.dispatch(batch)
+                    batch = []
+                if event is None and stream.resume_token and loop.time() - saved_at >= CHANGE_FEED_SAVE_INTERVAL:
+                    await self._save({"token": stream.resume_token})
+                    saved_at = renewed_at = loop.time()
+                elif loop.time() - renewed_at >= CHANGE_FEED_LEASE / 3:
+                    await self._save({})
+                    renewed_at = loop.time()
+
+    async def _poll(self):
+        """
+        Compara las versiones de colección entre sondeos descontando las
+        escrituras de este proceso; si queda alguna ajena, la colección cambió.
+        Las escrituras locales se anotan antes de incrementar la versión, así
+        que una ajena puede detectarse un sondeo tarde pero no perderse.
+        """
+        self.mode = "polling"
+        versions = get_collection("versions")
+        previous: Optional[Dict[str, int]] = None
+        while True:
+            local = dict(self._local_writes)
+            found = {doc["_id"]: doc["version"] async for doc in versions.find({"_id": {"$in": list(self._handlers)}})}
+            current = {collection: found.get(collection, 0) - local.get(collection, 0) for collection in self._handlers}
+            if previous is not None:
+                changed = [collection for collection, remote in current.items() if remote > previous.get(collection, remote)]
+                if changed:
+                    await self.dispatch([Change(collection, "invalidate", None, None) for collection in changed])
+            previous = current
+            await asyncio.sleep(CHANGE_FEED_POLL_INTERVAL)
+
+
+change_feed = ChangeFeed()
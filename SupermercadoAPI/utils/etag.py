@@ -0,0 +1,65 @@
+"""
+GET condicionales con ETag para las rutas de lectura.
+
+- Listados (`conditional`): la ETag combina la versión de la colección con
+  la ruta y los parámetros de la petición. Se calcula antes de consultar
+  nada, así que un `If-None-Match` que coincide se responde con 304 sin leer
+  de Mongo ni serializar. La versión se lee antes que los datos y se cachea
+  VERSION_TTL segundos: durante ese margen tras una escritura de otro
+  proceso, la ETag vieja puede acompañar ya al cuerpo nuevo (y un cliente
+  con el cuerpo viejo recibir 304), nunca al revés.
+- Documentos (`conditional_item`): la ETag es el campo `version` del propio
+  documento, tomado del mismo cuerpo que se responde (aunque venga de una
+  caché), así que nunca acompaña a un cuerpo de otra versión y no cambia por
+  escrituras en el resto de la colección.
+"""
+import os
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from utils.responses import FastJSONResponse
+from utils.versions import collection_version
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_AGE = int(os.getenv("HTTP_MAX_AGE", "0"))
+CACHE_CONTROL = f"public, max-age={HTTP_MAX_AGE}, must-revalidate"
+
+
+def _tag(collection: str, version: int, request: Request) -> str:
+    target = f"{request.url.path}?{request.url.query}".encode()
+    return f'"{collection}-{version}-{hashlib.blake2b(target, digest_size=8).hexdigest()}"'
+
+
+def matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Comparación débil, como pide RFC 9110 para If-None-Match"""
+    if not if_none_match:
+        return False
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+def _respond(request: Request, tag: str, body: Any) -> Response:
+    headers = {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+    if matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(body, headers=headers)
+
+
+async def conditional(request: Request, collection: str, loader: Callable[[], Awaitable[Any]]) -> Response:
+    try:
+        tag = _tag(collection, await collection_version(collection), request)
+    except Exception as e:
+        logger.error(f"Error leyendo la versión de {collection}: {str(e)}")
+        return FastJSONResponse(await loader())
+    if matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": CACHE_CONTROL})
+    return _respond(request, tag, await loader())
+
+
+async def conditional_item(request: Request, collection: str, loader: Callable[[], Awaitable[BaseModel]]) -> Response:
+    item = await loader()
+    return _respond(request, _tag(collection, item.version, request), item)
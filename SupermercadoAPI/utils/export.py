@@ -0,0 +1,129 @@
+"""
+Exportaciones en CSV o NDJSON leídas directamente del cursor de Mongo.
+
+Los documentos se escriben por lotes sin pasar por modelos de Pydantic, así
+que la memoria no depende del número de filas. El orden es por `_id`: si la
+conexión se corta, se reanuda con `after=<último id recibido completo>` (la
+primera columna en CSV, el campo id en NDJSON). Al reanudar no se repite la
+cabecera del CSV, y con gzip cada respuesta es un miembro gzip independiente,
+por lo que las partes pueden concatenarse tal cual.
+"""
+import io
+import os
+import csv
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable, List, Literal, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from utils.pagination import keyset_filter
+from utils.responses import dumps
+
+ExportFormat = Literal["csv", "ndjson"]
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_MAX_BATCH_SIZE = 10000
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def date_range(field: str, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    """Filtro [start, end) sobre un campo de fecha"""
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="La fecha inicial debe ser anterior a la final")
+    bounds = {}
+    if start is not None:
+        bounds["$gte"] = start
+    if end is not None:
+        bounds["$lt"] = end
+    return {field: bounds} if bounds else {}
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_stream(
+        coll
+        , query: dict
+        , id_field: str
+        , fmt: ExportFormat
+        , columns: List[str]
+        , rows: Optional[Callable[[dict], Iterable[list]]] = None
+        , after: Optional[str] = None
+        , batch_size: int = EXPORT_BATCH_SIZE
+        , compress: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    `columns` es la cabecera del CSV y `rows` convierte un documento (ya con
+    su id público) en una o más filas; por defecto, una fila con esas columnas.
+    """
+    # Cursor y fechas se validan antes de empezar a enviar la respuesta
+    query = {**query, **keyset_filter(after)}
+    batch_size = max(1, min(batch_size, EXPORT_MAX_BATCH_SIZE))
+    rows = rows or (lambda doc: [[doc.get(column) for column in columns]])
+
+    async def chunks():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        ndjson: List[bytes] = []
+        pending = 0
+
+        if fmt == "csv" and not after:
+            writer.writerow(columns)
+
+        cursor = coll.find(query).sort("_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            doc[id_field] = str(doc.pop("_id"))
+            if fmt == "csv":
+                writer.writerows([_cell(value) for value in row] for row in rows(doc))
+            else:
+                ndjson.append(dumps(doc) + b"\n")
+            pending += 1
+            if pending == batch_size:
+                yield _drain(buffer, ndjson)
+                pending = 0
+        tail = _drain(buffer, ndjson)
+        if tail:
+            yield tail
+
+    if not compress:
+        return chunks()
+
+    async def gzipped():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        async for chunk in chunks():
+            # Sync flush por lote: lo recibido antes de un corte se puede descomprimir
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+    return gzipped()
+
+
+def _drain(buffer: io.StringIO, ndjson: List[bytes]) -> bytes:
+    if ndjson:
+        data = b"".join(ndjson)
+        ndjson.clear()
+        return data
+    data = buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def export_response(stream: AsyncIterator[bytes], fmt: ExportFormat, name: str, compress: bool) -> StreamingResponse:
+    filename = f"{name}.{fmt}" + (".gz" if compress else "")
+    return StreamingResponse(
+        stream,
+        media_type="application/gzip" if compress else MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
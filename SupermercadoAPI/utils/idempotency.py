@@ -0,0 +1,217 @@
+"""
+Soporte de la cabecera `Idempotency-Key` en los endpoints de creación.
+
+La primera petición con una clave la reclama insertando un registro
+`pending` en `idempotency_keys` (el `_id` único hace de candado entre
+procesos), ejecuta la creación y guarda el código y el cuerpo de la
+respuesta. Los reintentos con la misma clave reciben esa respuesta tal cual,
+con `Idempotent-Replayed: true`, sin volver a crear nada.
+
+- Duplicados concurrentes en el mismo proceso esperan el resultado de la
+  primera petición; en otro proceso sondean el registro hasta que termina.
+- Mientras la petición corre se renueva su candado; solo se retoma un
+  registro `pending` cuyo proceso dejó de renovarlo (se cayó).
+- La clave se asocia al usuario y al endpoint, y a una huella del cuerpo:
+  reutilizarla con otro cuerpo responde 422.
+- Si la creación se rechaza (4xx: validación, stock insuficiente...) no se
+  escribió nada: se borra el registro y el cliente puede reintentar. Si falla
+  a medias (5xx, otra excepción o cancelación) pudo quedar algo escrito, así
+  que se guarda el error y los reintentos lo reciben en vez de duplicar.
+- Un índice TTL borra los registros pasadas IDEMPOTENCY_TTL horas.
+"""
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from utils.mongodb import get_collection
+from utils.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "24"))
+# Cuánto espera un duplicado a que termine la petición original antes de rendirse (409)
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10"))
+# Un registro `pending` cuyo candado no se renueva en este tiempo se da por
+# abandonado (proceso caído) y se puede retomar; se renueva cada tercio
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60"))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+# Peticiones en curso en este proceso: clave -> (huella del cuerpo, respuesta futura)
+_inflight: Dict[str, Tuple[str, "asyncio.Future[Response]"]] = {}
+
+
+def _fingerprint(payload: Any) -> str:
+    return hashlib.blake2b(dumps(payload), digest_size=16).hexdigest()
+
+
+def _response(record: dict, replayed: bool) -> Response:
+    response = Response(content=record["body"], status_code=record["status_code"], media_type="application/json")
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+async def _claim(id: str, fingerprint: str, lock: str) -> Optional[dict]:
+    """Reclama la clave; devuelve None si es nuestra o el registro existente si no"""
+    coll = get_collection(IDEMPOTENCY_COLLECTION)
+    now = datetime.utcnow()
+    try:
+        await coll.insert_one({
+            "_id": id, "state": "pending", "fingerprint": fingerprint,
+            "lock": lock, "created_at": now, "locked_at": now
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    # Retoma un registro pendiente cuyo proceso dejó de renovar el candado
+    taken = await coll.find_one_and_update(
+        {
+            "_id": id,
+            "state": "pending",
+            "fingerprint": fingerprint,
+            "locked_at": {"$lt": now - timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT)}
+        },
+        {"$set": {"lock": lock, "locked_at": now}},
+        return_document=ReturnDocument.AFTER
+    )
+    if taken is not None:
+        logger.warning(f"Retomando la clave de idempotencia abandonada {id}")
+        return None
+    return await coll.find_one({"_id": id}) or {"state": "pending", "fingerprint": fingerprint}
+
+
+async def _wait(id: str) -> Optional[dict]:
+    """Sondea el registro de otro proceso hasta que tenga respuesta; None si la original falló"""
+    coll = get_collection(IDEMPOTENCY_COLLECTION)
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT
+    delay = 0.02
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+        record = await coll.find_one({"_id": id})
+        if record is None or record["state"] == "done":
+            return record
+    raise HTTPException(status_code=409, detail="La petición original con esta Idempotency-Key sigue en curso")
+
+
+async def _keep_locked(id: str, lock: str):
+    """Renueva el candado mientras corre la petición para que ningún otro proceso lo retome"""
+    coll = get_collection(IDEMPOTENCY_COLLECTION)
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_LOCK_TIMEOUT / 3)
+        try:
+            result = await coll.update_one({"_id": id, "lock": lock, "state": "pending"}, {"$set": {"locked_at": datetime.utcnow()}})
+            if not result.matched_count:
+                logger.warning(f"Se perdió el candado de la clave de idempotencia {id}")
+                return
+        except Exception as e:
+            logger.error(f"Error renovando el candado de la clave de idempotencia {id}: {str(e)}")
+
+
+async def _finish(id: str, lock: str, status_code: int, content: Any) -> dict:
+    record = {"state": "done", "status_code": status_code, "body": dumps(content)}
+    try:
+        await get_collection(IDEMPOTENCY_COLLECTION).update_one(
+            {"_id": id, "lock": lock},
+            {"$set": record, "$unset": {"lock": "", "locked_at": ""}}
+        )
+    except Exception as e:
+        # La petición ya terminó; mejor responder que fallar por no poder guardarla
+        logger.error(f"Error guardando la respuesta de la clave de idempotencia {id}: {str(e)}")
+    return record
+
+
+async def _release(id: str, lock: str):
+    try:
+        await get_collection(IDEMPOTENCY_COLLECTION).delete_one({"_id": id, "lock": lock, "state": "pending"})
+    except Exception as e:
+        logger.error(f"Error liberando la clave de idempotencia {id}: {str(e)}")
+
+
+async def _execute(id: str, fingerprint: str, handler: Callable[[], Awaitable[Any]]) -> Response:
+    lock = uuid.uuid4().hex
+    while True:
+        record = await _claim(id, fingerprint, lock)
+        if record is None:
+            break
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key ya usada con otro cuerpo de petición")
+        if record["state"] != "done":
+            record = await _wait(id)
+        if record is not None:
+            return _response(record, replayed=True)
+        # La petición original falló y liberó la clave: se vuelve a reclamar
+
+    heartbeat = asyncio.create_task(_keep_locked(id, lock))
+    try:
+        result = await handler()
+    except HTTPException as e:
+        if e.status_code < 500:
+            # Rechazada antes de escribir: se libera la clave para que el cliente reintente
+            await _release(id, lock)
+        else:
+            await _finish(id, lock, e.status_code, {"detail": e.detail})
+        raise
+    except BaseException:
+        # Pudo quedar algo escrito: se guarda el error en vez de liberar la clave
+        await _finish(id, lock, 500, {"detail": "Error interno del servidor"})
+        raise
+    finally:
+        heartbeat.cancel()
+
+    return _response(await _finish(id, lock, 200, result), replayed=False)
+
+
+async def idempotent(
+        key: Optional[str]
+        , scope: str
+        , owner: Optional[str]
+        , payload: BaseModel
+        , handler: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Ejecuta `handler` una sola vez por (scope, owner, key). Sin clave se
+    ejecuta normalmente y devuelve su resultado; con clave devuelve la
+    respuesta JSON guardada.
+    """
+    if key is None:
+        return await handler()
+    if not key or len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key inválida")
+
+    id = f"{scope}:{owner or '-'}:{key}"
+    fingerprint = _fingerprint(payload)
+    while id in _inflight:
+        running_fingerprint, running = _inflight[id]
+        if running_fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key ya usada con otro cuerpo de petición")
+        try:
+            response = await asyncio.shield(running)
+        except BaseException:
+            if not running.done():
+                raise
+            # La petición original falló: se recibe el error que guardó o, si liberó la clave, se intenta como nueva
+            continue
+        return _response({"status_code": response.status_code, "body": response.body}, replayed=True)
+
+    future: "asyncio.Future[Response]" = asyncio.get_running_loop().create_future()
+    _inflight[id] = (fingerprint, future)
+    try:
+        response = await _execute(id, fingerprint, handler)
+        future.set_result(response)
+        return response
+    finally:
+        if not future.done():
+            future.cancel()
+        _inflight.pop(id, None)
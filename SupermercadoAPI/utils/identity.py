@@ -0,0 +1,159 @@
+import os
+import uuid
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_PROVIDER = os.getenv("IDENTITY_PROVIDER", "firebase")
+IDENTITY_TIMEOUT = float(os.getenv("IDENTITY_TIMEOUT", "5"))
+IDENTITY_MAX_CONCURRENCY = int(os.getenv("IDENTITY_MAX_CONCURRENCY", "50"))
+FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", "secrets/firebase.json")
+SIGN_IN_URL = "https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword"
+
+
+class IdentityError(Exception):
+    """Credenciales rechazadas o usuario inválido para el proveedor"""
+
+
+class IdentityUnavailable(IdentityError):
+    """El proveedor no respondió a tiempo o falló"""
+
+
+class IdentityProvider:
+    async def sign_in(self, email: str, password: str) -> None:
+        raise NotImplementedError
+
+    async def create_user(self, email: str, password: str) -> str:
+        raise NotImplementedError
+
+    async def delete_user(self, uid: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class FirebaseIdentityProvider(IdentityProvider):
+    """
+    Firebase con un cliente HTTP asíncrono compartido (keep-alive y timeouts)
+    y un semáforo que limita las llamadas simultáneas al proveedor. El SDK de
+    administración se inicializa en la primera llamada que lo necesita y sus
+    llamadas bloqueantes corren en un hilo aparte.
+    """
+
+    def __init__(
+            self
+            , api_key: Optional[str] = None
+            , timeout: float = IDENTITY_TIMEOUT
+            , max_concurrency: int = IDENTITY_MAX_CONCURRENCY
+    ):
+        self.api_key = api_key or os.getenv("FIREBASE_API_KEY")
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout)
+            , limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._admin_auth = None
+
+    def _auth(self):
+        if self._admin_auth is None:
+            import firebase_admin
+            from firebase_admin import credentials, auth
+
+            try:
+                firebase_admin.get_app()
+            except ValueError:
+                firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CREDENTIALS))
+            self._admin_auth = auth
+        return self._admin_auth
+
+    async def sign_in(self, email: str, password: str) -> None:
+        payload = {
+            "email": email
+            , "password": password
+            , "returnSecureToken": True
+        }
+        async with self._semaphore:
+            try:
+                response = await self._http.post(SIGN_IN_URL, params={"key": self.api_key}, json=payload)
+            except httpx.HTTPError as e:
+                raise IdentityUnavailable(str(e))
+
+        if response.status_code >= 500:
+            raise IdentityUnavailable(f"Firebase respondió {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError:
+            raise IdentityUnavailable("Respuesta inválida de Firebase")
+        if "error" in data:
+            raise IdentityError("Credenciales inválidas")
+
+    async def create_user(self, email: str, password: str) -> str:
+        async with self._semaphore:
+            try:
+                record = await asyncio.to_thread(self._auth().create_user, email=email, password=password)
+            except Exception as e:
+                raise IdentityError(str(e))
+        return record.uid
+
+    async def delete_user(self, uid: str) -> None:
+        async with self._semaphore:
+            await asyncio.to_thread(self._auth().delete_user, uid)
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+
+class FakeIdentityProvider(IdentityProvider):
+    """Proveedor en memoria para pruebas y benchmarks, con latencia simulada opcional"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.users: Dict[str, tuple] = {}
+
+    async def sign_in(self, email: str, password: str) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        user = self.users.get(email)
+        if user is None or user[1] != password:
+            raise IdentityError("Credenciales inválidas")
+
+    async def create_user(self, email: str, password: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if email in self.users:
+            raise IdentityError("El email ya está registrado")
+        uid = uuid.uuid4().hex
+        self.users[email] = (uid, password)
+        return uid
+
+    async def delete_user(self, uid: str) -> None:
+        for email, (user_uid, _) in list(self.users.items()):
+            if user_uid == uid:
+                del self.users[email]
+
+
+_provider: Optional[IdentityProvider] = None
+
+
+def get_identity_provider() -> IdentityProvider:
+    global _provider
+    if _provider is None:
+        _provider = FakeIdentityProvider() if IDENTITY_PROVIDER == "fake" else FirebaseIdentityProvider()
+    return _provider
+
+
+def set_identity_provider(provider: IdentityProvider):
+    global _provider
+    _provider = provider
+
+
+async def close_identity_provider():
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+    _provider = None
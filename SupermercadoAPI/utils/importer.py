@@ -0,0 +1,290 @@
+"""
+Importación en streaming de archivos CSV/NDJSON grandes.
+
+El cuerpo de la petición se lee por trozos y se convierte en filas sin
+cargar el archivo completo. Cada bloque de `chunk_size` filas se valida con
+el modelo, resuelve sus referencias con una sola consulta `$in` y se escribe
+con `bulk_write`. Como mucho hay IMPORT_MAX_IN_FLIGHT bloques escribiéndose a
+la vez: si Mongo va más lento que la subida, se deja de leer el cuerpo y la
+presión vuelve al cliente por TCP. La memoria queda acotada por
+chunk_size * (IMPORT_MAX_IN_FLIGHT + 1) filas.
+
+El estado de cada trabajo (progreso y errores) se guarda en `import_jobs`
+como mucho cada IMPORT_PROGRESS_INTERVAL segundos y al terminar, así que
+`get_job` lo devuelve desde cualquier worker mientras corre. Un índice TTL
+borra los trabajos pasadas IMPORT_JOB_TTL horas.
+"""
+import io
+import os
+import csv
+import json
+import uuid
+import time
+import codecs
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Literal, Optional, Set, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pydantic import ValidationError
+from pymongo import DESCENDING, InsertOne
+from pymongo.errors import DuplicateKeyError
+
+from models.bulk import BulkItemResult, ImportJob
+from utils.bulk import BULK_MAX_CHUNK_SIZE, error_message, write_operations
+from utils.mongodb import get_collection
+from utils.repository import Repository, to_object_id
+
+logger = logging.getLogger(__name__)
+
+ImportFormat = Literal["csv", "ndjson"]
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_MAX_IN_FLIGHT = int(os.getenv("IMPORT_MAX_IN_FLIGHT", "4"))
+IMPORT_MAX_ERRORS = 1000
+IMPORT_MAX_JOBS = 100
+
+IMPORT_JOBS = "import_jobs"
+IMPORT_JOB_TTL = float(os.getenv("IMPORT_JOB_TTL", "24"))
+IMPORT_PROGRESS_INTERVAL = float(os.getenv("IMPORT_PROGRESS_INTERVAL", "1"))
+# Un trabajo `running` sin progreso guardado en este tiempo se da por abandonado (worker caído)
+IMPORT_STALE_AFTER = float(os.getenv("IMPORT_STALE_AFTER", "600"))
+
+
+def _from_document(doc: dict) -> ImportJob:
+    return ImportJob(job_id=doc.pop("_id"), **doc)
+
+
+async def get_job(job_id: str) -> Optional[ImportJob]:
+    doc = await get_collection(IMPORT_JOBS).find_one({"_id": job_id})
+    return _from_document(doc) if doc else None
+
+
+async def list_jobs() -> List[ImportJob]:
+    cursor = get_collection(IMPORT_JOBS).find({}, {"errors": 0}).sort("started_at", DESCENDING).limit(IMPORT_MAX_JOBS)
+    return [_from_document(doc) async for doc in cursor]
+
+
+async def _save(job: ImportJob):
+    """Guarda el estado del trabajo para que cualquier worker lo consulte"""
+    await get_collection(IMPORT_JOBS).update_one(
+        {"_id": job.job_id},
+        {"$set": {**job.model_dump(exclude={"job_id"}), "updated_at": datetime.utcnow()}}
+    )
+
+
+async def _new_job(kind: str, job_id: Optional[str]) -> ImportJob:
+    job_id = job_id or uuid.uuid4().hex
+    job = ImportJob(job_id=job_id, kind=kind, started_at=datetime.utcnow())
+    document = {**job.model_dump(exclude={"job_id"}), "updated_at": job.started_at}
+    coll = get_collection(IMPORT_JOBS)
+    try:
+        await coll.insert_one({"_id": job_id, **document})
+        return job
+    except DuplicateKeyError:
+        pass
+
+    # Se puede repetir un job_id terminado o abandonado, nunca uno que sigue en curso
+    stale = job.started_at - timedelta(seconds=IMPORT_STALE_AFTER)
+    replaced = await coll.find_one_and_replace(
+        {"_id": job_id, "$or": [{"status": {"$ne": "running"}}, {"updated_at": {"$lt": stale}}]},
+        document
+    )
+    if replaced is None:
+        raise HTTPException(status_code=409, detail="Ya hay una importación en curso con ese job_id")
+    return job
+
+
+def body_format(content_type: str, fmt: Optional[ImportFormat]) -> ImportFormat:
+    """El formato explícito manda; si no, se deduce del Content-Type"""
+    if fmt is not None:
+        return fmt
+    return "csv" if content_type.startswith(("text/csv", "application/csv")) else "ndjson"
+
+
+def _record_errors(job: ImportJob, errors: List[BulkItemResult]):
+    job.failed += len(errors)
+    room = IMPORT_MAX_ERRORS - len(job.errors)
+    job.errors.extend(errors[:max(room, 0)])
+    if len(errors) > room:
+        job.errors_truncated = True
+
+
+async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Líneas de texto UTF-8 a partir de trozos de bytes arbitrarios"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in body:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _csv_records(body: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    header: Optional[List[str]] = None
+    record = ""
+    async for line in _lines(body):
+        record = f"{record}\n{line}" if record else line
+        # Un campo entre comillas puede contener saltos de línea: el registro
+        # termina cuando las comillas quedan balanceadas
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader(io.StringIO(record)), [])
+        record = ""
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        # Las celdas vacías se omiten para que apliquen los valores por defecto
+        yield {key: value for key, value in zip(header, values) if value != ""}
+    if record:
+        yield ValueError("Comillas sin cerrar al final del archivo")
+
+
+async def _ndjson_records(body: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    async for line in _lines(body):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield ValueError("Línea JSON inválida")
+
+
+async def _chunks(records: AsyncIterator[Any], size: int) -> AsyncIterator[List[Tuple[int, Any]]]:
+    chunk = []
+    index = 0
+    async for record in records:
+        chunk.append((index, record))
+        index += 1
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Reference:
+    """Campo del modelo que debe apuntar a un documento existente de `collection`"""
+
+    def __init__(self, field: str, collection: str):
+        self.field = field
+        self.collection = collection
+        self.known: Set[str] = set()
+
+    async def missing(self, ids: Set[str]) -> Set[str]:
+        unknown = ids - self.known
+        oids = [oid for oid in (to_object_id(i) for i in unknown) if oid is not None]
+        if oids:
+            cursor = get_collection(self.collection).find({"_id": {"$in": oids}}, {"_id": 1})
+            self.known.update([str(doc["_id"]) async for doc in cursor])
+        return unknown - self.known
+
+
+async def run_import(
+        kind: str
+        , repo: Repository
+        , body: AsyncIterator[bytes]
+        , fmt: ImportFormat
+        , reference: Optional[Reference] = None
+        , after_write: Optional[Callable[[List[str], List[Any]], Awaitable[None]]] = None
+        , chunk_size: int = IMPORT_CHUNK_SIZE
+        , job_id: Optional[str] = None
+) -> ImportJob:
+    """
+    Importa las filas de `body` en la colección de `repo`. `after_write`
+    recibe los ids insertados y sus modelos de cada bloque (para refrescar
+    vistas derivadas).
+    """
+    job = await _new_job(kind, job_id)
+    chunk_size = max(1, min(chunk_size, BULK_MAX_CHUNK_SIZE))
+    records = _csv_records(body) if fmt == "csv" else _ndjson_records(body)
+    slots = asyncio.Semaphore(IMPORT_MAX_IN_FLIGHT)
+    writes: Set[asyncio.Task] = set()
+
+    async def write(pending: List[Tuple[int, str, Any]], models: List[Any]):
+        try:
+            results = await write_operations(repo, pending, chunk_size)
+            ok = [result.id for result in results if result.ok]
+            job.succeeded += len(ok)
+            _record_errors(job, [result for result in results if not result.ok])
+        except Exception as e:
+            logger.error(f"Error escribiendo bloque de la importación {job.job_id}: {str(e)}")
+            _record_errors(job, [BulkItemResult(index=index, ok=False, error="Error de escritura") for index, _, _ in pending])
+            return
+        finally:
+            slots.release()
+
+        if after_write is not None and ok:
+            inserted = set(ok)
+            try:
+                await after_write(ok, [model for (_, id, _), model in zip(pending, models) if id in inserted])
+            except Exception as e:
+                logger.error(f"Error actualizando vistas tras la importación {job.job_id}: {str(e)}")
+
+    saved_at = time.monotonic()
+    try:
+        async for chunk in _chunks(records, chunk_size):
+            if time.monotonic() - saved_at >= IMPORT_PROGRESS_INTERVAL:
+                await _save(job)
+                saved_at = time.monotonic()
+            job.rows += len(chunk)
+            errors, validated = [], []
+            for index, raw in chunk:
+                if isinstance(raw, Exception):
+                    errors.append(BulkItemResult(index=index, ok=False, error=str(raw)))
+                    continue
+                try:
+                    validated.append((index, repo.model.model_validate(raw)))
+                except ValidationError as e:
+                    errors.append(BulkItemResult(index=index, ok=False, error=error_message(e)))
+
+            if reference is not None and validated:
+                missing = await reference.missing({getattr(model, reference.field) for _, model in validated})
+                if missing:
+                    errors.extend(
+                        BulkItemResult(index=index, ok=False, error=f"{reference.field} no existe")
+                        for index, model in validated if getattr(model, reference.field) in missing
+                    )
+                    validated = [(index, model) for index, model in validated if getattr(model, reference.field) not in missing]
+            _record_errors(job, errors)
+
+            if validated:
+                pending, models = [], []
+                for index, model in validated:
+                    oid = ObjectId()
+                    pending.append((index, str(oid), InsertOne({"_id": oid, **repo.to_document(model)})))
+                    models.append(model)
+                # Espera un hueco antes de seguir leyendo: contrapresión hacia el cliente
+                await slots.acquire()
+                task = asyncio.create_task(write(pending, models))
+                writes.add(task)
+                task.add_done_callback(writes.discard)
+
+        if writes:
+            await asyncio.gather(*writes)
+        job.status = "done"
+
+    except BaseException as e:
+        for task in writes:
+            task.cancel()
+        job.status = "failed"
+        job.error = str(e) or type(e).__name__
+        if not isinstance(e, Exception):
+            raise
+        logger.error(f"Error en la importación {job.job_id}: {str(e)}")
+    finally:
+        job.finished_at = datetime.utcnow()
+        try:
+            await _save(job)
+        except Exception as e:
+            logger.error(f"Error guardando el estado de la importación {job.job_id}: {str(e)}")
+
+    return job
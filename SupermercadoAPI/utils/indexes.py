@@ -0,0 +1,130 @@
+"""
+Índices declarados para cada colección que consulta la API.
+
+    python -m utils.indexes           # compara declarados vs. existentes
+    python -m utils.indexes --apply   # crea los que falten
+"""
+import sys
+import asyncio
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, TEXT, IndexModel
+
+from utils.mongodb import DB, get_client, close_client
+from utils.idempotency import IDEMPOTENCY_COLLECTION, IDEMPOTENCY_TTL
+from utils.importer import IMPORT_JOBS, IMPORT_JOB_TTL
+from utils.changefeed import CHANGE_FEED_STATE_TTL, STATE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    # login busca por email, y un email solo puede registrarse una vez
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "orders": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        # las analíticas filtran por rango de fechas
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ],
+    "inventories": [
+        IndexModel([("product_id", ASCENDING)], name="product_id"),
+        # exportaciones por rango de fechas
+        IndexModel([("date_in", ASCENDING)], name="date_in"),
+        IndexModel([("date_out", ASCENDING)], name="date_out"),
+    ],
+    # libro de movimientos: reproducción por registro o producto y compactación por fecha
+    "inventory_movements": [
+        IndexModel([("inventory_id", ASCENDING), ("at", ASCENDING)], name="inventory_id_at"),
+        IndexModel([("inventory_id", ASCENDING), ("_id", ASCENDING)], name="inventory_id_id"),
+        IndexModel([("product_id", ASCENDING), ("at", ASCENDING)], name="product_id_at"),
+        IndexModel([("at", ASCENDING)], name="at"),
+    ],
+    "inventory_checkpoints": [
+        IndexModel([("inventory_id", ASCENDING), ("at", ASCENDING)], name="inventory_id_at", unique=True),
+        IndexModel([("product_id", ASCENDING), ("at", ASCENDING)], name="product_id_at"),
+    ],
+    "catalogs": [
+        IndexModel([("product_id", ASCENDING)], name="product_id"),
+    ],
+    # las claves de idempotencia caducan solas pasadas IDEMPOTENCY_TTL horas
+    IDEMPOTENCY_COLLECTION: [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=int(IDEMPOTENCY_TTL * 3600)),
+    ],
+    # resume tokens del change feed: caducan si su worker no los guarda en CHANGE_FEED_STATE_TTL horas
+    STATE_COLLECTION: [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=int(CHANGE_FEED_STATE_TTL * 3600)),
+    ],
+    # /imports lista los trabajos más recientes; caducan pasadas IMPORT_JOB_TTL horas
+    IMPORT_JOBS: [
+        IndexModel([("started_at", ASCENDING)], name="started_at_ttl", expireAfterSeconds=int(IMPORT_JOB_TTL * 3600)),
+    ],
+    "products": [
+        IndexModel([("category_id", ASCENDING)], name="category_id"),
+        # respaldo de /products/search cuando el índice en memoria está desactivado
+        IndexModel([("name", TEXT)], name="name_text", default_language="spanish"),
+    ],
+}
+
+
+def _spec(document: dict) -> dict:
+    """Reduce la definición de un índice a lo que se compara (claves y unicidad)"""
+    key = document["key"]
+    if "_fts" in key:
+        # Mongo guarda los índices de texto como _fts/_ftsx con los campos en `weights`
+        key = {field: TEXT for field in sorted(document["weights"])}
+    return {
+        "key": [(field, direction) for field, direction in key.items()],
+        "unique": bool(document.get("unique", False)),
+    }
+
+
+async def ensure_indexes(db=None):
+    """Crea los índices declarados; si ya existen, Mongo no hace nada"""
+    db = db if db is not None else get_client()[DB]
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except Exception as e:
+            logger.error(f"Error creando índices de {collection}: {str(e)}")
+
+
+async def diff_indexes(db=None) -> Dict[str, Dict[str, list]]:
+    """Índices que faltan, sobran o difieren de lo declarado, por colección"""
+    db = db if db is not None else get_client()[DB]
+    report = {}
+    for collection, indexes in INDEXES.items():
+        declared = {index.document["name"]: _spec(index.document) for index in indexes}
+        live = {
+            index["name"]: _spec(index)
+            async for index in await db[collection].list_indexes()
+            if index["name"] != "_id_"
+        }
+        report[collection] = {
+            "missing": sorted(name for name in declared if name not in live),
+            "extra": sorted(name for name in live if name not in declared),
+            "changed": sorted(name for name in declared if name in live and declared[name] != live[name]),
+        }
+    return report
+
+
+async def _main(apply: bool):
+    if apply:
+        await ensure_indexes()
+    report = await diff_indexes()
+    await close_client()
+
+    in_sync = True
+    for collection, diff in report.items():
+        for kind, names in diff.items():
+            for name in names:
+                in_sync = False
+                print(f"{collection}: {kind} {name}")
+    if in_sync:
+        print("Índices sincronizados")
+    return 0 if in_sync else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main("--apply" in sys.argv[1:])))
@@ -0,0 +1,439 @@
+"""
+Libro de movimientos de inventario: solo se agregan entradas, nunca se editan.
+
+El stock vigente sigue en `inventories.stock`, que hace de snapshot: cada
+movimiento lo cambia con un `$inc` atómico (condicionado a que no quede
+negativo) y después se agrega a `inventory_movements`. Dos ajustes
+simultáneos ya no se pisan y queda el historial para conciliar.
+
+La compactación resume los movimientos en `inventory_checkpoints` (stock de
+cada registro a un instante). El stock a una fecha sale del checkpoint más
+cercano anterior más los movimientos posteriores, así que la reproducción
+queda acotada a lo ocurrido desde la última compactación.
+
+    python -m utils.ledger --backfill    # apertura: lo que el libro no explica del snapshot
+    python -m utils.ledger --compact     # genera checkpoints ahora
+    python -m utils.ledger --reconcile   # compara snapshot vs. libro
+"""
+import os
+import sys
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateMany, UpdateOne
+
+from utils.mongodb import get_collection, close_client
+from utils.repository import VERSION_FIELD, to_object_id, version_filter
+from utils.versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+INVENTORIES = "inventories"
+MOVEMENTS = "inventory_movements"
+CHECKPOINTS = "inventory_checkpoints"
+LEDGER_STATE = "inventory_ledger_state"
+
+# Cada cuánto se compacta en segundo plano (0 lo desactiva). Los movimientos
+# de los últimos CHECKPOINT_LAG segundos no se compactan: su `at` se asigna
+# antes de insertarlos y alguno podría llegar después del corte
+CHECKPOINT_INTERVAL = float(os.getenv("INVENTORY_CHECKPOINT_INTERVAL", "300"))
+CHECKPOINT_LAG = float(os.getenv("INVENTORY_CHECKPOINT_LAG", "60"))
+CHECKPOINT_BATCH = 1000
+
+
+def movement(
+        inventory_id: str
+        , product_id: str
+        , delta: int
+        , kind: str
+        , ref: Optional[str] = None
+        , note: Optional[str] = None
+        , at: Optional[datetime] = None
+) -> dict:
+    return {
+        "inventory_id": inventory_id,
+        "product_id": product_id,
+        "kind": kind,
+        "delta": delta,
+        "ref": ref,
+        "note": note,
+        "at": at or datetime.utcnow(),
+    }
+
+
+async def record(movements: List[dict]):
+    """Agrega movimientos cuyo cambio de stock ya se aplicó (ventas, altas)"""
+    if movements:
+        await get_collection(MOVEMENTS).insert_many(movements, ordered=False)
+
+
+async def apply(
+        inventory_id: str
+        , delta: int
+        , kind: str
+        , ref: Optional[str] = None
+        , note: Optional[str] = None
+) -> Tuple[dict, dict]:
+    """`$inc` del snapshot y su movimiento; devuelve (inventario resultante, movimiento)"""
+    inventories = get_collection(INVENTORIES)
+    oid = to_object_id(inventory_id)
+    query = {"_id": oid}
+    if delta < 0:
+        query["stock"] = {"$gte": -delta}
+
+    doc = None
+    if oid is not None:
+        doc = await inventories.find_one_and_update(
+            query,
+            {"$inc": {"stock": delta, VERSION_FIELD: 1}},
+            return_document=ReturnDocument.AFTER
+        )
+    if doc is None:
+        if oid is None or not await inventories.count_documents({"_id": oid}, limit=1):
+            raise HTTPException(status_code=404, detail="Inventario no encontrado")
+        raise HTTPException(status_code=409, detail=f"Stock insuficiente para el inventario {inventory_id}")
+
+    entry = movement(inventory_id, doc["product_id"], delta, kind, ref, note)
+    try:
+        await get_collection(MOVEMENTS).insert_one(entry)
+    except BaseException:
+        # Sin su movimiento el cambio no puede quedar en el snapshot
+        await inventories.update_one({"_id": oid}, {"$inc": {"stock": -delta, VERSION_FIELD: 1}})
+        raise
+    await bump_version(INVENTORIES)
+    return doc, entry
+
+
+async def overwrite(
+        inventory_id: str
+        , document: dict
+        , version: Optional[int] = None
+        , note: str = "Actualización del registro"
+) -> Optional[Tuple[dict, dict]]:
+    """
+    `$set` de los campos de `document`; un stock nuevo cuenta como conteo
+    físico y la diferencia con el que había justo antes se registra como
+    ajuste. Con `version` se aplica solo si el registro sigue en esa versión.
+    Devuelve el registro (antes, después).
+    """
+    oid = to_object_id(inventory_id)
+    if oid is None:
+        return None
+    inventories = get_collection(INVENTORIES)
+    before = await inventories.find_one_and_update(
+        {"_id": oid, **version_filter(version)},
+        {"$set": document, "$inc": {VERSION_FIELD: 1}},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        if version is not None and await inventories.count_documents({"_id": oid}, limit=1):
+            raise HTTPException(status_code=409, detail="El documento cambió desde que se leyó (versión distinta)")
+        return None
+
+    try:
+        await record(_adjustments(inventory_id, before, document, note))
+    except BaseException:
+        # Sin sus movimientos el cambio no puede quedar en el snapshot
+        await inventories.update_one({"_id": oid}, _undo(before, document))
+        raise
+    await bump_version(INVENTORIES)
+    return before, {**before, **document, VERSION_FIELD: before.get(VERSION_FIELD, 0) + 1}
+
+
+async def overwrite_many(
+        documents: List[Tuple[str, dict]]
+        , note: str = "Actualización del registro"
+        , batch_size: int = CHECKPOINT_BATCH
+) -> Dict[str, str]:
+    """
+    `overwrite` por lotes. Cada registro se actualiza con su propio
+    `find_one_and_update` (los de un lote en paralelo) para que el ajuste
+    salga de su imagen previa exacta aunque haya escrituras concurrentes; los
+    ajustes del lote van en un solo insert y la versión de la colección se
+    incrementa una vez. Devuelve los ids que existían y quedaron actualizados,
+    cada uno con el product_id que tenía antes.
+    """
+    inventories = get_collection(INVENTORIES)
+    updated: Dict[str, str] = {}
+    try:
+        for batch in _batches(documents, max(batch_size, 1)):
+            # Un id repetido en el lote se queda con su último documento
+            requested = {to_object_id(id): (id, document) for id, document in batch}
+            requested.pop(None, None)
+            befores = await asyncio.gather(*(
+                inventories.find_one_and_update(
+                    {"_id": oid},
+                    {"$set": document, "$inc": {VERSION_FIELD: 1}},
+                    return_document=ReturnDocument.BEFORE
+                )
+                for oid, (_, document) in requested.items()
+            ), return_exceptions=True)
+
+            applied = [
+                (id, document, before)
+                for (id, document), before in zip(requested.values(), befores)
+                if isinstance(before, dict)
+            ]
+            try:
+                await record([entry for id, document, before in applied for entry in _adjustments(id, before, document, note)])
+            except BaseException:
+                if applied:
+                    await inventories.bulk_write(
+                        [UpdateOne({"_id": before["_id"]}, _undo(before, document)) for _, document, before in applied],
+                        ordered=False
+                    )
+                raise
+            updated.update((id, before["product_id"]) for id, _, before in applied)
+
+            failed = next((before for before in befores if isinstance(before, BaseException)), None)
+            if failed is not None:
+                raise failed
+    finally:
+        if updated:
+            await bump_version(INVENTORIES)
+    return updated
+
+
+def _adjustments(inventory_id: str, before: dict, document: dict, note: str) -> List[dict]:
+    """
+    Movimientos de un `$set` sobre el registro `before`: la diferencia de
+    stock o, si cambia de producto, la salida de todo su stock del producto
+    anterior y la entrada del stock nuevo en el otro.
+    """
+    stock = before.get("stock", 0)
+    new_stock = document.get("stock", stock)
+    product_id = before["product_id"]
+    new_product_id = document.get("product_id", product_id)
+    if new_product_id == product_id:
+        return [movement(inventory_id, product_id, new_stock - stock, "adjustment", note=note)] if new_stock != stock else []
+    return [
+        movement(inventory_id, id, delta, "adjustment", note=f"{note} (cambio de producto)")
+        for id, delta in ((product_id, -stock), (new_product_id, new_stock)) if delta
+    ]
+
+
+def _undo(before: dict, document: dict) -> dict:
+    """Deshace el `$set` de `document`; el stock con `$inc` para no pisar ventas posteriores"""
+    stock = before.get("stock", 0)
+    update = {"$inc": {"stock": stock - document.get("stock", stock), VERSION_FIELD: 1}}
+    restore = {field: before[field] for field in document if field != "stock" and field in before}
+    missing = {field: "" for field in document if field != "stock" and field not in before}
+    if restore:
+        update["$set"] = restore
+    if missing:
+        update["$unset"] = missing
+    return update
+
+
+def _batches(items: List, size: int = CHECKPOINT_BATCH):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _latest_checkpoints(match: dict, until: datetime) -> Dict[str, dict]:
+    """Checkpoint más reciente (con at <= until) de cada registro que cumple `match`"""
+    pipeline = [
+        {"$match": {**match, "at": {"$lte": until}}},
+        {"$sort": {"inventory_id": 1, "at": -1}},
+        {"$group": {"_id": "$inventory_id", "at": {"$first": "$at"}, "stock": {"$first": "$stock"}}},
+    ]
+    return {row["_id"]: row async for row in await get_collection(CHECKPOINTS).aggregate(pipeline)}
+
+
+async def _replay(since: Dict[str, Optional[datetime]], until: datetime) -> Tuple[Dict[str, int], int]:
+    """
+    Suma de los movimientos de cada registro en (since[id], until]. Los
+    registros se agrupan por su `since` (casi todos comparten el de la última
+    compactación), así que son pocas consultas.
+    """
+    groups: Dict[Optional[datetime], List[str]] = {}
+    for inventory_id, start in since.items():
+        groups.setdefault(start, []).append(inventory_id)
+
+    totals: Dict[str, int] = {}
+    replayed = 0
+    for start, ids in groups.items():
+        at = {"$lte": until}
+        if start is not None:
+            at["$gt"] = start
+        for batch in _batches(ids):
+            pipeline = [
+                {"$match": {"inventory_id": {"$in": batch}, "at": at}},
+                {"$group": {"_id": "$inventory_id", "delta": {"$sum": "$delta"}, "count": {"$sum": 1}}},
+            ]
+            async for row in await get_collection(MOVEMENTS).aggregate(pipeline):
+                totals[row["_id"]] = row["delta"]
+                replayed += row["count"]
+    return totals, replayed
+
+
+async def stock_at(at: datetime, inventory_id: Optional[str] = None, product_id: Optional[str] = None) -> dict:
+    """Stock de un registro o de un producto (suma de sus registros) al instante `at`"""
+    match = {"inventory_id": inventory_id} if inventory_id else {"product_id": product_id}
+    checkpoints = await _latest_checkpoints(match, at)
+    if inventory_id:
+        ids = {inventory_id}
+    else:
+        ids = set(checkpoints) | set(await get_collection(MOVEMENTS).distinct("inventory_id", {**match, "at": {"$lte": at}}))
+
+    totals, replayed = await _replay({id: checkpoints[id]["at"] if id in checkpoints else None for id in ids}, at)
+    starts = [checkpoint["at"] for checkpoint in checkpoints.values()]
+    return {
+        "inventory_id": inventory_id,
+        "product_id": product_id,
+        "at": at,
+        "stock": sum(checkpoints[id]["stock"] if id in checkpoints else 0 for id in ids) + sum(totals.values()),
+        "checkpoint_at": min(starts) if starts else None,
+        "replayed": replayed,
+    }
+
+
+async def _checkpoint(rows: List[dict], cutoff: datetime) -> int:
+    ids = [row["_id"] for row in rows]
+    previous = await _latest_checkpoints({"inventory_id": {"$in": ids}}, cutoff)
+    totals, _ = await _replay({id: previous[id]["at"] if id in previous else None for id in ids}, cutoff)
+    # (inventory_id, at) es único: repetir el mismo corte no duplica checkpoints
+    operations = [
+        UpdateOne(
+            {"inventory_id": row["_id"], "at": cutoff},
+            {"$set": {
+                "product_id": row["product_id"],
+                "stock": (previous[row["_id"]]["stock"] if row["_id"] in previous else 0) + totals[row["_id"]],
+            }},
+            upsert=True
+        )
+        for row in rows if row["_id"] in totals
+    ]
+    if operations:
+        await get_collection(CHECKPOINTS).bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def compact(cutoff: Optional[datetime] = None) -> dict:
+    """
+    Checkpoint al instante `cutoff` de cada registro con movimientos desde
+    el corte anterior. Cada registro parte de su propio último checkpoint, así
+    que una compactación interrumpida se puede repetir sin contar dos veces.
+    """
+    cutoff = cutoff or datetime.utcnow() - timedelta(seconds=CHECKPOINT_LAG)
+    state = await get_collection(LEDGER_STATE).find_one({"_id": "compaction"})
+    previous = state["cutoff"] if state else None
+    if previous is not None and previous >= cutoff:
+        return {"cutoff": previous, "checkpoints": 0}
+
+    at = {"$lte": cutoff}
+    if previous is not None:
+        at["$gt"] = previous
+    pipeline = [
+        {"$match": {"at": at}},
+        {"$group": {"_id": "$inventory_id", "product_id": {"$last": "$product_id"}}},
+    ]
+    written = 0
+    batch = []
+    async for row in await get_collection(MOVEMENTS).aggregate(pipeline, allowDiskUse=True):
+        batch.append(row)
+        if len(batch) == CHECKPOINT_BATCH:
+            written += await _checkpoint(batch, cutoff)
+            batch = []
+    if batch:
+        written += await _checkpoint(batch, cutoff)
+
+    await get_collection(LEDGER_STATE).update_one({"_id": "compaction"}, {"$max": {"cutoff": cutoff}}, upsert=True)
+    return {"cutoff": cutoff, "checkpoints": written}
+
+
+async def compaction_loop(interval: float = CHECKPOINT_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await compact()
+            if result["checkpoints"]:
+                logger.info(f"Libro de inventario compactado: {result['checkpoints']} checkpoints al {result['cutoff']}")
+        except Exception as e:
+            logger.error(f"Error compactando el libro de inventario: {str(e)}")
+
+
+async def _inventory_batches(projection: dict):
+    batch = []
+    async for doc in get_collection(INVENTORIES).find({}, projection).sort("_id", 1):
+        batch.append(doc)
+        if len(batch) == CHECKPOINT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def backfill() -> int:
+    """
+    Movimiento de apertura por lo que el libro no explica del snapshot (stock
+    actual menos la suma de los movimientos que ya tiene), fechado en la
+    creación del registro (el tiempo de su _id) o justo antes de su primer
+    movimiento si es anterior. Los checkpoints posteriores a la apertura se
+    corrigen con la misma cantidad. Repetirlo no agrega nada.
+    """
+    opened = 0
+    async for docs in _inventory_batches({"product_id": 1, "stock": 1}):
+        ids = [str(doc["_id"]) for doc in docs]
+        pipeline = [
+            {"$match": {"inventory_id": {"$in": ids}}},
+            {"$group": {"_id": "$inventory_id", "delta": {"$sum": "$delta"}, "first": {"$min": "$at"}}},
+        ]
+        history = {row["_id"]: row async for row in await get_collection(MOVEMENTS).aggregate(pipeline)}
+
+        entries = []
+        for doc, id in zip(docs, ids):
+            opening = doc.get("stock", 0) - (history[id]["delta"] if id in history else 0)
+            if not opening:
+                continue
+            at = doc["_id"].generation_time.replace(tzinfo=None)
+            if id in history:
+                at = min(at, history[id]["first"] - timedelta(milliseconds=1))
+            entries.append(movement(id, doc["product_id"], opening, "adjustment", note="Apertura del libro", at=at))
+        await record(entries)
+        if entries:
+            await get_collection(CHECKPOINTS).bulk_write([
+                UpdateMany({"inventory_id": entry["inventory_id"], "at": {"$gte": entry["at"]}}, {"$inc": {"stock": entry["delta"]}})
+                for entry in entries
+            ], ordered=False)
+        opened += len(entries)
+    return opened
+
+
+async def reconcile() -> List[dict]:
+    """Registros cuyo snapshot no coincide con el libro (checkpoint + movimientos hasta ahora)"""
+    now = datetime.utcnow()
+    drift = []
+    async for docs in _inventory_batches({"product_id": 1, "stock": 1}):
+        ids = [str(doc["_id"]) for doc in docs]
+        checkpoints = await _latest_checkpoints({"inventory_id": {"$in": ids}}, now)
+        totals, _ = await _replay({id: checkpoints[id]["at"] if id in checkpoints else None for id in ids}, now)
+        for doc, id in zip(docs, ids):
+            expected = (checkpoints[id]["stock"] if id in checkpoints else 0) + totals.get(id, 0)
+            if expected != doc.get("stock", 0):
+                drift.append({"inventory_id": id, "product_id": doc["product_id"], "stock": doc.get("stock", 0), "ledger": expected})
+    return drift
+
+
+async def _main(args: List[str]):
+    if "--backfill" in args:
+        print(f"Movimientos de apertura: {await backfill()}")
+    if "--compact" in args:
+        result = await compact()
+        print(f"Checkpoints: {result['checkpoints']} al {result['cutoff']}")
+    if "--reconcile" in args:
+        drift = await reconcile()
+        for row in drift:
+            print(f"{row['inventory_id']} (producto {row['product_id']}): snapshot {row['stock']}, libro {row['ledger']}")
+        print(f"Registros con diferencias: {len(drift)}")
+    await close_client()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not {"--backfill", "--compact", "--reconcile"} & set(args):
+        sys.exit("Uso: python -m utils.ledger [--backfill] [--compact] [--reconcile]")
+    asyncio.run(_main(args))
@@ -0,0 +1,327 @@
+"""
+Avisos en tiempo real de stock y estado de órdenes (SSE y WebSocket).
+
+Un único `LiveHub` por worker recibe los cambios del change feed (ver
+utils.changefeed) y los reparte entre las conexiones suscritas. Las
+escrituras de este mismo proceso las publican los controladores con
+`live_hub.publish(...)`: en modo sondeo el change feed las descuenta.
+
+- Los cambios solo marcan el tema (inventario, producto u orden) como
+  pendiente; cada LIVE_COALESCE_INTERVAL segundos se leen de Mongo los
+  documentos marcados en una consulta por tipo y el mensaje se serializa una
+  sola vez para todos sus suscriptores. Una ráfaga de ventas del mismo
+  inventario llega como un solo mensaje con el stock final.
+- Cada conexión guarda como mucho un mensaje pendiente por tema: si el
+  cliente lee más lento de lo que llegan cambios, el nuevo reemplaza al
+  anterior. Así la memoria por conexión está acotada por LIVE_MAX_TOPICS.
+- Una conexión inactiva no tiene tareas propias además de la que la atiende
+  y cuesta lo que su `Subscriber` (ver benchmarks/bench_live.py).
+
+Mensajes (JSON):
+
+    {"type": "inventory", "inventory_id": "...", "product_id": "...", "stock": 7, "version": 3}
+    {"type": "product", "product_id": "...", "stock": 42, "inventories": 2}
+    {"type": "order", "order_id": "...", "status": "paid", "total": 12.5, "version": 1}
+    {"type": "inventory", "inventory_id": "...", "found": false}
+"""
+import os
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from utils.changefeed import Change, change_feed
+from utils.metrics import LIVE_COALESCED, LIVE_CONNECTIONS, LIVE_MESSAGES
+from utils.mongodb import get_collection
+from utils.repository import to_object_id
+from utils.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+LIVE_MAX_CONNECTIONS = int(os.getenv("LIVE_MAX_CONNECTIONS", "10000"))
+LIVE_MAX_TOPICS = int(os.getenv("LIVE_MAX_TOPICS", "100"))
+LIVE_COALESCE_INTERVAL = float(os.getenv("LIVE_COALESCE_INTERVAL", "0.1"))
+# Cada cuánto se manda un latido a una conexión sin novedades (proxies y clientes cortan las mudas)
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))
+# Un WebSocket que tarda más que esto en aceptar un mensaje se cierra
+LIVE_SEND_TIMEOUT = float(os.getenv("LIVE_SEND_TIMEOUT", "10"))
+LIVE_QUERY_CHUNK = 1000
+
+Topic = Tuple[str, str]        # (tipo: inventory, product u order; id)
+
+
+def topics(
+        inventory_ids: Iterable[str] = ()
+        , product_ids: Iterable[str] = ()
+        , order_ids: Iterable[str] = ()
+) -> Set[Topic]:
+    return {
+        *(("inventory", id) for id in inventory_ids),
+        *(("product", id) for id in product_ids),
+        *(("order", id) for id in order_ids),
+    }
+
+
+class Subscriber:
+    """Una conexión: sus temas y el último mensaje pendiente de cada uno"""
+    __slots__ = ("topics", "pending", "ready", "closed")
+
+    def __init__(self):
+        self.topics: Set[Topic] = set()
+        self.pending: Dict[Topic, bytes] = {}
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def push(self, topic: Topic, message: bytes):
+        if topic in self.pending:
+            LIVE_COALESCED.inc(topic[0])
+        self.pending[topic] = message
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    async def next(self, timeout: float) -> Optional[List[bytes]]:
+        """Mensajes pendientes; lista vacía si pasó `timeout` sin novedades, None si se cerró"""
+        if not self.pending and not self.closed:
+            self.ready.clear()
+            # Un temporizador en vez de wait_for: no crea una tarea extra por conexión inactiva
+            timer = asyncio.get_running_loop().call_later(timeout, self.ready.set)
+            try:
+                await self.ready.wait()
+            finally:
+                timer.cancel()
+        if self.closed:
+            return None
+        messages = list(self.pending.values())
+        self.pending.clear()
+        return messages
+
+
+class LiveHub:
+    def __init__(self):
+        self._subscribers: Dict[Topic, Set[Subscriber]] = {}
+        self._dirty: Set[Topic] = set()
+        self._wake = asyncio.Event()
+        # Inventarios de cada producto suscrito, para saber qué producto avisar cuando cambia uno
+        self._inventories_by_product: Dict[str, Set[str]] = {}
+        self._products_by_inventory: Dict[str, str] = {}
+        self._connected: Set[Subscriber] = set()
+
+    @property
+    def connections(self) -> int:
+        return len(self._connected)
+
+    def check_capacity(self):
+        if self.connections >= LIVE_MAX_CONNECTIONS:
+            raise HTTPException(status_code=503, detail="Demasiadas conexiones en tiempo real en este servidor")
+
+    def connect(self) -> Subscriber:
+        subscriber = Subscriber()
+        self._connected.add(subscriber)
+        LIVE_CONNECTIONS.inc(amount=1)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        if subscriber not in self._connected:
+            return
+        self._connected.discard(subscriber)
+        self.unsubscribe(subscriber, list(subscriber.topics))
+        subscriber.close()
+        LIVE_CONNECTIONS.inc(amount=-1)
+
+    def check_topics(self, subscriber: Optional[Subscriber], new_topics: Set[Topic]):
+        current = subscriber.topics if subscriber is not None else set()
+        if len(current | new_topics) > LIVE_MAX_TOPICS:
+            raise HTTPException(status_code=400, detail=f"Máximo {LIVE_MAX_TOPICS} suscripciones por conexión")
+
+    async def subscribe(self, subscriber: Subscriber, new_topics: Set[Topic]):
+        """Registra los temas y manda su estado actual solo a esta conexión"""
+        self.check_topics(subscriber, new_topics)
+        new = new_topics - subscriber.topics
+        # Se registra antes de leer: un cambio posterior a la lectura queda marcado y se vuelve a mandar
+        for topic in new:
+            self._subscribers.setdefault(topic, set()).add(subscriber)
+            subscriber.topics.add(topic)
+        for kind, ids in _by_kind(new).items():
+            for id, message in (await self._snapshots(kind, ids)).items():
+                subscriber.push((kind, id), message)
+
+    def unsubscribe(self, subscriber: Subscriber, old_topics: Iterable[Topic]):
+        for topic in old_topics:
+            subscriber.topics.discard(topic)
+            subscriber.pending.pop(topic, None)
+            subscribers = self._subscribers.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[topic]
+                if topic[0] == "product":
+                    self._forget_product(topic[1])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections": self.connections,
+            "topics": len(self._subscribers),
+            "pending": len(self._dirty),
+        }
+
+    def _mark(self, kind: str, id: Optional[str]):
+        if id is not None and (kind, id) in self._subscribers:
+            self._dirty.add((kind, id))
+            self._wake.set()
+
+    def _mark_all(self, kind: str):
+        self._dirty.update(topic for topic in self._subscribers if topic[0] == kind)
+        self._wake.set()
+
+    def publish(
+            self
+            , inventory_ids: Iterable[str] = ()
+            , product_ids: Iterable[str] = ()
+            , order_ids: Iterable[str] = ()
+    ):
+        """Escrituras hechas por este proceso; marcar dos veces el mismo tema no manda nada de más"""
+        for id in inventory_ids:
+            self._mark("inventory", id)
+            self._mark("product", self._products_by_inventory.get(id))
+        for id in product_ids:
+            self._mark("product", id)
+        for id in order_ids:
+            self._mark("order", id)
+
+    async def on_inventories_changed(self, changes: List[Change]):
+        for change in changes:
+            if change.id is None:
+                self._mark_all("inventory")
+                self._mark_all("product")
+                continue
+            self._mark("inventory", change.id)
+            # El producto anterior y, si vino en el cambio (alta o cambio de producto), el nuevo
+            self._mark("product", self._products_by_inventory.get(change.id))
+            if change.fields is not None:
+                self._mark("product", change.fields.get("product_id"))
+
+    async def on_orders_changed(self, changes: List[Change]):
+        for change in changes:
+            if change.id is None:
+                self._mark_all("order")
+            else:
+                self._mark("order", change.id)
+
+    async def run(self):
+        """Publica los temas marcados; corre hasta que se cancele"""
+        while True:
+            await self._wake.wait()
+            # Espera corta para juntar las ráfagas en un solo mensaje
+            await asyncio.sleep(LIVE_COALESCE_INTERVAL)
+            self._wake.clear()
+            dirty, self._dirty = self._dirty, set()
+            try:
+                await self._publish(dirty)
+            except Exception as e:
+                logger.error(f"Error publicando cambios en tiempo real: {str(e)}")
+                self._dirty |= dirty
+                self._wake.set()
+                await asyncio.sleep(1)
+
+    async def _publish(self, dirty: Set[Topic]):
+        for kind, ids in _by_kind(dirty).items():
+            messages = await self._snapshots(kind, ids)
+            for id, message in messages.items():
+                subscribers = self._subscribers.get((kind, id), ())
+                for subscriber in subscribers:
+                    subscriber.push((kind, id), message)
+                LIVE_MESSAGES.inc(kind, amount=len(subscribers))
+
+    async def _snapshots(self, kind: str, ids: List[str]) -> Dict[str, bytes]:
+        """Estado actual de cada id ya serializado; los que no existen llevan `found: false`"""
+        messages: Dict[str, bytes] = {}
+        for start in range(0, len(ids), LIVE_QUERY_CHUNK):
+            chunk = ids[start:start + LIVE_QUERY_CHUNK]
+            if kind == "product":
+                messages.update(await self._product_snapshots(chunk))
+                continue
+            collection, id_field, fields = _READS[kind]
+            oids = [oid for oid in (to_object_id(id) for id in chunk) if oid is not None]
+            found = {}
+            async for doc in get_collection(collection).find({"_id": {"$in": oids}}, fields):
+                found[str(doc.pop("_id"))] = doc
+            for id in chunk:
+                doc = found.get(id)
+                payload = {"type": kind, id_field: id, **doc} if doc is not None else {"type": kind, id_field: id, "found": False}
+                messages[id] = dumps(payload)
+        return messages
+
+    async def _product_snapshots(self, product_ids: List[str]) -> Dict[str, bytes]:
+        """Stock total de cada producto (suma de sus inventarios); de paso actualiza el mapa inventario -> producto"""
+        stock = {product_id: 0 for product_id in product_ids}
+        inventories: Dict[str, Set[str]] = {product_id: set() for product_id in product_ids}
+        cursor = get_collection("inventories").find({"product_id": {"$in": product_ids}}, {"product_id": 1, "stock": 1})
+        async for doc in cursor:
+            stock[doc["product_id"]] += doc.get("stock", 0)
+            inventories[doc["product_id"]].add(str(doc["_id"]))
+        for product_id, inventory_ids in inventories.items():
+            if ("product", product_id) not in self._subscribers:
+                continue
+            self._forget_product(product_id)
+            self._inventories_by_product[product_id] = inventory_ids
+            for inventory_id in inventory_ids:
+                self._products_by_inventory[inventory_id] = product_id
+        return {
+            product_id: dumps({"type": "product", "product_id": product_id, "stock": stock[product_id], "inventories": len(inventories[product_id])})
+            for product_id in product_ids
+        }
+
+    def _forget_product(self, product_id: str):
+        for inventory_id in self._inventories_by_product.pop(product_id, ()):
+            if self._products_by_inventory.get(inventory_id) == product_id:
+                del self._products_by_inventory[inventory_id]
+
+
+# tipo -> (colección, campo del id en el mensaje, proyección)
+_READS = {
+    "inventory": ("inventories", "inventory_id", {"product_id": 1, "stock": 1, "version": 1}),
+    "order": ("orders", "order_id", {"status": 1, "total": 1, "version": 1}),
+}
+
+
+def _by_kind(topics: Iterable[Topic]) -> Dict[str, List[str]]:
+    grouped: Dict[str, List[str]] = {}
+    for kind, id in topics:
+        grouped.setdefault(kind, []).append(id)
+    return grouped
+
+
+async def sse_events(initial: Set[Topic]) -> AsyncIterator[bytes]:
+    """
+    Cuerpo `text/event-stream` de una conexión. La conexión se registra al
+    empezar a emitir y se libera al cortarse, así que no queda nada si el
+    cliente se va antes; los límites se comprueban antes de responder.
+    """
+    subscriber = live_hub.connect()
+    try:
+        await live_hub.subscribe(subscriber, initial)
+        yield b"retry: 3000\n\n"
+        while not subscriber.closed:
+            # Sin variables locales: una conexión inactiva no retiene el último mensaje enviado
+            yield await _sse_chunk(subscriber)
+    finally:
+        live_hub.disconnect(subscriber)
+
+
+async def _sse_chunk(subscriber: Subscriber) -> bytes:
+    messages = await subscriber.next(LIVE_HEARTBEAT)
+    if messages is None:
+        return b""
+    if not messages:
+        return b": ping\n\n"
+    return b"".join(b"data: " + message + b"\n\n" for message in messages)
+
+
+live_hub = LiveHub()
+change_feed.subscribe("inventories", live_hub.on_inventories_changed)
+change_feed.subscribe("orders", live_hub.on_orders_changed)
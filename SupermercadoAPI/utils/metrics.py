@@ -0,0 +1,215 @@
+"""
+Métricas de rendimiento en formato de texto de Prometheus, sin dependencias.
+
+- `MetricsMiddleware`: latencia por ruta (histograma), peticiones en curso y,
+  si SLOW_REQUEST_MS > 0, un log de peticiones lentas con el desglose por fase.
+- `mongo_listener`: duración de cada comando de Mongo por colección y operación.
+- `phase(nombre)`: mide una fase (auth, serialize...) en su histograma y la
+  suma al desglose de la petición en curso.
+
+    GET /metrics
+"""
+import os
+import time
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+# Desglose de la petición en curso: fase -> [segundos, llamadas]
+_phases: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("metrics_phases", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}
+
+    def observe(self, seconds: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), kind: str = "counter"):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.kind = kind
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Latencia por ruta", ("method", "route", "status"))
+IN_FLIGHT = Counter("http_requests_in_flight", "Peticiones en curso", kind="gauge")
+MONGO_LATENCY = Histogram("mongodb_command_duration_seconds", "Duración de comandos de Mongo", ("collection", "command"))
+MONGO_FAILURES = Counter("mongodb_command_failures_total", "Comandos de Mongo fallidos", ("collection", "command"))
+PHASE_LATENCY = Histogram("app_phase_duration_seconds", "Tiempo en fases internas (auth, serialize)", ("phase",), FAST_BUCKETS)
+LIVE_CONNECTIONS = Counter("live_connections", "Conexiones SSE/WebSocket abiertas", kind="gauge")
+LIVE_MESSAGES = Counter("live_messages_total", "Mensajes en tiempo real encolados", ("type",))
+LIVE_COALESCED = Counter("live_messages_coalesced_total", "Mensajes reemplazados por uno más nuevo antes de enviarse", ("type",))
+
+_METRICS = [REQUEST_LATENCY, IN_FLIGHT, MONGO_LATENCY, MONGO_FAILURES, PHASE_LATENCY, LIVE_CONNECTIONS, LIVE_MESSAGES, LIVE_COALESCED]
+IN_FLIGHT.inc(amount=0)
+LIVE_CONNECTIONS.inc(amount=0)
+
+
+def _add_phase(name: str, seconds: float):
+    phases = _phases.get()
+    if phases is not None:
+        entry = phases.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_LATENCY.observe(elapsed, name)
+        _add_phase(name, elapsed)
+
+
+class _MongoListener(monitoring.CommandListener):
+    """Empareja started/succeeded por request_id para saber la colección de cada comando"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple, str] = {}
+
+    def started(self, event):
+        # getMore lleva el id del cursor en su clave y la colección aparte
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event) -> Tuple[str, float]:
+        collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        return collection, event.duration_micros / 1e6
+
+    def succeeded(self, event):
+        collection, seconds = self._finish(event)
+        MONGO_LATENCY.observe(seconds, collection, event.command_name)
+        _add_phase("mongo", seconds)
+
+    def failed(self, event):
+        collection, seconds = self._finish(event)
+        MONGO_LATENCY.observe(seconds, collection, event.command_name)
+        MONGO_FAILURES.inc(collection, event.command_name)
+        _add_phase("mongo", seconds)
+
+
+mongo_listener = _MongoListener()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: mide cada petición HTTP con la plantilla de su ruta como etiqueta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        phases: Dict[str, List[float]] = {}
+        token = _phases.set(phases)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc(amount=1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.inc(amount=-1)
+            _phases.reset(token)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.observe(elapsed, scope["method"], template, status)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                _log_slow(scope, template, status, elapsed, phases)
+
+
+def _log_slow(scope, template: str, status: int, elapsed: float, phases: Dict[str, List[float]]):
+    breakdown = {name: f"{seconds * 1000:.1f}ms/{int(calls)}" for name, (seconds, calls) in phases.items()}
+    other = elapsed - sum(seconds for seconds, _ in phases.values())
+    breakdown["other"] = f"{max(other, 0) * 1000:.1f}ms"
+    logger.warning(
+        f"Petición lenta {scope['method']} {scope['path']} ({template}) -> {status} "
+        f"en {elapsed * 1000:.1f}ms: {breakdown}"
+    )
+
+
+_CACHE_METRICS = [
+    ("cache_hits_total", "counter", "hits"),
+    ("cache_misses_total", "counter", "misses"),
+    ("cache_evictions_total", "counter", "evictions"),
+    ("cache_entries", "gauge", "size"),
+]
+
+
+def render(caches: Optional[Dict[str, Dict]] = None) -> str:
+    """Texto de exposición de Prometheus; `caches` es el resultado de utils.cache.cache_stats()"""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for name, kind, field in _CACHE_METRICS if caches else ():
+        lines.append(f"# TYPE {name} {kind}")
+        for cache, stats in caches.items():
+            lines.append(f'{name}{{cache="{_escape(cache)}"}} {stats[field]}')
+    return "\n".join(lines) + "\n"
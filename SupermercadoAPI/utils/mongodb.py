@@ -1,19 +1,95 @@
 import os
+import asyncio
+import logging
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
 from pymongo.server_api import ServerApi
 
+from utils.metrics import mongo_listener
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DB = os.getenv("MONGO_DB_NAME")
 URI = os.getenv("URI")
 
+# Parámetros del pool de conexiones (configurables por variables de entorno)
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", "2"))
+HEALTH_INTERVAL = float(os.getenv("MONGO_HEALTH_INTERVAL", "30"))
+
+# TLS se puede desactivar para un mongod local (benchmarks, desarrollo)
+_TLS_OPTIONS = (
+    {"tls": True, "tlsAllowInvalidCertificates": True}
+    if os.getenv("MONGO_TLS", "true").lower() == "true" else {}
+)
+
+# Un único cliente por proceso y caché de colecciones ya resueltas
+_client = None
+_collections = {}
+_healthy = False
+
+
+def init_client():
+    """Crea el cliente compartido del proceso (idempotente)"""
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(
+            URI
+            , server_api = ServerApi("1")
+            , maxPoolSize = MAX_POOL_SIZE
+            , minPoolSize = MIN_POOL_SIZE
+            , maxIdleTimeMS = MAX_IDLE_TIME_MS
+            , waitQueueTimeoutMS = WAIT_QUEUE_TIMEOUT_MS
+            , maxConnecting = MAX_CONNECTING
+            , event_listeners = [mongo_listener]
+            , **_TLS_OPTIONS
+        )
+    return _client
+
+
+def get_client():
+    return init_client()
+
+
 def get_collection( col ):
-    client = MongoClient(  
-        URI
-        , server_api = ServerApi("1")
-        , tls = True
-        , tlsAllowInvalidCertificates = True
-    )
-    client.admin.command("ping")
-    return client[DB][col]
\ No newline at end of file
+    coll = _collections.get(col)
+    if coll is None:
+        coll = get_client()[DB][col]
+        _collections[col] = coll
+    return coll
+
+
+async def ping() -> bool:
+    global _healthy
+    try:
+        await get_client().admin.command("ping")
+        _healthy = True
+    except Exception as e:
+        logger.warning(f"MongoDB no responde: {str(e)}")
+        _healthy = False
+    return _healthy
+
+
+def is_healthy() -> bool:
+    return _healthy
+
+
+async def health_probe(interval: float = HEALTH_INTERVAL):
+    """Verifica la conexión periódicamente en lugar de hacerlo en cada petición"""
+    while True:
+        await ping()
+        await asyncio.sleep(interval)
+
+
+async def close_client():
+    global _client, _healthy
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _collections.clear()
+    _healthy = False
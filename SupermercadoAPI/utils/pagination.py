@@ -0,0 +1,46 @@
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+from utils.responses import dumps
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+STREAM_BATCH_SIZE = 500
+
+
+def keyset_filter(after: Optional[str]) -> dict:
+    """Filtro para paginar por _id: solo documentos posteriores al cursor"""
+    if not after:
+        return {}
+    try:
+        return {"_id": {"$gt": ObjectId(after)}}
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def to_public(doc: dict, id_field: str) -> dict:
+    doc[id_field] = str(doc.pop("_id"))
+    return doc
+
+
+def stream_ndjson(
+        coll
+        , id_field: str
+        , after: Optional[str] = None
+        , batch_size: int = STREAM_BATCH_SIZE
+        , projection: Optional[dict] = None
+) -> AsyncIterator[bytes]:
+    """Emite una línea JSON por documento directamente desde el cursor de Mongo"""
+    # El cursor se valida antes de empezar a enviar la respuesta
+    query = keyset_filter(after)
+    batch_size = max(1, min(batch_size, MAX_LIMIT * 10))
+
+    async def lines():
+        cursor = coll.find(query, projection).sort("_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            yield dumps(to_public(doc, id_field)) + b"\n"
+
+    return lines()
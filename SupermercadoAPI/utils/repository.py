@@ -0,0 +1,174 @@
+from typing import AsyncIterator, Dict, Generic, Iterable, List, Optional, Sequence, Type, TypeVar
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+
+from utils.mongodb import get_collection
+from utils.pagination import DEFAULT_LIMIT, MAX_LIMIT, STREAM_BATCH_SIZE, keyset_filter, stream_ndjson
+from utils.versions import bump_version
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Contador por documento que incrementa cada escritura; los documentos
+# anteriores a él no lo tienen y cuentan como versión 0
+VERSION_FIELD = "version"
+
+
+def to_object_id(value: str) -> Optional[ObjectId]:
+    """Convierte un id público a ObjectId; un id mal formado se trata como inexistente"""
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def version_filter(version: Optional[int]) -> Dict:
+    """Condición para escribir solo si el documento sigue en `version` (None: sin condición)"""
+    if version is None:
+        return {}
+    if version == 0:
+        return {VERSION_FIELD: {"$in": [0, None]}}
+    return {VERSION_FIELD: version}
+
+
+class Repository(Generic[ModelT]):
+    """
+    CRUD genérico sobre una colección de Mongo.
+
+    `id_field` es el campo del modelo que refleja el `_id` de Mongo, y
+    `write_exclude` los campos que nunca se guardan (por ejemplo la contraseña);
+    la versión tampoco, solo se incrementa.
+    Los documentos leídos los escribió este mismo repositorio a partir de un
+    modelo ya validado, así que se reconstruyen con `model_construct` sin
+    volver a validar. Cada escritura incrementa la versión de la colección
+    (ver utils.versions).
+    """
+
+    def __init__(
+            self
+            , model: Type[ModelT]
+            , collection: str
+            , id_field: str
+            , write_exclude: Iterable[str] = ()
+            , read_defaults: Optional[Dict] = None
+    ):
+        self.model = model
+        self.collection = collection
+        self.id_field = id_field
+        self.write_exclude = {id_field, VERSION_FIELD, *write_exclude}
+        self.read_defaults = read_defaults or {}
+
+    @property
+    def coll(self):
+        return get_collection(self.collection)
+
+    @staticmethod
+    def projection(fields: Optional[Sequence[str]]) -> Optional[Dict]:
+        if not fields:
+            return None
+        return {field: 1 for field in fields}
+
+    def to_document(self, model: BaseModel) -> Dict:
+        return model.model_dump(exclude=self.write_exclude)
+
+    def from_document(self, doc: Dict) -> ModelT:
+        doc[self.id_field] = str(doc.pop("_id"))
+        return self.model.model_construct(**{**self.read_defaults, **doc})
+
+    async def insert(self, model: BaseModel) -> ModelT:
+        """Acepta el modelo completo o su variante de creación (sin id)"""
+        inserted = await self.coll.insert_one(self.to_document(model))
+        await bump_version(self.collection)
+        id = str(inserted.inserted_id)
+        if isinstance(model, self.model):
+            return model.model_copy(update={self.id_field: id})
+        return self.model.model_construct(**model.model_dump(), **{self.id_field: id})
+
+    async def get(self, id: str, fields: Optional[Sequence[str]] = None) -> Optional[ModelT]:
+        oid = to_object_id(id)
+        if oid is None:
+            return None
+        doc = await self.coll.find_one({"_id": oid}, self.projection(fields))
+        return self.from_document(doc) if doc else None
+
+    async def get_many(self, ids: Iterable[str], fields: Optional[Sequence[str]] = None) -> List[ModelT]:
+        """Lee varios documentos en un solo viaje con `$in`"""
+        oids = [oid for oid in (to_object_id(i) for i in ids) if oid is not None]
+        if not oids:
+            return []
+        cursor = self.coll.find({"_id": {"$in": oids}}, self.projection(fields))
+        return [self.from_document(doc) async for doc in cursor]
+
+    async def find_one(self, query: Dict, fields: Optional[Sequence[str]] = None) -> Optional[ModelT]:
+        doc = await self.coll.find_one(query, self.projection(fields))
+        return self.from_document(doc) if doc else None
+
+    async def list(
+            self
+            , limit: int = DEFAULT_LIMIT
+            , after: Optional[str] = None
+            , fields: Optional[Sequence[str]] = None
+    ) -> List[ModelT]:
+        """Una página ordenada por _id; el id del último elemento es el cursor de la siguiente"""
+        limit = max(1, min(limit, MAX_LIMIT))
+        query = keyset_filter(after)
+        cursor = self.coll.find(query, self.projection(fields)).sort("_id", 1).limit(limit)
+        return [self.from_document(doc) async for doc in cursor]
+
+    def stream(
+            self
+            , after: Optional[str] = None
+            , batch_size: int = STREAM_BATCH_SIZE
+            , fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[bytes]:
+        return stream_ndjson(self.coll, self.id_field, after, batch_size, self.projection(fields))
+
+    async def update(self, id: str, model: BaseModel) -> Optional[ModelT]:
+        """Aplica `$set` con los campos de `model` y devuelve el documento resultante"""
+        oid = to_object_id(id)
+        if oid is None:
+            return None
+        doc = await self.coll.find_one_and_update(
+            {"_id": oid},
+            {"$set": self.to_document(model), "$inc": {VERSION_FIELD: 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            await bump_version(self.collection)
+        return self.from_document(doc) if doc else None
+
+    async def patch(self, id: str, changes: Dict, version: Optional[int] = None) -> Optional[ModelT]:
+        """
+        `$set` solo de los campos de `changes` y devuelve el documento resultante
+        en el mismo viaje. Con `version` la escritura solo se aplica si el
+        documento sigue en esa versión; si otro la cambió antes, responde 409.
+        """
+        changes = {field: value for field, value in changes.items() if field not in self.write_exclude}
+        if not changes:
+            raise HTTPException(status_code=400, detail="No se envió ningún campo para actualizar")
+        oid = to_object_id(id)
+        if oid is None:
+            return None
+        doc = await self.coll.find_one_and_update(
+            {"_id": oid, **version_filter(version)},
+            {"$set": changes, "$inc": {VERSION_FIELD: 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            if version is not None and await self.coll.count_documents({"_id": oid}, limit=1):
+                raise HTTPException(status_code=409, detail="El documento cambió desde que se leyó (versión distinta)")
+            return None
+        await bump_version(self.collection)
+        return self.from_document(doc)
+
+    async def delete(self, id: str) -> bool:
+        oid = to_object_id(id)
+        if oid is None:
+            return False
+        result = await self.coll.delete_one({"_id": oid})
+        if result.deleted_count:
+            await bump_version(self.collection)
+        return result.deleted_count > 0
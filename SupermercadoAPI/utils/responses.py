@@ -0,0 +1,36 @@
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from utils.metrics import phase
+
+
+def json_default(value: Any):
+    """Tipos que orjson no conoce de forma nativa (datetime ya lo maneja)"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON serializada con orjson.
+
+    Devolverla directamente desde un endpoint evita que FastAPI vuelva a
+    validar el `response_model` y a pasar por `jsonable_encoder`; usarla solo
+    con datos que ya son modelos validados.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with phase("serialize"):
+            return dumps(content)
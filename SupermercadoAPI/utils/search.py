@@ -0,0 +1,270 @@
+import os
+import re
+import heapq
+import bisect
+import logging
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.mongodb import get_collection
+from utils.repository import to_object_id
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX", "on").lower() != "off"
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Con más candidatos que esto se recorre el orden alfabético precalculado en vez de ordenarlos
+_SCAN_THRESHOLD = 2000
+# Mayor que cualquier product_id: cierra un rango de precios por la derecha
+_LAST_ID = "\U0010ffff"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Campos de los productos que guarda el índice y devuelven las búsquedas
+PROJECTION = {"name": 1, "price": 1, "category_id": 1, "version": 1}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin acentos: 'Café Molido' -> 'cafe molido'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(normalize(text or ""))
+
+
+def _fields(product: dict) -> dict:
+    return {
+        "name": product.get("name", ""),
+        "price": product.get("price", 0.0),
+        "category_id": product.get("category_id", ""),
+        "version": product.get("version") or 0,
+    }
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido en memoria sobre el nombre del producto y el nombre de
+    su categoría. Cada término de la consulta se busca como prefijo sobre el
+    vocabulario ordenado (bisect) y los resultados se intersectan; los
+    filtros de categoría y precio se aplican sobre esos candidatos.
+
+    El vocabulario y los órdenes por precio y por nombre se mantienen al día
+    en cada escritura con bisect, así que ninguna búsqueda reordena el índice.
+    Con `deferred=True` (carga completa) se arman una sola vez en `finish_load`.
+
+    Cada producto guarda también su `version`, que se devuelve en los
+    resultados para poder hacer PATCH condicionado a partir de una búsqueda.
+    """
+
+    def __init__(self, deferred: bool = False):
+        self.ready = False
+        self._deferred = deferred
+        self._products: Dict[str, dict] = {}
+        self._tokens: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._vocabulary: List[str] = []
+        self._by_category: Dict[str, Set[str]] = defaultdict(set)
+        self._category_names: Dict[str, str] = {}
+        self._by_price: List[Tuple[float, str]] = []
+        self._sort_keys: Dict[str, str] = {}
+        self._by_name: List[Tuple[str, str]] = []
+        # Mientras `load` lee de Mongo: productos y categorías escritos entretanto
+        self._pending: Optional[Set[str]] = None
+        self._pending_categories: Optional[Dict[str, Optional[str]]] = None
+
+    def __len__(self):
+        return len(self._products)
+
+    def _insort(self, ordered: List, key):
+        if not self._deferred:
+            bisect.insort(ordered, key)
+
+    def _discard(self, ordered: List, key):
+        if self._deferred:
+            return
+        position = bisect.bisect_left(ordered, key)
+        if position < len(ordered) and ordered[position] == key:
+            del ordered[position]
+
+    def finish_load(self):
+        """Ordena de una vez lo cargado con `deferred=True` y deja el índice listo"""
+        self._vocabulary = sorted(self._postings)
+        self._by_price = sorted((product["price"], product_id) for product_id, product in self._products.items())
+        self._by_name = sorted((sort_key, product_id) for product_id, sort_key in self._sort_keys.items())
+        self._deferred = False
+        self.ready = True
+
+    def upsert(self, product_id: str, name: str, price: float, category_id: str, version: int = 0):
+        self.remove(product_id)
+        self._products[product_id] = {"name": name, "price": price, "category_id": category_id, "version": version}
+        self._sort_keys[product_id] = normalize(name)
+        self._index_tokens(product_id)
+        self._by_category[category_id].add(product_id)
+        self._insort(self._by_price, (price, product_id))
+        self._insort(self._by_name, (self._sort_keys[product_id], product_id))
+
+    def remove(self, product_id: str):
+        if self._pending is not None:
+            self._pending.add(product_id)
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        self._unindex_tokens(product_id)
+        self._by_category[product["category_id"]].discard(product_id)
+        self._discard(self._by_price, (product["price"], product_id))
+        self._discard(self._by_name, (self._sort_keys.pop(product_id), product_id))
+
+    def _index_tokens(self, product_id: str):
+        product = self._products[product_id]
+        tokens = set(tokenize(product["name"])) | set(tokenize(self._category_names.get(product["category_id"], "")))
+        self._tokens[product_id] = tokens
+        for token in tokens:
+            if token not in self._postings:
+                self._insort(self._vocabulary, token)
+            self._postings[token].add(product_id)
+
+    def _unindex_tokens(self, product_id: str):
+        for token in self._tokens.pop(product_id, ()):
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[token]
+                    self._discard(self._vocabulary, token)
+
+    def set_category(self, category_id: str, name: Optional[str]):
+        """Reindexa los términos de los productos de una categoría cuando cambia (o se borra) su nombre"""
+        if self._pending_categories is not None:
+            self._pending_categories[category_id] = name
+        if name is None:
+            self._category_names.pop(category_id, None)
+        else:
+            self._category_names[category_id] = name
+        # Nombre y precio no cambian: solo se rehacen los términos
+        for product_id in self._by_category.get(category_id, ()):
+            self._unindex_tokens(product_id)
+            self._index_tokens(product_id)
+
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches: Set[str] = set()
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self._postings[token]
+        return matches
+
+    def _price_range(self, min_price: Optional[float], max_price: Optional[float]) -> Set[str]:
+        low = bisect.bisect_left(self._by_price, (min_price, "")) if min_price is not None else 0
+        high = bisect.bisect_right(self._by_price, (max_price, _LAST_ID)) if max_price is not None else len(self._by_price)
+        return {product_id for _, product_id in self._by_price[low:high]}
+
+    def search(
+            self
+            , query: str = ""
+            , category_id: Optional[str] = None
+            , min_price: Optional[float] = None
+            , max_price: Optional[float] = None
+            , limit: int = SEARCH_DEFAULT_LIMIT
+    ) -> List[dict]:
+        candidate_sets = [self._prefix_matches(token) for token in tokenize(query)]
+        if category_id is not None:
+            candidate_sets.append(self._by_category.get(category_id, set()))
+
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            candidates = set(candidate_sets[0])
+            for other in candidate_sets[1:]:
+                candidates &= other
+        else:
+            candidates = self._price_range(min_price, max_price)
+
+        def in_range(product_id: str) -> bool:
+            price = self._products[product_id]["price"]
+            return (min_price is None or price >= min_price) and (max_price is None or price <= max_price)
+
+        if len(candidates) <= _SCAN_THRESHOLD:
+            ranked = heapq.nsmallest(limit, filter(in_range, candidates), key=self._sort_keys.__getitem__)
+        else:
+            ranked = []
+            for _, product_id in self._by_name:
+                if product_id in candidates and in_range(product_id):
+                    ranked.append(product_id)
+                    if len(ranked) == limit:
+                        break
+        return [{"product_id": product_id, **self._products[product_id]} for product_id in ranked]
+
+    async def load(self):
+        """
+        Construye el índice leyendo categorías y productos en streaming y lo
+        reemplaza al terminar. Lo escrito en el índice actual durante la carga
+        (que la lectura pudo no ver) se vuelve a aplicar tras el reemplazo.
+        """
+        self._pending, self._pending_categories = set(), {}
+        try:
+            fresh = ProductSearchIndex(deferred=True)
+            async for category in get_collection("categories").find({}, {"name": 1}):
+                fresh._category_names[str(category["_id"])] = category.get("name", "")
+            async for product in get_collection("products").find({}, PROJECTION).batch_size(5000):
+                fresh.upsert(str(product["_id"]), **_fields(product))
+            fresh.finish_load()
+        except BaseException:
+            self._pending = self._pending_categories = None
+            raise
+
+        pending, renamed = self._pending, self._pending_categories
+        self.__dict__.update(fresh.__dict__)
+        for category_id, name in renamed.items():
+            self.set_category(category_id, name)
+        await self.refresh(pending)
+        logger.info(f"Índice de búsqueda cargado: {len(self)} productos ({len(pending)} reaplicados)")
+
+    async def refresh(self, product_ids: Iterable[str]):
+        """Relee estos productos de Mongo; los que ya no existen se quitan del índice"""
+        oids = [oid for oid in (to_object_id(i) for i in product_ids) if oid is not None]
+        if not oids:
+            return
+        found = set()
+        cursor = get_collection("products").find({"_id": {"$in": oids}}, PROJECTION)
+        async for product in cursor:
+            product_id = str(product["_id"])
+            found.add(product_id)
+            self.upsert(product_id, **_fields(product))
+        for oid in oids:
+            if str(oid) not in found:
+                self.remove(str(oid))
+
+
+async def text_search(
+        query: str
+        , category_id: Optional[str] = None
+        , min_price: Optional[float] = None
+        , max_price: Optional[float] = None
+        , limit: int = SEARCH_DEFAULT_LIMIT
+) -> List[dict]:
+    """Respaldo con el índice de texto de Mongo cuando el índice en memoria no está disponible"""
+    filters: Dict = {}
+    if query.strip():
+        filters["$text"] = {"$search": query}
+    if category_id is not None:
+        filters["category_id"] = category_id
+    if min_price is not None or max_price is not None:
+        filters["price"] = {}
+        if min_price is not None:
+            filters["price"]["$gte"] = min_price
+        if max_price is not None:
+            filters["price"]["$lte"] = max_price
+
+    cursor = get_collection("products").find(filters, PROJECTION).limit(limit)
+    results = []
+    async for product in cursor:
+        product["product_id"] = str(product.pop("_id"))
+        results.append(product)
+    return results
+
+
+search_index = ProductSearchIndex()
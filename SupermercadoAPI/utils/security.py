@@ -1,21 +1,29 @@
 import os
-import secrets
+import time
 import hashlib
-import base64
 import jwt
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends, Request
+from starlette.requests import HTTPConnection
+from typing import Optional
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from jwt import PyJWTError
 from functools import wraps
 
+from utils.metrics import phase
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 security = HTTPBearer()
 
+# Claims de tokens ya verificados, indexados por el hash del token
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+_token_cache: "OrderedDict[str, dict]" = OrderedDict()
+
 # Función para crear un JWT
 def create_jwt_token(
         firstname:str
@@ -42,171 +50,114 @@ def create_jwt_token(
     )
     return token
 
-def validateuser(func):
-    @wraps(func)
-    async def wrapper( *args, **kwargs ):
-        request = kwargs.get('request')
-        if not request:
-            raise HTTPException( status_code=400, detail="Request object not found"  )
+def verify_token(token: str) -> dict:
+    """Devuelve los claims de un token válido, verificando la firma solo la primera vez"""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = _token_cache.get(key)
+
+    if payload is not None:
+        if payload["exp"] <= time.time():
+            _token_cache.pop(key, None)
+            raise HTTPException( status_code=401 , detail="Expired token" )
+        _token_cache.move_to_end(key)
+        return payload
+
+    try:
+        # jwt.decode ya rechaza tokens con exp vencido
+        payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"], options={"require": ["exp"]} )
+    except PyJWTError:
+        raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
 
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException( status_code=400, detail="Authorization header missing"  )
+    if payload.get("email") is None:
+        raise HTTPException( status_code=401 , detail="Token Invalid" )
 
-        schema, token = authorization.split()
-        if schema.lower() != "bearer":
-            raise HTTPException( status_code=400, detail="Invalid auth schema"  )
+    _token_cache[key] = payload
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return payload
 
-        try:
-            payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"] )
 
-            email = payload.get("email")
-            firstname = payload.get("firstname")
-            lastname = payload.get("lastname")
-            active = payload.get("active")
-            exp = payload.get("exp")
-            id = payload.get("id")
+def authorize(token: str, admin: bool = False) -> dict:
+    with phase("auth"):
+        payload = verify_token(token)
 
-            if email is None:
-                raise HTTPException( status_code=401 , detail="Token Invalid" )
+        if admin:
+            if not payload.get("active") or not payload.get("admin"):
+                raise HTTPException( status_code=401 , detail="Inactive user or not admin" )
+        elif not payload.get("active"):
+            raise HTTPException( status_code=401 , detail="Inactive user" )
 
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException( status_code=401 , detail="Expired token" )
+    return payload
 
-            if not active:
-                raise HTTPException( status_code=401 , detail="Inactive user" )
 
-            request.state.email = email
-            request.state.firstname = firstname
-            request.state.lastname = lastname
-            request.state.id = id
+def _bearer_token(request: Request) -> str:
+    authorization: str = request.headers.get("Authorization")
+    if not authorization:
+        raise HTTPException( status_code=400, detail="Authorization header missing"  )
 
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise HTTPException( status_code=400, detail="Invalid auth schema"  )
 
-        except PyJWTError:
-            raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
+    return parts[1]
 
-        return await func( *args, **kwargs )
-    return wrapper
 
-def validateadmin(func):
-    @wraps(func)
-    async def wrapper( *args, **kwargs ):
-        request = kwargs.get('request')
-        if not request:
-            raise HTTPException( status_code=400, detail="Request object not found"  )
+def _request_validator(admin: bool):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper( *args, **kwargs ):
+            request = kwargs.get('request')
+            if not request:
+                raise HTTPException( status_code=400, detail="Request object not found"  )
 
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException( status_code=400, detail="Authorization header missing"  )
+            payload = authorize(_bearer_token(request), admin=admin)
 
-        schema, token = authorization.split()
-        if schema.lower() != "bearer":
-            raise HTTPException( status_code=400, detail="Invalid auth schema"  )
+            request.state.email = payload.get("email")
+            request.state.firstname = payload.get("firstname")
+            request.state.lastname = payload.get("lastname")
+            request.state.id = payload.get("id")
+            if admin:
+                request.state.admin = payload.get("admin")
 
-        try:
-            payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"] )
+            return await func( *args, **kwargs )
+        return wrapper
+    return decorator
 
-            email = payload.get("email")
-            firstname = payload.get("firstname")
-            lastname = payload.get("lastname")
-            active = payload.get("active")
-            admin = payload.get("admin")
-            exp = payload.get("exp")
-            id = payload.get("id")
 
-            if email is None:
-                raise HTTPException( status_code=401 , detail="Token Invalid" )
+def authorize_connection(connection: HTTPConnection, access_token: Optional[str] = None) -> dict:
+    """Para SSE y WebSocket: el navegador no deja mandar cabeceras ahí, así que se acepta el token en la query"""
+    return authorize(access_token or _bearer_token(connection))
 
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException( status_code=401 , detail="Expired token" )
 
-            if not active or not admin:
-                raise HTTPException( status_code=401 , detail="Inactive user or not admin" )
+def is_admin_request(request: Request) -> bool:
+    """Sin cabecera Authorization es anónima (False); con ella, el token debe ser válido"""
+    if not request.headers.get("Authorization"):
+        return False
+    payload = authorize(_bearer_token(request))
+    return bool(payload.get("admin"))
 
-            request.state.email = email
-            request.state.firstname = firstname
-            request.state.lastname = lastname
-            request.state.admin = admin
-            request.state.id = id
 
+validateuser = _request_validator(admin=False)
+validateadmin = _request_validator(admin=True)
 
-        except PyJWTError:
-            raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
 
-        return await func( *args, **kwargs )
-    return wrapper
+def _claims(payload: dict) -> dict:
+    return {
+        "id": payload.get("id"),
+        "email": payload.get("email"),
+        "firstname": payload.get("firstname"),
+        "lastname": payload.get("lastname"),
+        "active": payload.get("active"),
+        "role": "admin" if payload.get("admin", False) else "user"
+    }
 
 
 # Funciones para FastAPI Dependency Injection
 def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Validar token JWT para usuarios autenticados - Para usar con Depends()"""
-    token = credentials.credentials
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        
-        email = payload.get("email")
-        firstname = payload.get("firstname")
-        lastname = payload.get("lastname")
-        active = payload.get("active")
-        admin = payload.get("admin", False)
-        exp = payload.get("exp")
-        user_id = payload.get("id")
-        
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token Invalid")
-        
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired token")
-        
-        if not active:
-            raise HTTPException(status_code=401, detail="Inactive user")
-        
-        return {
-            "id": user_id,
-            "email": email,
-            "firstname": firstname,
-            "lastname": lastname,
-            "active": active,
-            "role": "admin" if admin else "user"
-        }
-        
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
+    return _claims(authorize(credentials.credentials))
 
 
 def validate_admin(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Validar token JWT para administradores - Para usar con Depends()"""
-    token = credentials.credentials
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        
-        email = payload.get("email")
-        firstname = payload.get("firstname")
-        lastname = payload.get("lastname")
-        active = payload.get("active")
-        admin = payload.get("admin", False)
-        exp = payload.get("exp")
-        user_id = payload.get("id")
-        
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token Invalid")
-        
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired token")
-        
-        if not active or not admin:
-            raise HTTPException(status_code=401, detail="Inactive user or not admin")
-        
-        return {
-            "id": user_id,
-            "email": email,
-            "firstname": firstname,
-            "lastname": lastname,
-            "active": active,
-            "role": "admin"
-        }
-        
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
\ No newline at end of file
+    return _claims(authorize(credentials.credentials, admin=True))
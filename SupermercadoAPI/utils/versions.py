@@ -0,0 +1,77 @@
+"""
+Versión por colección, guardada en Mongo (`versions`, un documento por
+colección) para que todos los procesos la compartan. Cada escritura la
+incrementa después de aplicarse; quien lee la versión antes de consultar los
+datos nunca asocia datos viejos a una versión nueva (sí, durante
+VERSION_TTL, datos nuevos a la versión anterior). Solo la usan las ETags de
+los listados; las de un documento salen de su propio campo `version`.
+
+Solo se versionan las colecciones que sirven listados condicionales (ETag) y,
+sin replica set, las que el change feed vigila sondeando su versión: el resto
+(órdenes, usuarios, movimientos...) no paga una escritura extra sobre un
+documento compartido en cada checkout.
+
+Cada proceso cachea la versión VERSION_TTL segundos, así que una escritura
+hecha por otro proceso se nota con ese retraso como máximo; con change
+streams (utils.changefeed) se invalida en cuanto llega el aviso.
+"""
+import os
+import logging
+
+from pymongo import ReturnDocument
+
+from utils.cache import TTLCache
+from utils.changefeed import change_feed
+from utils.mongodb import get_collection
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_COLLECTION = "versions"
+
+# Colecciones con listados condicionales (ver utils.etag)
+VERSIONED_COLLECTIONS = {"products", "categories", "catalogs"}
+
+_versions = TTLCache("versions", ttl=float(os.getenv("VERSION_TTL", "1")), maxsize=100)
+
+
+async def collection_version(collection: str) -> int:
+    async def load():
+        doc = await get_collection(VERSIONS_COLLECTION).find_one({"_id": collection})
+        return doc["version"] if doc else 0
+
+    return await _versions.get_or_load(collection, load)
+
+
+async def bump_version(collection: str):
+    """
+    Marca la colección como modificada; un fallo solo se registra, la
+    escritura ya se hizo. Llamar una vez por petición o lote, no por documento.
+    """
+    if collection not in VERSIONED_COLLECTIONS and not change_feed.polls(collection):
+        return
+    # Se anota antes de escribir para que el sondeo de otros cambios nunca la tome por ajena
+    change_feed.note_local_write(collection)
+    try:
+        doc = await get_collection(VERSIONS_COLLECTION).find_one_and_update(
+            {"_id": collection},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        _versions.invalidate(collection)
+        _versions.set(collection, doc["version"])
+    except Exception as e:
+        change_feed.note_local_write(collection, -1)
+        _versions.invalidate(collection)
+        logger.error(f"Error incrementando la versión de {collection}: {str(e)}")
+
+
+async def _on_versions_changed(changes):
+    for change in changes:
+        if change.id is None:
+            _versions.clear()
+        else:
+            _versions.invalidate(change.id)
+
+
+change_feed.subscribe(VERSIONS_COLLECTION, _on_versions_changed)